@@ -0,0 +1,105 @@
+"""
+Semantic cache of final answers, in front of RAG().
+
+A question is keyed by the embedding of its cleaned text plus a scope:
+the courses / lecturers it resolves to, its route type (sql / semantic) and,
+when it leans on the conversation (vague references, fuzzy names), that
+conversation's state. A new question reuses a cached answer when its scope
+is identical AND its vector is within the cosine threshold of a cached one,
+so "מה הממוצע בחדוא 2" and "מה הציון הממוצע בחדו"א 2" can share an answer while
+the same question about another course, or a follow-up in another
+conversation, never does.
+
+E5 query similarities cluster high: different questions about one course
+("average grade in חדוא 1" / "prerequisites of חדוא 1") can come close to
+0.95. The cache is off by default (ANSWER_CACHE) and the threshold is kept
+high until it has been measured on labeled paraphrase / non-paraphrase pairs.
+
+Entries expire after a TTL and the cache holds at most max_size answers
+(LRU). Like the indexes behind it, it lives as long as the process.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def entity_key(entities: dict) -> tuple:
+    return (
+        tuple(sorted(set(entities.get("course") or []))),
+        tuple(sorted(set(entities.get("lecturer") or []))),
+    )
+
+
+def cache_text(cleaned_query: str, entities: dict) -> str:
+    """Text that gets embedded: the question plus its resolved entities."""
+    courses, lecturers = entity_key(entities)
+    return f"{cleaned_query} | {', '.join(courses)} | {', '.join(lecturers)}"
+
+
+class AnswerCache:
+    def __init__(self, max_size: int = 512, ttl_seconds: float = 3600, threshold: float = 0.98):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()      # id -> (vector, scope, answer, expires_at)
+        self._next_id = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _drop_expired(self):
+        now = time.monotonic()
+        for entry_id in [i for i, e in self._entries.items() if e[3] is not None and e[3] < now]:
+            del self._entries[entry_id]
+
+    def get(self, vector, scope: tuple):
+        """Cached answer for the closest question with the same scope, or None."""
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            self._drop_expired()
+
+            candidates = [(i, e[0]) for i, e in self._entries.items() if e[1] == scope]
+            if candidates:
+                ids = [i for i, _ in candidates]
+                scores = np.stack([v for _, v in candidates]) @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    self._entries.move_to_end(ids[best])
+                    self.hits += 1
+                    return self._entries[ids[best]][2]
+
+            self.misses += 1
+            return None
+
+    def put(self, vector, scope: tuple, answer: str):
+        if self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds > 0 else None
+        with self._lock:
+            self._entries[self._next_id] = (np.asarray(vector, dtype=np.float32), scope, answer, expires_at)
+            self._next_id += 1
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_size": self.max_size,
+                "evictions": self.evictions,
+            }
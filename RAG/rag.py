@@ -1,18 +1,91 @@
-from retrieval.retrieval import enhanced_retrieve
+import json
+from config import settings
+from retrieval.retrieval import enhanced_retrieve, base_embeddings, clf
 from generation.answerGenerator import generate_answer
-#from reranker.reranker import rerank_documents
+from queryProcess.gazetteer import get_gazetteer
+from queryProcess.query_enhancement import clean_query, update_conv_state
+from RAG.answer_cache import AnswerCache, cache_text, entity_key
+from reranker.reranker import rerank_documents
+from reranker.cascade import cascade_rerank
+
+answer_cache = AnswerCache(
+  max_size=settings.ANSWER_CACHE_SIZE,
+  ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+  threshold=settings.ANSWER_CACHE_THRESHOLD,
+) if settings.ANSWER_CACHE else None
+
+def _state_dict(conv_state):
+  """conv_state as a plain dict: the app's dict, or main.py's pydantic ConversationState."""
+  if conv_state is None:
+    return {}
+  if hasattr(conv_state, "model_dump"):
+    return conv_state.model_dump()
+  return dict(conv_state)
+
+def _recent_entities(state):
+  # vague follow-ups ("and what about the exams?") are about the last mentioned entities
+  entities = {"course": [], "lecturer": []}
+  for key in entities:
+    # dict state uses "course" / "lecturer", ConversationState "courses" / "lecturers"
+    values = state.get(key) or state.get(key + "s") or []
+    last = values[-1] if values else []
+    entities[key] = last if isinstance(last, list) else [last]
+  return entities
+
+def _answer_cache_key(query, vectorstore, conv_state):
+  """(query vector, scope, mentioned entities) for the answer cache, or None if it can't be used."""
+  embeddings = base_embeddings(vectorstore)
+  if answer_cache is None or embeddings is None:
+    return None
+
+  cleaned = clean_query(query)
+  mentioned = get_gazetteer().confident_extract(cleaned)
+  if mentioned is not None:
+    # self-contained question: the same answer in every conversation
+    entities, context = mentioned, ""
+  else:
+    # vague / fuzzy: the answer depends on what this conversation resolves it to
+    mentioned = {"course": [], "lecturer": []}
+    state = _state_dict(conv_state)
+    entities = _recent_entities(state)
+    context = json.dumps(state, ensure_ascii=False, sort_keys=True, default=str)
+  scope = (entity_key(entities), clf.classify(cleaned)["type"], context)
+  return embeddings.embed_query(cache_text(cleaned, entities)), scope, mentioned
 
 def RAG(query, query_enhancer, vectorstore, sql_converter, conv_state=None, db_schema=None):
   print("Entered RAG File")
-  results_valid, results_invalid, sql_results, KB = enhanced_retrieve(query, query_enhancer, 
-                                                                  vectorstore, 
+
+  cache_key = _answer_cache_key(query, vectorstore, conv_state)
+  if cache_key is not None:
+    vector, scope, mentioned = cache_key
+    answer = answer_cache.get(vector, scope)
+    if answer is not None:
+      print("Answer cache hit:", answer_cache.stats())
+      # keep the conversation state as the full pipeline would have
+      if conv_state and (mentioned["course"] or mentioned["lecturer"]):
+        update_conv_state(conv_state, mentioned)
+      return answer
+
+  results_valid, results_invalid, sql_results, KB = enhanced_retrieve(query, query_enhancer,
+                                                                  vectorstore,
                                                                   sql_converter, conv_state=conv_state,
                                                                   db_schemas=db_schema)
-  #reranked_docs = []
   if results_valid:
-    #reranked_docs = rerank_documents(query, results_valid[0]) // returns max 5 documents
     print("Length of valid docs:", len(results_valid))
+    if settings.RERANK and settings.RERANK_MODE == "cascade":
+      # cheap first pass bounds how many passages the cross-encoder sees
+      results_valid, timings = cascade_rerank(query, results_valid)
+      print("Reranking timings:", timings)
+    elif settings.RERANK:
+      # retrieve wide, send only the best passages to the generator
+      results_valid = rerank_documents(query, results_valid, top_n=settings.RERANK_TOP_N)
+    if settings.RERANK:
+      print("Length after reranking:", len(results_valid))
     print()
   #answer = generate_answer(query, reranked_docs, results_invalid, sql_results, KB)
   answer = generate_answer(query, results_valid, results_invalid, sql_results)
-  return answer
\ No newline at end of file
+
+  # only complete answers are reused (no failed / empty subqueries)
+  if cache_key is not None and answer and not results_invalid:
+    answer_cache.put(vector, scope, answer)
+  return answer
@@ -8,7 +8,8 @@ from datetime import datetime
 from RAG.rag import RAG
 from queryProcess.enhancer import QueryEnhancer
 from sql_retrieval.sql_converter import SQL_converter
-from embedding.embedder import E5Embeddings
+from embedding.registry import get_embeddings
+from retrieval.stores import load_review_store
 from langchain_chroma import Chroma
 from langchain_huggingface import HuggingFaceEmbeddings
 
@@ -478,8 +479,8 @@ div[data-testid="stSidebar"] div[data-testid="stTextInput"] input:focus {
 @st.cache_resource
 def load_resources():
     #embeddings = HuggingFaceEmbeddings(model_name="intfloat/multilingual-e5-large")
-    embeddings_class = E5Embeddings()
-    vectorstore      = Chroma(persist_directory="chroma_db",       embedding_function=embeddings_class)
+    embeddings_class = get_embeddings()
+    vectorstore      = load_review_store(embeddings_class)
     db_schemas       = Chroma(persist_directory="db_schemas",      embedding_function=embeddings_class)
     model_id = "deepseek-ai/deepseek-v3.2"
     enhancer = QueryEnhancer(model_id)
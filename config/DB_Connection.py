@@ -1,6 +1,36 @@
+"""
+MySQL connections.
+
+get_connection() opens a new connection. Request-time code borrows one from
+the process-wide pool instead:
+
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        ...
+
+The pool keeps up to DB_POOL_SIZE connections (created lazily, reused LIFO
+so the warmest is handed out first) and
+- blocks up to DB_POOL_TIMEOUT_SECONDS when all are in use, then raises PoolError;
+- pings a connection that sat idle longer than DB_POOL_PING_AFTER_SECONDS
+  before handing it out, and replaces it if the ping fails;
+- closes connections idle longer than DB_POOL_RECYCLE_SECONDS (the server
+  drops them after wait_timeout anyway);
+- caps every SELECT at DB_QUERY_TIMEOUT_MS (MAX_EXECUTION_TIME);
+- counts checkouts, waits and timeouts for /stats.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
 import mysql.connector
+from mysql.connector.errors import PoolError
 from dotenv import load_dotenv
-import os
+
+from config import settings
+
 load_dotenv()
 
 
@@ -10,4 +40,175 @@ def get_connection():
         user="root",
         password=os.getenv("DB_PASSWORD"),
         database=os.getenv("MYSQL_DB")
-    )
\ No newline at end of file
+    )
+
+
+class ConnectionPool:
+    def __init__(self, size=settings.DB_POOL_SIZE, timeout_seconds=settings.DB_POOL_TIMEOUT_SECONDS,
+                 recycle_seconds=settings.DB_POOL_RECYCLE_SECONDS,
+                 ping_after_seconds=settings.DB_POOL_PING_AFTER_SECONDS,
+                 query_timeout_ms=settings.DB_QUERY_TIMEOUT_MS, connect=get_connection):
+        self.size = size
+        self.timeout_seconds = timeout_seconds
+        self.recycle_seconds = recycle_seconds
+        self.ping_after_seconds = ping_after_seconds
+        self.query_timeout_ms = query_timeout_ms
+        self._connect_fn = connect
+
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle = deque()        # (connection, released at)
+
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.timeouts = 0
+        self.created = 0
+        self.recycled = 0
+        self.health_failures = 0
+
+    # ------------------------------------------------------------------
+    # connections
+    # ------------------------------------------------------------------
+    def _connect(self):
+        conn = self._connect_fn()
+        # reads only: no transaction left open on a pooled connection
+        conn.autocommit = True
+        if self.query_timeout_ms:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SET SESSION MAX_EXECUTION_TIME = %s", (int(self.query_timeout_ms),))
+            except mysql.connector.Error as e:
+                # e.g. MariaDB, which has no MAX_EXECUTION_TIME
+                print(f"⚠️ Warning: per-query timeout not set: {e}")
+            finally:
+                cursor.close()
+        with self._lock:
+            self.created += 1
+        return conn
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                conn, released = self._idle.pop() if self._idle else (None, None)
+            if conn is None:
+                return self._connect()
+
+            idle = time.monotonic() - released
+            if idle > self.recycle_seconds:
+                with self._lock:
+                    self.recycled += 1
+                self._close(conn)
+                continue
+            if idle > self.ping_after_seconds:
+                try:
+                    conn.ping(reconnect=False)
+                except Exception:
+                    with self._lock:
+                        self.health_failures += 1
+                    self._close(conn)
+                    continue
+            return conn
+
+    # ------------------------------------------------------------------
+    # public API
+    # ------------------------------------------------------------------
+    def acquire(self):
+        start = time.perf_counter()
+        if not self._slots.acquire(blocking=False):
+            acquired = self._slots.acquire(timeout=self.timeout_seconds)
+            waited = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.waits += 1
+                self.wait_ms_total += waited
+                self.wait_ms_max = max(self.wait_ms_max, waited)
+                if not acquired:
+                    self.timeouts += 1
+            if not acquired:
+                raise PoolError(f"No database connection free after {self.timeout_seconds}s "
+                                f"(pool size {self.size})")
+
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+        return conn
+
+    def release(self, conn, discard: bool = False):
+        """Returns conn to the pool; a connection that failed mid-query is discarded."""
+        if discard:
+            self._close(conn)
+        else:
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+        with self._lock:
+            self.in_use -= 1
+        self._slots.release()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for conn, _ in idle:
+            self._close(conn)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "in_use": self.in_use,
+                "idle": len(self._idle),
+                "saturation": self.in_use / self.size,
+                "peak_in_use": self.peak_in_use,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "wait_rate": self.waits / self.checkouts if self.checkouts else 0.0,
+                "mean_wait_ms": self.wait_ms_total / self.waits if self.waits else 0.0,
+                "max_wait_ms": self.wait_ms_max,
+                "timeouts": self.timeouts,
+                "created": self.created,
+                "recycled": self.recycled,
+                "health_failures": self.health_failures,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Process-wide pool, created on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+
+@contextmanager
+def pooled_connection():
+    """A pooled connection for the duration of the block."""
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+    except BaseException:
+        # lost / timed-out connection, or unread results left behind: don't reuse it
+        pool.release(conn, discard=True)
+        raise
+    pool.release(conn)
@@ -0,0 +1,165 @@
+import os
+from dotenv import load_dotenv
+load_dotenv()
+
+
+def _get_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# -----------------------------
+# Embeddings
+# -----------------------------
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "intfloat/multilingual-e5-large")
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE", "cpu")
+
+# "torch" (SentenceTransformer) or "onnx" (int8-quantized ONNX Runtime, CPU)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", "onnx_models/multilingual-e5-large")
+EMBEDDING_ONNX_THREADS = int(os.getenv("EMBEDDING_ONNX_THREADS", "0"))  # 0 = onnxruntime default
+
+# disk-backed embedding cache (empty string disables it)
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "embedding_cache")
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float32")  # float32 | float16
+EMBEDDING_CACHE_LRU_SIZE = int(os.getenv("EMBEDDING_CACHE_LRU_SIZE", "4096"))
+
+# micro-batching of concurrent query embeddings (the API server under load)
+EMBEDDING_BATCHING = _get_bool("EMBEDDING_BATCHING", False)
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))
+
+# -----------------------------
+# Index / ingestion
+# -----------------------------
+# artifacts written by setup.py next to the Chroma stores (chunks, compressed vectors, ...)
+INDEX_DIR = os.getenv("INDEX_DIR", "index_store")
+
+# reduced-dimension / low-precision vector storage
+VECTOR_PROJECTION = os.getenv("VECTOR_PROJECTION", "none")  # none | pca | truncate
+VECTOR_DIM = int(os.getenv("VECTOR_DIM", "256"))
+VECTOR_DTYPE = os.getenv("VECTOR_DTYPE", "float32")  # float32 | float16 | int8
+
+# ANN index built by setup.py next to the vectors: none | hnsw | ivfpq
+ANN_INDEX = os.getenv("ANN_INDEX", "none")
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+IVF_NLIST = int(os.getenv("IVF_NLIST", "0"))            # 0 = about 4 * sqrt(n)
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+IVF_TRAIN_SIZE = int(os.getenv("IVF_TRAIN_SIZE", "50000"))
+PQ_M = int(os.getenv("PQ_M", "32"))                     # sub-vectors, must divide the stored dimension
+PQ_NBITS = int(os.getenv("PQ_NBITS", "8"))
+
+# ANN candidates are re-scored exactly: k * ANN_REFINE of them (1 = off)
+ANN_REFINE = int(os.getenv("ANN_REFINE", "4"))
+# filtered queries matching at most this many chunks are searched exactly
+ANN_EXACT_MAX = int(os.getenv("ANN_EXACT_MAX", "20000"))
+
+# -----------------------------
+# Retrieval
+# -----------------------------
+SEARCH_K = int(os.getenv("SEARCH_K", "15"))
+
+# the fused query-understanding call suggests sql / semantic per subquery;
+# when set, its hint overrides the classifier
+USE_ROUTE_HINTS = _get_bool("USE_ROUTE_HINTS", True)
+
+# sql / semantic router: classifier (TF-IDF + logistic regression) | knn
+# (distance-weighted vote of the KNN_ROUTER_K nearest labeled examples,
+# reusing the retrieval query vectors)
+QUERY_ROUTER = os.getenv("QUERY_ROUTER", "classifier")
+KNN_ROUTER_K = int(os.getenv("KNN_ROUTER_K", "7"))
+
+# router confidence below DUAL_PATH_THRESHOLD: run the sql and semantic
+# paths of the subquery concurrently and keep whatever succeeds
+DUAL_PATH_ROUTING = _get_bool("DUAL_PATH_ROUTING", True)
+DUAL_PATH_THRESHOLD = float(os.getenv("DUAL_PATH_THRESHOLD", "0.65"))
+# in that band only: ask queryType.determine (LLM) which path wins when both succeed
+DUAL_PATH_TIEBREAKER = _get_bool("DUAL_PATH_TIEBREAKER", False)
+
+# max subqueries of one request processed concurrently
+SUBQUERY_WORKERS = int(os.getenv("SUBQUERY_WORKERS", "4"))
+
+# review store backend: chroma | numpy (exact in-memory search over INDEX_DIR)
+# | hnsw | ivfpq (approximate, see retrieval/ann_index.py)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+
+# course-filtered vector searches go to the per-course shards written by setup.py
+SHARDED_SEARCH = _get_bool("SHARDED_SEARCH", True)
+
+# hybrid BM25 + vector search merged with reciprocal rank fusion
+HYBRID_SEARCH = _get_bool("HYBRID_SEARCH", True)
+HYBRID_VECTOR_K = int(os.getenv("HYBRID_VECTOR_K", "10"))
+HYBRID_BM25_K = int(os.getenv("HYBRID_BM25_K", "10"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# semantic_search result cache (per process); 0 disables it
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "3600"))
+
+# semantic answer cache in front of RAG(): near-duplicate questions about the
+# same courses / lecturers reuse the previous answer without any LLM call.
+# Off until the threshold is measured on labeled paraphrase / non-paraphrase
+# pairs (E5 similarities of different questions about one course run high)
+ANSWER_CACHE = _get_bool("ANSWER_CACHE", False)
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.98"))
+
+# post-retrieval: merge neighbouring chunks of one review, optional MMR
+# re-selection and a token budget for the passages (0 = unlimited)
+MERGE_ADJACENT_CHUNKS = _get_bool("MERGE_ADJACENT_CHUNKS", True)
+RETRIEVAL_MMR = _get_bool("RETRIEVAL_MMR", False)
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "0"))
+
+# -----------------------------
+# Reranking
+# -----------------------------
+# rerank the retrieved passages before generation, keeping the best RERANK_TOP_N
+RERANK = _get_bool("RERANK", False)
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "8"))
+
+# single: cross-encoder on every passage | cascade: cheap first pass
+# (retrieval score + lexical overlap, no encoding) keeps RERANK_CANDIDATES for the cross-encoder
+RERANK_MODE = os.getenv("RERANK_MODE", "cascade")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+CASCADE_LEXICAL_WEIGHT = float(os.getenv("CASCADE_LEXICAL_WEIGHT", "0.3"))
+
+# torch | onnx (local CPU cross-encoder) | nvidia (remote NVIDIARerank)
+RERANKER_BACKEND = os.getenv("RERANKER_BACKEND", "torch")
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+RERANKER_ONNX_DIR = os.getenv("RERANKER_ONNX_DIR", "onnx_models/reranker")
+RERANKER_BATCH_SIZE = int(os.getenv("RERANKER_BATCH_SIZE", "16"))
+RERANKER_MAX_LENGTH = int(os.getenv("RERANKER_MAX_LENGTH", "512"))
+# (query, passage) score cache entries
+RERANKER_CACHE_SIZE = int(os.getenv("RERANKER_CACHE_SIZE", "8192"))
+
+# -----------------------------
+# Database
+# -----------------------------
+# MySQL connection pool (config/DB_Connection.py)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+# max wait for a free connection before PoolError
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "5"))
+# idle connections older than this are closed instead of reused
+DB_POOL_RECYCLE_SECONDS = float(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+# ping connections idle longer than this before handing them out
+DB_POOL_PING_AFTER_SECONDS = float(os.getenv("DB_POOL_PING_AFTER_SECONDS", "30"))
+# MAX_EXECUTION_TIME for every SELECT (0 = no limit)
+DB_QUERY_TIMEOUT_MS = int(os.getenv("DB_QUERY_TIMEOUT_MS", "5000"))
+
+# -----------------------------
+# LLM calls
+# -----------------------------
+# persistent completion cache shared by every LLM call site (empty path disables it)
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache/completions.sqlite3")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "20000"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# skip lookups (fresh completions are still stored)
+LLM_CACHE_BYPASS = _get_bool("LLM_CACHE_BYPASS", False)
+# requests sampled hotter than this (split_query / rewrite_and_extract at 0.7) are never cached
+LLM_CACHE_MAX_TEMPERATURE = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.3"))
@@ -0,0 +1,97 @@
+"""
+Micro-batching scheduler for query embeddings.
+
+Concurrent requests each want a single query vector. Instead of running N
+single-item forward passes, callers submit their text to a background worker
+that waits a few milliseconds for more texts to arrive, encodes everything in
+one batched call and resolves a future per caller.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class EmbeddingBatcher:
+    """Collects texts for up to max_wait_ms (or max_batch_size items) and encodes them together."""
+
+    def __init__(self, encode_fn, max_wait_ms: float = 5.0, max_batch_size: int = 32):
+        """
+        Args:
+            encode_fn: callable taking a list of texts and returning a list of vectors.
+            max_wait_ms: how long the worker waits for more texts after the first one arrives.
+            max_batch_size: flush immediately once this many texts are pending.
+        """
+        self.encode_fn = encode_fn
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_size = max_batch_size
+
+        self._queue = queue.Queue()
+        self._closed = False
+        self.batches = 0
+        self.items = 0
+
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, text: str) -> Future:
+        if self._closed:
+            raise RuntimeError("EmbeddingBatcher is closed")
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, text: str, timeout: float | None = None):
+        """Blocking helper: submit a single text and wait for its vector."""
+        return self.submit(text).result(timeout=timeout)
+
+    def close(self):
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+        }
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # re-queue the shutdown marker so the main loop sees it after this batch
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = self._collect(first)
+            texts = [text for text, _ in batch]
+            try:
+                vectors = self.encode_fn(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
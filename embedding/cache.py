@@ -0,0 +1,245 @@
+"""
+Disk-backed, content-addressed cache for embedding vectors.
+
+Every vector is keyed by sha1(model name + prefix + normalized text), so the
+same subquery / passage is only ever encoded once per model, across restarts.
+
+Layout on disk (one directory per model):
+    keys.txt      one hex key per line, line number == row in the vector file
+    vectors.bin   raw float32 / float16 rows, read back through np.memmap
+    meta.json     {"dim": ..., "dtype": ...}
+    .lock         fcntl lock held around every append / repair
+
+Lookups go through a small in-memory LRU first, then the memory-mapped file.
+
+Several processes (uvicorn workers, Streamlit) may share a directory. An
+append takes the file lock, picks up the keys other processes added, cuts
+off any torn tail a crash left behind (vectors.bin beyond the complete key
+lines, a partial key line, a partial row), and only then writes: vectors at
+the end of the now row-aligned file, whose offset gives the new row numbers,
+then their keys.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:     # Windows: no cross-process locking, one process per cache dir
+    fcntl = None
+
+_SUPPORTED_DTYPES = ("float32", "float16")
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class EmbeddingCache:
+    """Persistent embedding cache with an LRU front and hit/miss counters."""
+
+    def __init__(self, cache_dir, model_name: str, dtype: str = "float32", lru_size: int = 4096):
+        if dtype not in _SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported cache dtype {dtype}, expected one of {_SUPPORTED_DTYPES}")
+
+        self.model_name = model_name
+        self.dtype = np.dtype(dtype)
+        self.lru_size = lru_size
+        self.dir = Path(cache_dir) / re.sub(r"[^0-9A-Za-z_.-]", "_", model_name)
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+        self._keys_path = self.dir / "keys.txt"
+        self._vectors_path = self.dir / "vectors.bin"
+        self._meta_path = self.dir / "meta.json"
+        self._lock_path = self.dir / ".lock"
+
+        self._lock = threading.Lock()
+        self._lru = OrderedDict()
+        self._rows = {}          # key -> row in vectors.bin
+        self._stored_rows = 0    # rows of vectors.bin known to be complete, keyed
+        self._keys_bytes = 0     # bytes of keys.txt read so far
+        self._dim = None
+        self._mmap = None
+        self._mmap_rows = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+
+        self._load()
+
+    # ------------------------------------------------------------------
+    # persistence
+    # ------------------------------------------------------------------
+    def _load(self):
+        with self._file_lock():
+            self._sync()
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_meta(self):
+        if not self._meta_path.exists():
+            return
+        with open(self._meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["dtype"] != self.dtype.name:
+            raise ValueError(
+                f"Cache at {self.dir} was written as {meta['dtype']}, not {self.dtype.name}"
+            )
+        self._dim = meta["dim"]
+
+    def _sync(self):
+        """
+        Indexes the keys appended since the last sync and truncates both files
+        to the last row that has a complete vector and a complete key line.
+        Caller holds the file lock.
+        """
+        if self._dim is None:
+            self._read_meta()
+            if self._dim is None:
+                return
+
+        data = b""
+        if self._keys_path.exists():
+            with open(self._keys_path, "rb") as f:
+                f.seek(self._keys_bytes)
+                data = f.read()
+        new_keys = data[:data.rfind(b"\n") + 1].decode("ascii").splitlines()
+
+        row_bytes = self._dim * self.dtype.itemsize
+        vector_rows = self._vectors_path.stat().st_size // row_bytes if self._vectors_path.exists() else 0
+        new_keys = new_keys[:max(0, vector_rows - self._stored_rows)]
+
+        for key in new_keys:
+            self._rows[key] = self._stored_rows
+            self._stored_rows += 1
+        self._keys_bytes += sum(len(key) + 1 for key in new_keys)
+
+        # orphan vectors / partial rows / a partial key line from an interrupted append
+        self._truncate(self._keys_path, self._keys_bytes)
+        self._truncate(self._vectors_path, self._stored_rows * row_bytes)
+
+    @staticmethod
+    def _truncate(path, size):
+        if path.exists() and path.stat().st_size > size:
+            os.truncate(path, size)
+
+    def _write_meta(self):
+        with open(self._meta_path, "w", encoding="utf-8") as f:
+            json.dump({"dim": self._dim, "dtype": self.dtype.name, "model": self.model_name}, f)
+
+    def _read_row(self, row: int) -> list:
+        if self._mmap is None or row >= self._mmap_rows:
+            self._mmap_rows = self._stored_rows
+            self._mmap = np.memmap(self._vectors_path, dtype=self.dtype, mode="r",
+                                   shape=(self._mmap_rows, self._dim))
+        return self._mmap[row].astype(np.float32).tolist()
+
+    # ------------------------------------------------------------------
+    # public API
+    # ------------------------------------------------------------------
+    def make_key(self, prefix: str, text: str) -> str:
+        payload = f"{self.model_name}\x00{prefix}\x00{normalize_text(text)}"
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def get(self, prefix: str, text: str):
+        return self.get_many(prefix, [text])[0]
+
+    def get_many(self, prefix: str, texts: list) -> list:
+        """Returns a list aligned with texts; missing entries are None."""
+        out = []
+        with self._lock:
+            for text in texts:
+                key = self.make_key(prefix, text)
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    out.append(self._lru[key])
+                elif key in self._rows:
+                    vector = self._read_row(self._rows[key])
+                    self._remember(key, vector)
+                    self.hits += 1
+                    out.append(vector)
+                else:
+                    self.misses += 1
+                    out.append(None)
+        return out
+
+    def put(self, prefix: str, text: str, vector):
+        self.put_many(prefix, [text], [vector])
+
+    def put_many(self, prefix: str, texts: list, vectors):
+        with self._lock, self._file_lock():
+            # rows other processes appended (and any torn tail) first
+            self._sync()
+
+            new_keys, new_rows = [], []
+            for text, vector in zip(texts, vectors):
+                key = self.make_key(prefix, text)
+                vector = np.asarray(vector, dtype=np.float32)
+                if self._dim is None:
+                    self._dim = int(vector.shape[0])
+                    self._write_meta()
+                if key not in self._rows and key not in new_keys:
+                    new_keys.append(key)
+                    new_rows.append(vector.astype(self.dtype))
+                self._remember(key, vector.tolist())
+
+            if not new_keys:
+                return
+
+            # vectors first, keys second: a key line is only trusted once its row
+            # is complete, and the next _sync() drops whatever a crash left behind
+            row_bytes = self._dim * self.dtype.itemsize
+            with open(self._vectors_path, "ab") as f:
+                first_row = f.tell() // row_bytes
+                f.write(np.stack(new_rows).tobytes())
+            lines = "".join(k + "\n" for k in new_keys)
+            with open(self._keys_path, "ab") as f:
+                f.write(lines.encode("ascii"))
+
+            for row, key in enumerate(new_keys, start=first_row):
+                self._rows[key] = row
+            self._stored_rows = first_row + len(new_keys)
+            self._keys_bytes += len(lines)
+
+    def _remember(self, key, vector):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.hits - self.memory_hits,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "entries": len(self._rows),
+        }
+
+    def __len__(self):
+        return len(self._rows)
@@ -0,0 +1,179 @@
+"""
+Reduced-dimension and low-precision storage for E5 vectors.
+
+VectorCompressor = optional projection (fitted PCA or plain truncation)
+                   + storage dtype (float32, float16, or int8 with a per-vector scale).
+
+The same projection must be applied to queries at search time; use
+ProjectedEmbeddings to wrap the shared E5Embeddings for that.
+"""
+
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+METHODS = ("none", "pca", "truncate")
+DTYPES = ("float32", "float16", "int8")
+
+
+def _normalize(X: np.ndarray) -> np.ndarray:
+    return X / np.clip(np.linalg.norm(X, axis=-1, keepdims=True), 1e-12, None)
+
+
+class VectorCompressor:
+    def __init__(self, method: str = "none", dim: int | None = None, dtype: str = "float32"):
+        if method not in METHODS:
+            raise ValueError(f"Unknown projection {method}, expected one of {METHODS}")
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown vector dtype {dtype}, expected one of {DTYPES}")
+        if method != "none" and not dim:
+            raise ValueError(f"Projection {method} needs a target dim")
+
+        self.method = method
+        self.dim = dim
+        self.dtype = dtype
+        self.mean = None
+        self.components = None
+
+    # ------------------------------------------------------------------
+    # projection
+    # ------------------------------------------------------------------
+    def fit(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if self.method == "pca":
+            if self.dim > min(X.shape):
+                raise ValueError(f"PCA dim {self.dim} exceeds data shape {X.shape}")
+            self.mean = X.mean(axis=0)
+            # rows of Vt are the principal directions, largest variance first
+            _, _, Vt = np.linalg.svd(X - self.mean, full_matrices=False)
+            self.components = Vt[:self.dim].astype(np.float32)
+        return self
+
+    def project(self, X) -> np.ndarray:
+        """Projects and re-normalizes, so dot products stay cosine similarities."""
+        X = np.asarray(X, dtype=np.float32)
+        if self.method == "none":
+            return X
+        if self.method == "truncate":
+            return _normalize(X[..., :self.dim])
+        if self.components is None:
+            raise RuntimeError("VectorCompressor.fit must be called before project with method='pca'")
+        return _normalize((X - self.mean) @ self.components.T)
+
+    @property
+    def output_dim(self):
+        return self.dim if self.method != "none" else None
+
+    # ------------------------------------------------------------------
+    # quantization
+    # ------------------------------------------------------------------
+    def quantize(self, X):
+        """Returns (codes, scales); scales is None unless dtype is int8."""
+        X = np.asarray(X, dtype=np.float32)
+        if self.dtype == "float32":
+            return X, None
+        if self.dtype == "float16":
+            return X.astype(np.float16), None
+
+        scales = np.abs(X).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.round(X / scales[:, None]).clip(-127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def compress(self, X):
+        return self.quantize(self.project(X))
+
+    @staticmethod
+    def dequantize(codes, scales=None) -> np.ndarray:
+        X = np.asarray(codes, dtype=np.float32)
+        if scales is not None:
+            X = X * scales[:, None]
+        return X
+
+    # ------------------------------------------------------------------
+    # persistence
+    # ------------------------------------------------------------------
+    def save(self, path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        np.savez(
+            path,
+            method=self.method,
+            dim=self.dim or 0,
+            dtype=self.dtype,
+            mean=self.mean if self.mean is not None else np.zeros(0, dtype=np.float32),
+            components=self.components if self.components is not None else np.zeros((0, 0), dtype=np.float32),
+        )
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        compressor = cls(str(data["method"]), int(data["dim"]) or None, str(data["dtype"]))
+        if compressor.method == "pca":
+            compressor.mean = data["mean"]
+            compressor.components = data["components"]
+        return compressor
+
+
+class QuantizedMatrix:
+    """Row-major matrix of stored vectors that scores queries without dequantizing everything at once."""
+
+    def __init__(self, codes, scales=None, block_rows: int = 8192):
+        self.codes = codes
+        self.scales = scales
+        self.block_rows = block_rows
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def rows(self, idx) -> np.ndarray:
+        scales = self.scales[idx] if self.scales is not None else None
+        return VectorCompressor.dequantize(self.codes[idx], scales)
+
+    def dot(self, Q) -> np.ndarray:
+        """Q: (d,) or (q, d) float32 -> scores (n,) or (n, q)."""
+        Q = np.asarray(Q, dtype=np.float32)
+        if self.codes.dtype == np.float32:
+            return self.codes @ Q.T
+
+        out = []
+        for start in range(0, self.codes.shape[0], self.block_rows):
+            block = self.codes[start:start + self.block_rows].astype(np.float32)
+            scores = block @ Q.T
+            if self.scales is not None:
+                scales = self.scales[start:start + self.block_rows]
+                scores = scores * (scales[:, None] if scores.ndim == 2 else scales)
+            out.append(scores)
+        return np.concatenate(out, axis=0)
+
+
+class ProjectedEmbeddings(Embeddings):
+    """Applies a fitted projection on top of another embeddings object (documents and queries alike)."""
+
+    def __init__(self, base: Embeddings, compressor: VectorCompressor):
+        self.base = base
+        self.compressor = compressor
+
+    def embed_documents(self, texts):
+        return self.compressor.project(self.base.embed_documents(texts)).tolist()
+
+    def embed_query(self, text):
+        return self.compressor.project(self.base.embed_query(text)).tolist()
+
+    def embed_queries(self, texts):
+        return self.compressor.project(embed_queries(self.base, texts)).tolist()
+
+
+def embed_queries(embeddings: Embeddings, texts) -> list:
+    """Batched query embedding; falls back to one embed_query per text for embeddings without embed_queries."""
+    texts = list(texts)
+    if not texts:
+        return []
+    if hasattr(embeddings, "embed_queries"):
+        return embeddings.embed_queries(texts)
+    return [embeddings.embed_query(text) for text in texts]
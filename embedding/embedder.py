@@ -1,41 +1,124 @@
-from langchain_huggingface import HuggingFaceEmbeddings
-from sentence_transformers import SentenceTransformer
+import threading
+
 from langchain_core.embeddings import Embeddings
 
+from config import settings
+from embedding.cache import EmbeddingCache
+from embedding.batcher import EmbeddingBatcher
+from embedding.registry import get_model, get_embeddings
+
+QUERY_PREFIX = "query: "
+PASSAGE_PREFIX = "passage: "
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def with_prefix(text: str, prefix: str) -> str:
+    """Adds an E5 instruction prefix exactly once."""
+    return text if text.startswith(prefix) else f"{prefix}{text}"
+
+
+def strip_prefix(text: str, prefix: str) -> str:
+    return text[len(prefix):] if text.startswith(prefix) else text
+
+
+def get_embedding_cache(model_name=settings.EMBEDDING_MODEL, backend=settings.EMBEDDING_BACKEND):
+    """Returns the shared on-disk cache configured in settings, or None if it is disabled."""
+    if not settings.EMBEDDING_CACHE_DIR:
+        return None
+    # quantized vectors differ slightly from the torch ones, keep them apart
+    namespace = model_name if backend == "torch" else f"{model_name}@{backend}"
+    with _caches_lock:
+        if namespace not in _caches:
+            _caches[namespace] = EmbeddingCache(
+                settings.EMBEDDING_CACHE_DIR,
+                namespace,
+                dtype=settings.EMBEDDING_CACHE_DTYPE,
+                lru_size=settings.EMBEDDING_CACHE_LRU_SIZE,
+            )
+        return _caches[namespace]
+
+
 class E5Embeddings(Embeddings):
-    def __init__(self, model_name="intfloat/multilingual-e5-large"):
-        self.model = SentenceTransformer(model_name)
+    """
+    LangChain embeddings for E5 models. Queries are encoded as "query: ...",
+    documents as "passage: ..."; texts that already carry the prefix are not
+    prefixed twice. The underlying model comes from the process-wide registry.
+    """
 
-    def embed_documents(self, texts):
-        texts = [f"passage: {t}" for t in texts]
+    def __init__(self, model_name=settings.EMBEDDING_MODEL, use_cache=True, batching=settings.EMBEDDING_BATCHING,
+                 backend=settings.EMBEDDING_BACKEND, device=settings.EMBEDDING_DEVICE):
+        self.model = get_model(model_name, device, backend)
+        self.cache = get_embedding_cache(model_name, backend) if use_cache else None
+
+        self.batcher = None
+        if batching:
+            self.enable_batching()
+
+    def enable_batching(self):
+        """Coalesce concurrent embed_query calls into one forward pass."""
+        if self.batcher is None:
+            self.batcher = EmbeddingBatcher(
+                lambda texts: self._encode(texts, QUERY_PREFIX),
+                max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS,
+                max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+            )
+
+    def _encode(self, texts, prefix):
         return self.model.encode(
-            texts,
+            [with_prefix(t, prefix) for t in texts],
             normalize_embeddings=True
         ).tolist()
 
+    def _encode_query(self, text):
+        if self.batcher is not None:
+            return self.batcher.encode(text)
+        return self._encode([text], QUERY_PREFIX)[0]
+
+    def _embed(self, texts, prefix):
+        # "passage: x" and "x" are the same passage
+        texts = [strip_prefix(t, prefix) for t in texts]
+        if self.cache is None:
+            return self._encode(texts, prefix)
+
+        vectors = self.cache.get_many(prefix, texts)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            # encode all misses in a single forward pass
+            encoded = self._encode([texts[i] for i in missing], prefix)
+            self.cache.put_many(prefix, [texts[i] for i in missing], encoded)
+            for i, vector in zip(missing, encoded):
+                vectors[i] = vector
+        return vectors
+
+    def embed_documents(self, texts):
+        return self._embed(list(texts), PASSAGE_PREFIX)
+
     def embed_query(self, text):
-        return self.model.encode(
-            [f"query: {text}"],
-            normalize_embeddings=True
-        )[0].tolist()
+        text = strip_prefix(text, QUERY_PREFIX)
+        if self.cache is None:
+            return self._encode_query(text)
+
+        vector = self.cache.get(QUERY_PREFIX, text)
+        if vector is None:
+            vector = self._encode_query(text)
+            self.cache.put(QUERY_PREFIX, text, vector)
+        return vector
+
+    def embed_queries(self, texts):
+        """Embeds several queries in one forward pass (cache-aware), e.g. all subqueries of a request."""
+        return self._embed(list(texts), QUERY_PREFIX)
 
 
 # For E5 models, you need to add instruction prefixes
 def get_e5_embeddings():
-    model_name = "intfloat/multilingual-e5-large"  # or "multilingual-e5-base" for faster
-    model_kwargs = {'device': 'cpu'}  # Use 'cpu' if no GPU
-    encode_kwargs = {'normalize_embeddings': True}  # Important for cosine similarity
-
-    embeddings = HuggingFaceEmbeddings(
-        model_name=model_name,
-        model_kwargs=model_kwargs,
-        encode_kwargs=encode_kwargs
-    )
-    return embeddings
+    """Shared E5 embeddings on cpu (kept for older callers; see embedding.registry)."""
+    return get_embeddings(device="cpu")
 
 # E5 models work best with instruction prefixes
 def add_e5_prefix_to_docs(docs_split):
     """Add 'passage: ' prefix for E5 models"""
     for doc in docs_split:
-        doc.page_content = f"passage: {doc.page_content}"
-    return docs_split
\ No newline at end of file
+        doc.page_content = with_prefix(doc.page_content, PASSAGE_PREFIX)
+    return docs_split
@@ -0,0 +1,116 @@
+"""
+ONNX Runtime CPU backend for the E5 embedder.
+
+The exported graph outputs the transformer's last hidden state; mean pooling
+and L2 normalization (what SentenceTransformer does for E5) are done here in
+NumPy, so vectors stay compatible with the existing PyTorch-built index.
+
+Export once with offline_processing/export_onnx_embedder.py, then set
+EMBEDDING_BACKEND=onnx.
+"""
+
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+FP32_FILE = "model.onnx"
+INT8_FILE = "model_int8.onnx"
+
+
+def export_quantized(model_name: str, out_dir, keep_fp32: bool = False) -> Path:
+    """
+    Exports model_name to ONNX and applies dynamic int8 weight quantization.
+    Returns the path of the quantized model.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    out_dir = Path(out_dir)
+    # the fp32 graph of e5-large is > 2GB and is written with external data files,
+    # so keep it in its own directory
+    fp32_dir = out_dir / "fp32"
+    fp32_dir.mkdir(parents=True, exist_ok=True)
+    fp32_path = fp32_dir / FP32_FILE
+    int8_path = out_dir / INT8_FILE
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name)
+    model.eval()
+    tokenizer.save_pretrained(out_dir)
+
+    dummy = tokenizer(["query: hello world"], return_tensors="pt")
+    print(f"Exporting {model_name} to {fp32_path}")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (dummy["input_ids"], dummy["attention_mask"]),
+            str(fp32_path),
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "seq"},
+                "attention_mask": {0: "batch", 1: "seq"},
+                "last_hidden_state": {0: "batch", 1: "seq"},
+            },
+            opset_version=17,
+            dynamo=False,
+        )
+
+    print(f"Quantizing (dynamic int8) to {int8_path}")
+    quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+
+    if not keep_fp32:
+        shutil.rmtree(fp32_dir)
+
+    return int8_path
+
+
+class OnnxE5Encoder:
+    """Drop-in replacement for the subset of SentenceTransformer.encode that E5Embeddings uses."""
+
+    def __init__(self, model_dir, file_name: str = INT8_FILE, num_threads: int = 0, max_length: int = 512):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_dir = Path(model_dir)
+        model_path = model_dir / file_name
+        if not model_path.exists():
+            raise FileNotFoundError(
+                f"ONNX model not found at {model_path}. "
+                "Run offline_processing/export_onnx_embedder.py first to generate it."
+            )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.session = ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+        self._input_names = [i.name for i in self.session.get_inputs()]
+        self.max_length = max_length
+
+    def encode(self, sentences, batch_size: int = 32, normalize_embeddings: bool = True) -> np.ndarray:
+        if isinstance(sentences, str):
+            sentences = [sentences]
+
+        out = []
+        for start in range(0, len(sentences), batch_size):
+            batch = sentences[start:start + batch_size]
+            encoded = self.tokenizer(
+                batch, padding=True, truncation=True, max_length=self.max_length, return_tensors="np"
+            )
+            feeds = {name: encoded[name].astype(np.int64) for name in self._input_names}
+            hidden = self.session.run(None, feeds)[0]
+
+            # mean pooling over real (non-padding) tokens
+            mask = encoded["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            out.append(pooled)
+
+        vectors = np.concatenate(out, axis=0) if out else np.zeros((0, 0), dtype=np.float32)
+        if normalize_embeddings and len(vectors):
+            vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors.astype(np.float32)
@@ -0,0 +1,63 @@
+"""
+Process-wide registry of loaded embedding models.
+
+multilingual-e5-large is ~560M parameters; every store, the schema router and
+ingestion should share one loaded copy per (model name, device, backend)
+instead of each constructing its own.
+"""
+
+import threading
+
+from config import settings
+
+_lock = threading.RLock()
+_models = {}
+_embeddings = {}
+
+
+def load_encoder(model_name=settings.EMBEDDING_MODEL, device=settings.EMBEDDING_DEVICE,
+                 backend=settings.EMBEDDING_BACKEND):
+    """Loads a fresh encoder with a SentenceTransformer-compatible encode(). Prefer get_model()."""
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name, device=device)
+    if backend == "onnx":
+        from embedding.onnx_backend import OnnxE5Encoder
+        if device != "cpu":
+            raise ValueError("The onnx embedding backend only runs on cpu")
+        return OnnxE5Encoder(settings.EMBEDDING_ONNX_DIR, num_threads=settings.EMBEDDING_ONNX_THREADS)
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+
+def get_model(model_name=settings.EMBEDDING_MODEL, device=settings.EMBEDDING_DEVICE,
+              backend=settings.EMBEDDING_BACKEND):
+    """Returns the shared encoder for (model_name, device, backend), loading it on first use."""
+    key = (model_name, device, backend)
+    with _lock:
+        if key not in _models:
+            print(f"Loading embedding model {model_name} ({backend}, {device})")
+            _models[key] = load_encoder(model_name, device, backend)
+        return _models[key]
+
+
+def get_embeddings(model_name=settings.EMBEDDING_MODEL, device=settings.EMBEDDING_DEVICE,
+                   backend=settings.EMBEDDING_BACKEND, batching=False):
+    """
+    Returns the shared E5Embeddings for (model_name, device, backend).
+    All callers also share its embedding cache; batching=True turns on the
+    query micro-batcher for every user of the instance.
+    """
+    from embedding.embedder import E5Embeddings
+
+    key = (model_name, device, backend)
+    with _lock:
+        if key not in _embeddings:
+            _embeddings[key] = E5Embeddings(model_name, device=device, backend=backend)
+        embeddings = _embeddings[key]
+    if batching:
+        embeddings.enable_batching()
+    return embeddings
+
+
+def loaded_models() -> list:
+    return list(_models.keys())
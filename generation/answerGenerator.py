@@ -2,6 +2,7 @@ import os
 from openai import OpenAI, APITimeoutError
 from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type
 from util.utility import docs2str
+from util.llm_cache import cached_completion
 
 def generate_answer(
     query: str,
@@ -113,7 +114,9 @@ Answer:
 
         return result.strip()
 
-    answer = _call_llm(full_prompt)
+    params = {"temperature": 0.2, "top_p": 0.7, "max_tokens": 8192}
+    answer = cached_completion("generate_answer", model_name, full_prompt, params,
+                               lambda: _call_llm(full_prompt))
 
     print("Finished generation")
     return answer
\ No newline at end of file
@@ -1,7 +1,10 @@
 import json
 import os
+import re
 from openai import OpenAI
 from dotenv import load_dotenv
+from queryProcess.gazetteer import get_gazetteer
+from util.llm_cache import cached_completion, is_json
 load_dotenv()
 
 
@@ -26,6 +29,21 @@ Rules:
 - Strict JSON only.
 """
 
+def extract_local(query: str) -> dict:
+    """
+    Gazetteer entities plus explicit years / semesters, or None (use the LLM)
+    if no course or lecturer is found, a match is fuzzy or a reference is vague.
+    """
+    entities = get_gazetteer().confident_extract(query)
+    if entities is None:
+        return None
+    return {
+        "courses": entities["course"],
+        "lecturers": entities["lecturer"],
+        "years": [int(y) for y in re.findall(r"\b(?:19|20)\d{2}\b", query)],
+        "semesters": re.findall(r"סמסטר\s+([אבג])\b", query) + (["קיץ"] if "קיץ" in query else []),
+    }
+
 class SlotFiller:
     def __init__(self, model_name: str = "deepseek-ai/deepseek-v3.1"):
         self.client = OpenAI(
@@ -36,21 +54,31 @@ class SlotFiller:
 
     def extract(self, query: str) -> dict:
         print("Entered Slot Filler File")
-        response = self.client.chat.completions.create(
-            model=self.model_name,
-            messages=[{"role": "user", "content": EXTRACTION_PROMPT + "\nUser query:\n" + query}],
-            temperature=0.2,
-            top_p=0.7,
-            max_tokens=8192,
-            extra_body={"chat_template_kwargs": {"thinking":False}},
-            stream=True
-        )
-        result = ""
-        for chunk in response:
-          if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content is not None:
-            # print(chunk.choices[0].delta.content, end="")
-            result += chunk.choices[0].delta.content
-        response = result.strip()
+        local = extract_local(query)
+        if local is not None:
+            return local
+
+        prompt = EXTRACTION_PROMPT + "\nUser query:\n" + query
+
+        def call():
+            response = self.client.chat.completions.create(
+                model=self.model_name,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.2,
+                top_p=0.7,
+                max_tokens=8192,
+                extra_body={"chat_template_kwargs": {"thinking":False}},
+                stream=True
+            )
+            result = ""
+            for chunk in response:
+              if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content is not None:
+                # print(chunk.choices[0].delta.content, end="")
+                result += chunk.choices[0].delta.content
+            return result.strip()
+
+        params = {"temperature": 0.2, "top_p": 0.7, "max_tokens": 8192}
+        response = cached_completion("slot_filler", self.model_name, prompt, params, call, validate=is_json)
         try:
             data = json.loads(response)
         except:
@@ -4,14 +4,21 @@ from langchain_chroma import Chroma
 
 from loader.load_reviews import load_reviews
 from loader.load_ids import load_ids
-from embedding.embedder import get_e5_embeddings, E5Embeddings
+from embedding.registry import get_embeddings
+from retrieval.stores import load_review_store
+from config import settings
+from retrieval.retrieval import search_cache, base_embeddings
+from query_classification.knn_router import get_knn_router
 from chunking.chunker import chunk_docs
 from queryProcess.enhancer import QueryEnhancer
 from knowledgeBase.slot_filler import SlotFiller
 from knowledgeBase.conversation_state import ConversationState
 from query_type.queryType import queryType
 from sql_retrieval.sql_converter import SQL_converter
-from RAG.rag import RAG
+from RAG.rag import RAG, answer_cache
+from reranker.cascade import cascade_timings
+from util.llm_cache import get_llm_cache
+from config.DB_Connection import get_pool
 #from generation.answerGenerator import AnswerGenerator
 
 from pydantic import BaseModel
@@ -39,13 +46,11 @@ courses, lecturers = load_ids()
 
 #docs_split = chunk_docs(docs)
 #docs_split = add_e5_prefix_to_docs(docs_split)
-embeddings = get_e5_embeddings()
-embeddings_ = E5Embeddings()
+# one shared E5 instance for every store; with EMBEDDING_BATCHING concurrent
+# /rag requests share its query micro-batcher
+embeddings = get_embeddings()
 
-vectorstore = Chroma(
-    persist_directory="chroma_db",
-    embedding_function=embeddings
-)
+vectorstore = load_review_store(embeddings)
 
 db_schemas = Chroma(
     persist_directory="db_schemas",
@@ -54,9 +59,13 @@ db_schemas = Chroma(
 
 classification_vectorstore = Chroma(
     persist_directory="classification_db",
-    embedding_function=embeddings_
+    embedding_function=embeddings
 )
 
+if settings.QUERY_ROUTER == "knn":
+    # embed the labeled routing examples now rather than on the first request
+    get_knn_router(base_embeddings(vectorstore))
+
 query_enhancer = QueryEnhancer("deepseek-ai/deepseek-v3.2")
 #query_typer = queryType("deepseek-ai/deepseek-v3.1")
 sql_converter = SQL_converter("deepseek-ai/deepseek-v3.2")
@@ -82,10 +91,12 @@ class RAGResponse(BaseModel):
 
 # --------- Endpoints ---------
 
+# sync endpoints run in FastAPI's threadpool, so concurrent requests can
+# actually overlap (and get their query embeddings batched together)
 @app.post("/rag", response_model=RAGResponse)
-async def rag_endpoint(req: QueryRequest):
+def rag_endpoint(req: QueryRequest):
     answer = RAG(
-        req.query, query_enhancer, vectorstore, classification_vectorstore, sql_converter, conv_state=KB,
+        req.query, query_enhancer, vectorstore, sql_converter, conv_state=KB,
         db_schema=db_schemas
     )
 
@@ -101,7 +112,7 @@ async def enhance_endpoint(req: QueryRequest):
 
 
 @app.post("/retrieve")
-async def retrieve_endpoint(req: QueryRequest):
+def retrieve_endpoint(req: QueryRequest):
     chunks = vectorstore.similarity_search_with_score(req.query, k=5)
 
     formatted = [
@@ -115,6 +126,18 @@ async def retrieve_endpoint(req: QueryRequest):
     return {"chunks": formatted}
 
 
+@app.get("/stats")
+def stats_endpoint():
+    # hit rates for sizing the caches
+    return {
+        "search_cache": search_cache.stats(),
+        "answer_cache": answer_cache.stats() if answer_cache is not None else None,
+        "rerank_stages": cascade_timings.stats(),
+        "llm_cache": get_llm_cache().stats() if get_llm_cache() is not None else None,
+        "db_pool": get_pool().stats(),
+    }
+
+
 @app.get("/")
 def root():
     return {"message": "RAG system is running!"}
@@ -0,0 +1,106 @@
+"""
+Recall@k against exact search, query latency and index size of the ANN
+backends (retrieval/ann_index.py) on synthetic scaled-up copies of the
+review corpus.
+
+A corpus of scale s has s times as many vectors as index_store: every stored
+chunk vector is repeated with Gaussian jitter and re-normalized, so the
+neighbourhood structure resembles the real data. Queries are jittered
+corpus vectors as well. Build parameters come from config/settings.py.
+
+Needs INDEX_DIR from setup.py; the hnsw rows need hnswlib.
+
+Usage (from the repo root):
+    python offline_processing/benchmark_ann.py --scales 10 100 --k 15
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from config import settings
+from embedding.compression import QuantizedMatrix
+from retrieval.ann_index import ANN_INDEXES
+from retrieval.index_store import load_vectors
+
+
+def normalize(X):
+    return X / np.linalg.norm(X, axis=1, keepdims=True)
+
+
+def scaled_corpus(base, scale, noise, rng):
+    rows = np.tile(np.arange(len(base)), scale)
+    X = base[rows] + rng.normal(scale=noise / np.sqrt(base.shape[1]), size=(len(rows), base.shape[1]))
+    return normalize(X.astype(np.float32))
+
+
+def exact_top_k(X, Q, k):
+    scores = X @ Q.T
+    top = np.argpartition(-scores, k - 1, axis=0)[:k]
+    return [set(top[:, j].tolist()) for j in range(Q.shape[0])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--k", type=int, default=settings.SEARCH_K)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.3, help="jitter norm relative to the unit vectors")
+    parser.add_argument("--kinds", nargs="+", default=sorted(ANN_INDEXES))
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    _, matrix = load_vectors()
+    base = normalize(matrix.rows(np.arange(matrix.shape[0])))
+    print(f"Base corpus: {base.shape[0]} vectors, {base.shape[1]}-d, k={args.k}, "
+          f"refine x{settings.ANN_REFINE}\n")
+
+    for scale in args.scales:
+        X = scaled_corpus(base, scale, args.noise, rng)
+        Q = normalize(X[rng.choice(len(X), size=args.queries, replace=False)]
+                      + rng.normal(scale=args.noise / np.sqrt(X.shape[1]), size=(args.queries, X.shape[1])))
+        Q = Q.astype(np.float32)
+        truth = exact_top_k(X, Q, args.k)
+        exact = QuantizedMatrix(X)
+
+        start = time.perf_counter()
+        for q in Q:
+            exact_scores = exact.dot(q)
+            np.argpartition(-exact_scores, args.k - 1)[:args.k]
+        exact_ms = (time.perf_counter() - start) / len(Q) * 1000
+        print(f"scale x{scale}: {len(X)} vectors, exact scan {exact_ms:.2f}ms/query, "
+              f"{X.nbytes / 1e6:.1f} MB")
+
+        for kind in args.kinds:
+            try:
+                start = time.perf_counter()
+                index = ANN_INDEXES[kind]().build(X)
+                build_s = time.perf_counter() - start
+            except ImportError as e:
+                print(f"  {kind:<6} skipped: {e}")
+                continue
+
+            latencies, recalls = [], []
+            for q, expected in zip(Q, truth):
+                start = time.perf_counter()
+                rows, scores = index.search(q, args.k * max(1, settings.ANN_REFINE))
+                if settings.ANN_REFINE > 1 and len(rows):
+                    rows = rows[np.argsort(-(X[rows] @ q))]
+                rows = rows[:args.k]
+                latencies.append((time.perf_counter() - start) * 1000)
+                recalls.append(len(expected & set(rows.tolist())) / args.k)
+
+            print(f"  {kind:<6} recall@{args.k}: {np.mean(recalls):.3f}   "
+                  f"mean: {np.mean(latencies):6.2f}ms   p95: {np.percentile(latencies, 95):6.2f}ms   "
+                  f"index: {index.nbytes / 1e6:7.1f} MB   build: {build_s:6.1f}s")
+        print()
+
+
+if __name__ == "__main__":
+    main()
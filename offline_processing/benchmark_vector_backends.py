@@ -0,0 +1,61 @@
+"""
+Latency and result agreement of the review store backends (Chroma vs the
+NumPy exact index) on filtered and unfiltered queries.
+
+Needs ./chroma_db and INDEX_DIR from setup.py.
+
+Usage (from the repo root):
+    python offline_processing/benchmark_vector_backends.py
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from config import settings
+from embedding.registry import get_embeddings
+from retrieval.stores import load_review_store
+
+K = settings.SEARCH_K
+REPEATS = 5
+
+embeddings = get_embeddings()
+stores = {backend: load_review_store(embeddings, backend) for backend in ("chroma", "numpy")}
+numpy_store = stores["numpy"]
+
+# one filtered query per course (plus unfiltered variants)
+courses = sorted({d.metadata["course_name"] for d in numpy_store.docs})
+cases = []
+for course in courses[:50]:
+    query = f"מה דעת הסטודנטים על {course}?"
+    cases.append((query, None))
+    cases.append((query, {"course_name": {"$eq": course}}))
+
+# warm the embedding cache so both backends are timed on search only
+for query, _ in cases:
+    embeddings.embed_query(query)
+
+print(f"{len(cases)} queries, k={K}, {len(numpy_store.docs)} chunks\n")
+results = {}
+for backend, store in stores.items():
+    latencies = {"filtered": [], "unfiltered": []}
+    results[backend] = []
+    for query, where in cases:
+        start = time.perf_counter()
+        for _ in range(REPEATS):
+            docs = store.similarity_search(query, k=K, filter=where)
+        latencies["filtered" if where else "unfiltered"].append((time.perf_counter() - start) / REPEATS * 1000)
+        results[backend].append({d.metadata.get("id") for d in docs})
+
+    for kind, values in latencies.items():
+        print(f"  {backend:<7} {kind:<11} mean: {np.mean(values):7.2f}ms   p95: {np.percentile(values, 95):7.2f}ms")
+
+overlap = np.mean([
+    len(a & b) / max(len(a), 1) for a, b in zip(results["chroma"], results["numpy"])
+])
+print(f"\nTop-{K} overlap between backends: {overlap:.3f}")
@@ -0,0 +1,79 @@
+"""
+Recall@15 vs memory footprint for the vector storage options in
+embedding/compression.py, measured against exact float32 search.
+
+Needs the chunks written by setup.py (index_store/chunks.json). Vectors come
+from the shared embedding cache, so after ingestion this does no new encoding
+for the passages.
+
+Usage (from the repo root):
+    python offline_processing/benchmark_vector_compression.py
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from embedding.compression import QuantizedMatrix, VectorCompressor
+from embedding.registry import get_embeddings
+from retrieval.index_store import load_chunks
+
+K = 15
+DIMS = [1024, 512, 384, 256, 128]
+DTYPES = ["float32", "float16", "int8"]
+METHODS = ["pca", "truncate"]
+
+# -----------------------------
+# Corpus + queries
+# -----------------------------
+docs = load_chunks()
+embeddings = get_embeddings()
+X = np.asarray(embeddings.embed_documents([d.page_content for d in docs]), dtype=np.float32)
+
+with open(BASE_DIR / "data" / "cleaned_reviews.json", encoding="utf-8") as f:
+    courses = json.load(f)
+
+templates = [
+    "מה דעת הסטודנטים על הקורס {course}?",
+    "איך המרצה {lecturer}?",
+    "האם הקורס {course} קשה?",
+    "האם כדאי לקחת את {course} עם {lecturer}?",
+]
+queries = [t.format(course=c["course_name"], lecturer=c["lecturer"]) for c in courses for t in templates]
+Q = np.asarray([embeddings.embed_query(q) for q in queries], dtype=np.float32)
+print(f"Corpus: {X.shape[0]} chunks x {X.shape[1]}-d   Queries: {len(queries)}\n")
+
+# exact float32 top-k is the ground truth
+truth = np.argpartition(-(Q @ X.T), K, axis=1)[:, :K]
+
+
+def recall_at_k(compressor: VectorCompressor) -> tuple[float, int]:
+    codes, scales = compressor.compress(X)
+    matrix = QuantizedMatrix(codes, scales)
+    scores = matrix.dot(compressor.project(Q)).T          # (queries, chunks)
+    top = np.argpartition(-scores, K, axis=1)[:, :K]
+    recall = np.mean([len(set(a) & set(b)) / K for a, b in zip(truth, top)])
+    return recall, matrix.nbytes
+
+
+# -----------------------------
+# Sweep
+# -----------------------------
+print(f"{'projection':<10} {'dim':>5} {'dtype':<8} {'recall@15':>10} {'bytes/vec':>10} {'total MB':>9}")
+print("-" * 58)
+configs = [VectorCompressor("none", dtype=dtype) for dtype in DTYPES]
+for method in METHODS:
+    for dim in DIMS:
+        if dim < X.shape[1] and not (method == "pca" and dim > X.shape[0]):
+            configs += [VectorCompressor(method, dim, dtype).fit(X) for dtype in DTYPES]
+
+for compressor in configs:
+    recall, nbytes = recall_at_k(compressor)
+    dim = compressor.dim or X.shape[1]
+    print(f"{compressor.method:<10} {dim:>5} {compressor.dtype:<8} {recall:>10.3f} "
+          f"{nbytes / len(X):>10.0f} {nbytes / 1e6:>9.2f}")
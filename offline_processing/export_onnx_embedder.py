@@ -0,0 +1,102 @@
+"""
+Exports multilingual-e5 to an int8-quantized ONNX model and checks that its
+vectors agree with the PyTorch (SentenceTransformer) vectors on our review corpus.
+
+Usage (from the repo root):
+    python offline_processing/export_onnx_embedder.py
+    python offline_processing/export_onnx_embedder.py --skip-export --samples 1000
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from config import settings
+from embedding.embedder import PASSAGE_PREFIX, QUERY_PREFIX
+from embedding.onnx_backend import OnnxE5Encoder, export_quantized
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--model", default=settings.EMBEDDING_MODEL)
+parser.add_argument("--out-dir", default=settings.EMBEDDING_ONNX_DIR)
+parser.add_argument("--skip-export", action="store_true")
+parser.add_argument("--samples", type=int, default=500, help="number of reviews to compare")
+parser.add_argument("--min-cosine", type=float, default=0.98)
+args = parser.parse_args()
+
+# -----------------------------
+# Export + quantize
+# -----------------------------
+if not args.skip_export:
+    start = time.perf_counter()
+    path = export_quantized(args.model, args.out_dir)
+    print(f"✓ Quantized model written to {path} ({time.perf_counter() - start:.1f}s)")
+
+# -----------------------------
+# Load review corpus
+# -----------------------------
+with open(BASE_DIR / "data" / "cleaned_reviews.json", encoding="utf-8") as f:
+    data = json.load(f)
+
+reviews = [r["content"] for course in data for r in course["reviews"]][:args.samples]
+queries = [f"חוות דעת על {course['course_name']} עם {course['lecturer']}" for course in data][:100]
+print(f"Comparing on {len(reviews)} reviews and {len(queries)} queries")
+
+# -----------------------------
+# Encode with both backends
+# -----------------------------
+from sentence_transformers import SentenceTransformer
+
+torch_model = SentenceTransformer(args.model, device="cpu")
+onnx_model = OnnxE5Encoder(args.out_dir)
+
+
+def timed_encode(model, texts, prefix):
+    start = time.perf_counter()
+    vectors = model.encode([prefix + t for t in texts], normalize_embeddings=True)
+    return np.asarray(vectors, dtype=np.float32), time.perf_counter() - start
+
+
+def single_query_latency(model, texts):
+    start = time.perf_counter()
+    for t in texts:
+        model.encode([QUERY_PREFIX + t], normalize_embeddings=True)
+    return (time.perf_counter() - start) / len(texts) * 1000
+
+
+torch_docs, torch_time = timed_encode(torch_model, reviews, PASSAGE_PREFIX)
+onnx_docs, onnx_time = timed_encode(onnx_model, reviews, PASSAGE_PREFIX)
+torch_queries, _ = timed_encode(torch_model, queries, QUERY_PREFIX)
+onnx_queries, _ = timed_encode(onnx_model, queries, QUERY_PREFIX)
+
+# -----------------------------
+# Agreement report
+# -----------------------------
+doc_cos = (torch_docs * onnx_docs).sum(axis=1)
+query_cos = (torch_queries * onnx_queries).sum(axis=1)
+
+# do the quantized queries still retrieve the same passages from a torch-built index?
+k = min(15, len(reviews))
+torch_top = np.argsort(-(torch_queries @ torch_docs.T), axis=1)[:, :k]
+onnx_top = np.argsort(-(onnx_queries @ torch_docs.T), axis=1)[:, :k]
+overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(torch_top, onnx_top)])
+
+print("\n── Cosine agreement (torch vs onnx-int8) ────────────")
+print(f"  passages   mean: {doc_cos.mean():.4f}   p1: {np.percentile(doc_cos, 1):.4f}   min: {doc_cos.min():.4f}")
+print(f"  queries    mean: {query_cos.mean():.4f}   p1: {np.percentile(query_cos, 1):.4f}   min: {query_cos.min():.4f}")
+print(f"  top-{k} overlap against the torch index: {overlap:.3f}")
+
+print("\n── Latency ──────────────────────────────────────────")
+print(f"  batch encode {len(reviews)} passages   torch: {torch_time:.2f}s   onnx: {onnx_time:.2f}s")
+print(f"  single query                    torch: {single_query_latency(torch_model, queries[:20]):.1f}ms"
+      f"   onnx: {single_query_latency(onnx_model, queries[:20]):.1f}ms")
+
+ok = doc_cos.min() >= args.min_cosine and query_cos.min() >= args.min_cosine
+print(f"\n{'✓ ONNX backend agrees with PyTorch' if ok else '✗ Agreement below --min-cosine, keep EMBEDDING_BACKEND=torch'}")
+sys.exit(0 if ok else 1)
@@ -0,0 +1,83 @@
+"""
+Exports the cross-encoder reranker to an int8-quantized ONNX model and checks
+that it orders our review passages like the PyTorch model.
+
+Usage (from the repo root):
+    python offline_processing/export_onnx_reranker.py
+    python offline_processing/export_onnx_reranker.py --skip-export --queries 50
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from config import settings
+from reranker.cross_encoder import OnnxCrossEncoder, export_quantized
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--model", default=settings.RERANKER_MODEL)
+parser.add_argument("--out-dir", default=settings.RERANKER_ONNX_DIR)
+parser.add_argument("--skip-export", action="store_true")
+parser.add_argument("--queries", type=int, default=30)
+parser.add_argument("--passages", type=int, default=20, help="passages reranked per query")
+parser.add_argument("--top-n", type=int, default=settings.RERANK_TOP_N)
+parser.add_argument("--min-overlap", type=float, default=0.9)
+args = parser.parse_args()
+
+# -----------------------------
+# Export + quantize
+# -----------------------------
+if not args.skip_export:
+    start = time.perf_counter()
+    path = export_quantized(args.model, args.out_dir)
+    print(f"✓ Quantized reranker written to {path} ({time.perf_counter() - start:.1f}s)")
+
+# -----------------------------
+# Queries: one per course, passages: that course's reviews
+# -----------------------------
+with open(BASE_DIR / "data" / "cleaned_reviews.json", encoding="utf-8") as f:
+    data = json.load(f)
+
+cases = [
+    (f"מה דעת הסטודנטים על {course['course_name']} עם {course['lecturer']}?",
+     [r["content"] for r in course["reviews"][:args.passages]])
+    for course in data if len(course["reviews"]) > args.top_n
+][:args.queries]
+print(f"Comparing on {len(cases)} queries")
+
+from sentence_transformers import CrossEncoder
+
+torch_model = CrossEncoder(args.model, device="cpu", max_length=settings.RERANKER_MAX_LENGTH)
+onnx_model = OnnxCrossEncoder(args.out_dir, max_length=settings.RERANKER_MAX_LENGTH)
+
+overlaps, torch_time, onnx_time = [], 0.0, 0.0
+for query, passages in cases:
+    pairs = [(query, p) for p in passages]
+
+    start = time.perf_counter()
+    torch_scores = np.asarray(torch_model.predict(pairs, batch_size=settings.RERANKER_BATCH_SIZE))
+    torch_time += time.perf_counter() - start
+
+    start = time.perf_counter()
+    onnx_scores = onnx_model.predict(pairs, batch_size=settings.RERANKER_BATCH_SIZE)
+    onnx_time += time.perf_counter() - start
+
+    top_torch = set(np.argsort(-torch_scores)[:args.top_n])
+    top_onnx = set(np.argsort(-onnx_scores)[:args.top_n])
+    overlaps.append(len(top_torch & top_onnx) / args.top_n)
+
+overlap = float(np.mean(overlaps))
+print(f"\n  top-{args.top_n} overlap (torch vs onnx-int8): {overlap:.3f}")
+print(f"  time per query ({args.passages} pairs)   torch: {torch_time / len(cases) * 1000:.0f}ms"
+      f"   onnx: {onnx_time / len(cases) * 1000:.0f}ms")
+
+ok = overlap >= args.min_overlap
+print(f"\n{'✓ ONNX reranker agrees with PyTorch' if ok else '✗ Overlap below --min-overlap, keep RERANKER_BACKEND=torch'}")
+sys.exit(0 if ok else 1)
@@ -1,9 +1,60 @@
 import os
+import json
 from openai import OpenAI
 from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type
 from dotenv import load_dotenv
+from queryProcess.gazetteer import get_gazetteer
+from util.llm_cache import cached_completion, is_json
 load_dotenv()
 
+_openai = None
+
+def openai_client() -> OpenAI:
+    """One OpenAI client per process (connection pool reused across calls)."""
+    global _openai
+    if _openai is None:
+        _openai = OpenAI()
+    return _openai
+
+UNDERSTAND_PROMPT = """
+You are the query understanding step of a RAG system about university courses and lecturers.
+
+You are given:
+- A user query
+- Conversation context metadata: {conv_state_str}
+
+In ONE pass:
+
+1) REWRITE the query to be clearer and explicit for retrieval.
+   - Keep the meaning exactly the same, same language as the input.
+   - Resolve ambiguous references ("the course", "he", "this lecturer") ONLY from the conversation context.
+   - Fix spelling mistakes but keep course and lecturer names exactly as written.
+   - Do NOT answer the query.
+
+2) EXTRACT the course name(s) and lecturer name(s) explicitly mentioned in the ORIGINAL query only.
+   - Do NOT include entities added during rewriting. Do NOT guess.
+
+3) SPLIT the rewritten query into sub-queries ONLY when it compares or mentions TWO OR MORE distinct
+   named entities (two lecturers, two courses, ...): one standalone sub-query per entity, each keeping
+   the full context (course, metric, year, ...). Otherwise return the rewritten query as the only sub-query.
+
+4) ROUTE each sub-query:
+   - "sql": numeric / factual data from tables (grades, averages, prerequisites, course lists)
+   - "semantic": opinions and experiences from student reviews
+
+Output format (STRICT JSON only, no explanations):
+
+{{
+  "rewritten_query": "...",
+  "course": [],
+  "lecturer": [],
+  "subqueries": [{{"query": "...", "route": "sql" | "semantic"}}]
+}}
+
+User query:
+"{query}"
+"""
+
 class QueryEnhancer:
     """
     Rewrites and expands user queries to improve retrieval quality in RAG.
@@ -17,14 +68,17 @@ class QueryEnhancer:
         )
         self.model_name = model_name
 
+    SAMPLING = {"temperature": 0.2, "top_p": 0.7, "max_tokens": 8192}
+
+    def _call_llm(self, prompt: str, site: str = "query_enhancer"):
+        return cached_completion(site, self.model_name, prompt, self.SAMPLING, lambda: self._stream(prompt))
+
     @retry(wait=wait_exponential(multiplier=1, min=4, max=10), stop=stop_after_attempt(5), retry=retry_if_exception_type(Exception))
-    def _call_llm(self, prompt: str):
+    def _stream(self, prompt: str):
         response = self.client.chat.completions.create(
             model=self.model_name,
             messages=[{"role": "user", "content": prompt}],
-            temperature=0.2,
-            top_p=0.7,
-            max_tokens=8192,
+            **self.SAMPLING,
             extra_body={"chat_template_kwargs": {"thinking":False}},
             stream=True
         )
@@ -69,20 +123,7 @@ class QueryEnhancer:
           Rewritten query:
         """
 
-        response = self.client.chat.completions.create(
-            model=self.model_name,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.2,
-            top_p=0.7,
-            max_tokens=8192,
-            extra_body={"chat_template_kwargs": {"thinking":False}},
-            stream=True
-        )
-        result = ""
-        for chunk in response:
-          if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content is not None:
-            # print(chunk.choices[0].delta.content, end="")
-            result += chunk.choices[0].delta.content
+        result = self._call_llm(prompt, site="rewrite")
         
         print("finished rewrite")
         return result.strip()
@@ -92,6 +133,11 @@ class QueryEnhancer:
         Sends the query to an NIM model to get a rewritten/expanded version.
         """
         print("Entered keyword_extraction")
+        # names matched exactly, nothing vague: no LLM needed
+        entities = get_gazetteer().confident_extract(query)
+        if entities is not None:
+            return json.dumps(entities, ensure_ascii=False)
+
         prompt = f"""
         You are an information extraction system.
         Task:
@@ -113,20 +159,7 @@ class QueryEnhancer:
         - Some courses names might include versions, for example Algebra b, extract them as well.
         - Some lecturer names comes with their surrnames and some don't; extract what appears in the query.
         """
-        response = self.client.chat.completions.create(
-            model=self.model_name,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.2,
-            top_p=0.7,
-            max_tokens=8192,
-            extra_body={"chat_template_kwargs": {"thinking":False}},
-            stream=True
-        )
-        result = ""
-        for chunk in response:
-          if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content is not None:
-            # print(chunk.choices[0].delta.content, end="")
-            result += chunk.choices[0].delta.content
+        result = self._call_llm(prompt, site="keyword_extraction")
         print("finished keyword_extraction")
         return result.strip()
 
@@ -163,25 +196,18 @@ class QueryEnhancer:
           ['<subquery>', ...]
         """
 
-        response = self.client.chat.completions.create(
-            model=self.model_name,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.2,
-            top_p=0.7,
-            max_tokens=8192,
-            extra_body={"chat_template_kwargs": {"thinking":False}},
-            stream=True
-        )
-        result = ""
-        for chunk in response:
-          if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content is not None:
-            # print(chunk.choices[0].delta.content, end="")
-            result += chunk.choices[0].delta.content
+        result = self._call_llm(prompt, site="split_query")
         print("finished split_query")
         return result
     
     @retry(wait=wait_exponential(multiplier=1, min=4, max=10), stop=stop_after_attempt(5), retry=retry_if_exception_type(Exception))
     def rewrite_and_extract(self, query: str, conv_state_str: str) -> str:
+      # no conversation state, exact course / lecturer mentions and no vague
+      # references: rewrite locally (official names) and skip the LLM
+      gazetteer = get_gazetteer()
+      entities = None if conv_state_str else gazetteer.confident_extract(query)
+      if entities is not None:
+        return json.dumps({"rewritten_query": gazetteer.canonicalize(query), **entities}, ensure_ascii=False)
 
       prompt = f"""
 You are a query rewriting and information extraction system.
@@ -230,13 +256,37 @@ Output format (STRICT JSON only, no explanations):
 User query:
 "{query}"
 """
-      client = OpenAI()
-      response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-          {"role": "user", "content": prompt}
-        ],
-        temperature=0.7
-    )
-      res = response.choices[0].message.content
-      return res
\ No newline at end of file
+      def call():
+        response = openai_client().chat.completions.create(
+          model="gpt-4o-mini",
+          messages=[
+            {"role": "user", "content": prompt}
+          ],
+          temperature=0.7
+        )
+        return response.choices[0].message.content
+
+      return cached_completion("rewrite_and_extract", "gpt-4o-mini", prompt, {"temperature": 0.7}, call,
+                               validate=is_json)
+
+    @retry(wait=wait_exponential(multiplier=1, min=4, max=10), stop=stop_after_attempt(5), retry=retry_if_exception_type(Exception))
+    def understand(self, query: str, conv_state_str: str) -> str:
+      """
+      rewrite_and_extract + split_query + a route hint per sub-query in a
+      single structured-output call. Returns the JSON string.
+      """
+      prompt = UNDERSTAND_PROMPT.format(conv_state_str=conv_state_str, query=query)
+
+      def call():
+        response = openai_client().chat.completions.create(
+          model="gpt-4o-mini",
+          messages=[
+            {"role": "user", "content": prompt}
+          ],
+          response_format={"type": "json_object"},
+          temperature=0.2
+        )
+        return response.choices[0].message.content
+
+      params = {"temperature": 0.2, "response_format": "json_object"}
+      return cached_completion("understand", "gpt-4o-mini", prompt, params, call, validate=is_json)
@@ -0,0 +1,449 @@
+"""
+Local course / lecturer alias resolution (gazetteer).
+
+Every known name comes from data/Ids.json, data/cleaned_reviews.json and
+nicknames/course_nicknames.json (nickname -> official course name). Names
+are normalized and inserted word by word into a trie; a query is matched by
+walking the trie from every word position (leftmost-longest, non-overlapping).
+
+Normalization: NFKC, nikud removed, geresh / gershayim and quotes removed
+(חדו"א == חדוא), final letters folded (ם -> מ), latin lowercased.
+Per word, besides the exact form:
+- plene / defective spelling: words of 5+ letters equal once the inner
+  ו / י are dropped (דיפרנציאלי == דפרנציאלי) match as spelling variants;
+- typos: a word may be off by 1 edit (5+ letters) or 2 edits (9+ letters);
+  candidates come from a character bigram index and are verified with a
+  bounded Damerau-Levenshtein distance. Words common in the reviews
+  (החומר, בחינה, ...) are real words and are never read as typos.
+Variants and typos are only tried on words that are not common in the
+reviews, and only inside a multi-word alias: a one-word alias (אימות,
+מערכות, אוריה) matches exactly or not at all, otherwise everyday words
+(איכות, מערכת, אחריה) turn into names.
+The first word of a match may carry a ב / ה / ל / ו prefix (ובחדוא).
+
+Every match carries the official name, its character span in the query,
+whether it was fuzzy (variant / typo) and the course_id values of its
+offerings in the review data. A fuzzy match is a guess: extract() and
+canonicalize() leave it out unless asked for / confirmed by the LLM
+extraction, and confident_extract() returns None (use the LLM) when the
+query has one, or has a vague reference (הזה, שלו, "הקורס" without a name).
+extract() returns the same {"course": [...], "lecturer": [...]} shape as
+the LLM extractors.
+
+Regression check (from the repo root):
+    python queryProcess/gazetteer.py
+"""
+
+import json
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
+
+BASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+IDS_FILE = os.path.join(BASE_DIR, 'data', 'Ids.json')
+REVIEWS_FILE = os.path.join(BASE_DIR, 'data', 'cleaned_reviews.json')
+NICKNAMES_FILE = os.path.join(BASE_DIR, 'nicknames', 'course_nicknames.json')
+
+PREFIXES = "בהלו"
+FINAL_LETTERS = str.maketrans("ךםןףץ", "כמנפצ")
+MIN_FUZZY_LEN = 5
+MIN_VARIANT_LEN = 5
+MIN_TWO_EDITS_LEN = 9
+# a word this frequent in the reviews is a real word, not a typo of a name
+COMMON_WORD_MIN_COUNT = 3
+
+_NIKUD = re.compile(r"[֑-ׇ]")
+_QUOTES = re.compile(r"[\"'`׳״‘’“”]")
+_WORD = re.compile(r"[0-9A-Za-z֐-׿\"'`׳״‘’“”]+")
+
+# how a word matched, best first
+EXACT, VARIANT, TYPO = 0, 1, 2
+
+# references the LLM rewrite resolves from the conversation state
+_VAGUE_WORDS = (
+    "הזה", "הזאת", "הזו", "ההוא", "ההיא", "האלה", "האלו", "הללו", "הנל", "האחרון", "הקודם",
+    "שלו", "שלה", "שלהם", "שלהן", "אותו", "אותה", "אותם", "אותן", "אצלו", "אצלה", "איתו", "איתה",
+    "עליו", "עליה", "ממנו", "ממנה", "לו", "לה", "בו", "בה", "הוא", "היא", "הם", "הן",
+    "this", "that", "these", "those", "he", "she", "him", "his", "her", "it", "its", "they", "them", "their",
+)
+# vague unless a name follows ("הקורס מבני נתונים")
+_HEAD_WORDS = (
+    "הקורס", "הקורסים", "המרצה", "המרצים", "המרצות", "המתרגל", "המתרגלת",
+    "בקורס", "לקורס", "מהקורס", "שהקורס", "למרצה", "מהמרצה", "שהמרצה", "course", "lecturer",
+)
+
+
+def normalize_word(word: str) -> str:
+    word = unicodedata.normalize("NFKC", word)
+    word = _NIKUD.sub("", word)
+    word = _QUOTES.sub("", word)
+    return word.translate(FINAL_LETTERS).lower()
+
+
+def words(text: str):
+    """(start, end, normalized word) for every word of text, offsets into the original."""
+    out = []
+    for m in _WORD.finditer(text):
+        norm = normalize_word(m.group())
+        if norm:
+            out.append((m.start(), m.end(), norm))
+    return out
+
+
+def normalize(text: str) -> str:
+    return " ".join(w for _, _, w in words(text))
+
+
+VAGUE_WORDS = frozenset(normalize_word(w) for w in _VAGUE_WORDS)
+HEAD_WORDS = frozenset(normalize_word(w) for w in _HEAD_WORDS)
+
+
+def skeleton(word: str) -> str:
+    """word without its inner ו / י (plene and defective spellings agree)."""
+    return word[:1] + re.sub("[וי]", "", word[1:])
+
+
+def bigrams(word: str) -> set:
+    padded = f"^{word}$"
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+def max_edits(word: str) -> int:
+    if len(word) >= MIN_TWO_EDITS_LEN:
+        return 2
+    return 1 if len(word) >= MIN_FUZZY_LEN else 0
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Damerau-Levenshtein (adjacent transpositions), or limit + 1 once it is exceeded."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], before[j - 2] + 1)
+        if min(cur) > limit:
+            return limit + 1
+        before, prev = prev, cur
+    return prev[-1]
+
+
+@dataclass
+class EntityMatch:
+    kind: str           # "course" | "lecturer"
+    name: str           # official name
+    start: int          # span in the original text (after any prefix letter)
+    end: int
+    fuzzy: bool = False     # matched through a spelling variant or a typo
+    ids: tuple = field(default_factory=tuple)   # course_id of every offering in the reviews
+
+
+class _Node:
+    __slots__ = ("children", "entities", "official")
+
+    def __init__(self):
+        self.children = {}
+        self.entities = []      # (kind, official name) of aliases ending here
+        self.official = []      # the subset whose official name is exactly this alias
+
+
+class Gazetteer:
+    def __init__(self):
+        self.root = _Node()
+        self.vocab = set()
+        self.skeletons = {}     # skeleton -> vocabulary words (5+ letters)
+        self.grams = {}         # character bigram -> vocabulary words (5+ letters)
+        self.common = set()     # frequent review words, never typos
+        self.ids = {}           # (kind, official name) -> course ids
+
+    # ------------------------------------------------------------------
+    # build
+    # ------------------------------------------------------------------
+    def add(self, alias: str, kind: str, name: str):
+        tokens = [w for _, _, w in words(alias)]
+        if not tokens or not name.strip():
+            return
+        node = self.root
+        for token in tokens:
+            node = node.children.setdefault(token, _Node())
+            if token not in self.vocab:
+                self.vocab.add(token)
+                if len(token) >= MIN_VARIANT_LEN:
+                    self.skeletons.setdefault(skeleton(token), set()).add(token)
+                if len(token) >= MIN_FUZZY_LEN:
+                    for gram in bigrams(token):
+                        self.grams.setdefault(gram, set()).add(token)
+        if (kind, name) not in node.entities:
+            node.entities.append((kind, name))
+        # "אלגוריתמים" is both a course and a nickname of another one: the course wins
+        if normalize(alias) == normalize(name) and (kind, name) not in node.official:
+            node.official.append((kind, name))
+
+    def add_id(self, kind: str, name: str, entity_id: str):
+        ids = self.ids.setdefault((kind, name), [])
+        if entity_id not in ids:
+            ids.append(entity_id)
+
+    @classmethod
+    def from_files(cls, ids_file=IDS_FILE, reviews_file=REVIEWS_FILE, nicknames_file=NICKNAMES_FILE):
+        gazetteer = cls()
+
+        def add_lecturers(value):
+            # some rows list several lecturers: "a | b"
+            names = [name.strip() for name in value.split("|")]
+            for name in names:
+                gazetteer.add(name, "lecturer", name)
+            return names
+
+        if os.path.exists(ids_file):
+            with open(ids_file, encoding="utf-8") as f:
+                for table in json.load(f):
+                    for row in table.get("data", []):
+                        gazetteer.add(row["course"], "course", row["course"].strip())
+                        add_lecturers(row["lecture"])
+
+        if os.path.exists(reviews_file):
+            counts = Counter()
+            with open(reviews_file, encoding="utf-8") as f:
+                for course in json.load(f):
+                    name = course["course_name"].strip()
+                    gazetteer.add(name, "course", name)
+                    gazetteer.add_id("course", name, course["course_id"])
+                    for lecturer in add_lecturers(course["lecturer"]):
+                        gazetteer.add_id("lecturer", lecturer, course["course_id"])
+                    for review in course["reviews"]:
+                        counts.update(w for _, _, w in words(review["content"]) if len(w) >= MIN_FUZZY_LEN)
+            gazetteer.common = {w for w, n in counts.items() if n >= COMMON_WORD_MIN_COUNT}
+
+        if os.path.exists(nicknames_file):
+            with open(nicknames_file, encoding="utf-8") as f:
+                nicknames = json.load(f)
+            courses = {name for kind, name in gazetteer._official_entities() if kind == "course"}
+            for alias, official in nicknames.items():
+                # a few entries point at another nickname instead of a course name
+                seen = {alias}
+                while official in nicknames and official not in courses and official not in seen:
+                    seen.add(official)
+                    official = nicknames[official]
+                gazetteer.add(alias, "course", official)
+                gazetteer.add(official, "course", official)
+        return gazetteer
+
+    def _official_entities(self):
+        stack, out = [self.root], set()
+        while stack:
+            node = stack.pop()
+            out.update(node.official)
+            stack.extend(node.children.values())
+        return out
+
+    # ------------------------------------------------------------------
+    # matching
+    # ------------------------------------------------------------------
+    def _typos(self, token):
+        limit = max_edits(token)
+        if not limit or token in self.vocab:
+            return set()
+        grams = bigrams(token)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.grams.get(gram, ()))
+        # an edit touches at most 2 bigrams (3 for a transposition)
+        needed = len(grams) - 3 * limit
+        return {
+            word for word, count in shared.items()
+            if count >= needed and word != token and edit_distance(token, word, limit) <= limit
+        }
+
+    def _options(self, token, children):
+        """(child node, how it matched) for every child the token can stand for."""
+        options = []
+        if token in children:
+            options.append((children[token], EXACT))
+        if token in self.common:
+            # a real word: neither a spelling variant nor a typo of a name
+            return options
+        if len(token) >= MIN_VARIANT_LEN:
+            for word in self.skeletons.get(skeleton(token), ()):
+                if word != token and word in children:
+                    options.append((children[word], VARIANT))
+        for word in self._typos(token):
+            if word in children:
+                options.append((children[word], TYPO))
+        return options
+
+    def _first_word_options(self, token):
+        """(normalized word, prefix length) readings of a match's first word."""
+        options = [(token, 0)]
+        if len(token) > 2 and token[0] in PREFIXES:
+            options.append((token[1:], 1))
+            if len(token) > 3 and token[0] == "ו" and token[1] in PREFIXES[:-1]:
+                options.append((token[2:], 2))
+        return options
+
+    def _walk(self, tokens, start):
+        """Best (end index, entities, worst word match, prefix length) of an alias starting at tokens[start]."""
+        best, best_key = None, None
+        # (node, next index, worst word match so far, prefix length)
+        stack = []
+        for word, prefix in self._first_word_options(tokens[start][2]):
+            for child, how in self._options(word, self.root.children):
+                stack.append((child, start + 1, how, prefix))
+
+        while stack:
+            node, i, worst, prefix = stack.pop()
+            # a one-word alias only counts when matched exactly
+            if node.entities and (worst == EXACT or i - start > 1):
+                # longer wins; then exact over variant over typo, then the reading without a prefix
+                key = (i, -worst, -prefix)
+                if best is None or key > best_key:
+                    best, best_key = (i, node.official or node.entities, worst, prefix), key
+            if i >= len(tokens):
+                continue
+            for child, how in self._options(tokens[i][2], node.children):
+                stack.append((child, i + 1, max(worst, how), prefix))
+        return best
+
+    def find(self, text: str) -> list[EntityMatch]:
+        """Non-overlapping matches, left to right."""
+        tokens = words(text)
+        matches = []
+        i = 0
+        while i < len(tokens):
+            best = self._walk(tokens, i)
+            if best is None:
+                i += 1
+                continue
+            end, entities, worst, prefix = best
+            start_char = tokens[i][0] + self._prefix_offset(text, tokens[i][0], prefix)
+            for kind, name in entities:
+                matches.append(EntityMatch(kind, name, start_char, tokens[end - 1][1], worst != EXACT,
+                                           tuple(self.ids.get((kind, name), ()))))
+            i = end
+        return matches
+
+    @staticmethod
+    def _prefix_offset(text, start, prefix):
+        # skip `prefix` letters (and any nikud on them) of the original word
+        offset = 0
+        while prefix and start + offset < len(text):
+            offset += 1
+            if not _NIKUD.match(text[start + offset - 1]):
+                prefix -= 1
+        while start + offset < len(text) and _NIKUD.match(text[start + offset]):
+            offset += 1
+        return offset
+
+    def extract(self, text: str, fuzzy: bool = False) -> dict:
+        """{"course": [...], "lecturer": [...]} of official names, in order of appearance (fuzzy matches only if asked)."""
+        result = {"course": [], "lecturer": []}
+        for match in self.find(text):
+            if (fuzzy or not match.fuzzy) and match.name not in result[match.kind]:
+                result[match.kind].append(match.name)
+        return result
+
+    def confident_extract(self, text: str) -> dict | None:
+        """
+        extract() for the LLM-free fast paths: None when nothing is found, any
+        match is fuzzy, or the text has a vague reference the LLM should
+        resolve from the conversation state.
+        """
+        matches = self.find(text)
+        if not matches or any(match.fuzzy for match in matches):
+            return None
+        tokens = words(text)
+        for i, (_, _, word) in enumerate(tokens):
+            if word in VAGUE_WORDS:
+                return None
+            if word in HEAD_WORDS:
+                # "הקורס מבני נתונים" names the course, "הקורס" alone does not
+                follows = i + 1 < len(tokens) and any(
+                    tokens[i + 1][0] <= match.start < tokens[i + 1][1] for match in matches)
+                if not follows:
+                    return None
+        result = {"course": [], "lecturer": []}
+        for match in matches:
+            if match.name not in result[match.kind]:
+                result[match.kind].append(match.name)
+        return result
+
+    def resolve(self, name: str, kind: str | None = None) -> str | None:
+        """Official name for a whole extracted name ("אינפי 1" -> "חדוא 1"), None if unknown."""
+        tokens = words(name)
+        for match in self.find(name):
+            # the match has to cover every word of the name
+            if (kind is None or match.kind == kind) and match.start <= tokens[0][1] and match.end == tokens[-1][1]:
+                return match.name
+        return None
+
+    def canonicalize(self, text: str, confirmed=()) -> str:
+        """
+        text with every matched mention replaced by the official name. A fuzzy
+        match is replaced only if its name is in `confirmed` (names the LLM extracted).
+        """
+        out, last = [], 0
+        for match in self.find(text):
+            if match.start < last or (match.fuzzy and match.name not in confirmed):
+                continue
+            out.append(text[last:match.start])
+            out.append(match.name)
+            last = match.end
+        out.append(text[last:])
+        return "".join(out)
+
+
+_gazetteer = None
+_lock = threading.Lock()
+
+
+def get_gazetteer() -> Gazetteer:
+    """Process-wide gazetteer, built from the data files on first use."""
+    global _gazetteer
+    with _lock:
+        if _gazetteer is None:
+            _gazetteer = Gazetteer.from_files()
+        return _gazetteer
+
+
+if __name__ == "__main__":
+    # regression check: everyday words must not become names, real mentions must still match
+    import sys
+
+    gazetteer = Gazetteer.from_files()
+    not_names = [
+        "מה איכות ההוראה בקורס?", "האם יש תחרות על ציונים?", "מה מערכת השעות?", "מה קורה אחריה?",
+        "הקורס היה עמוסה מאוד", "עניינים של זמנים", "הסטודנטים לא הבינו את החומר",
+    ]
+    names = {
+        "ממוצע בחדוא 1": ("course", "חדוא 1", False),
+        "חוות דעת על מערכות הפעלה": ("course", "מערכות הפעלה", False),
+        "מה הקדמים של מבני נתנים?": ("course", "מבני נתונים", True),
+        "מה דעתם על יורי?": ("lecturer", "יורי", False),
+    }
+    vague = ["מה דעתם על יורי בקורס הזה?", "מה הממוצע בקורס?", "מה הציונים שלו בחדוא 1?", "מה הקדמים של מבני נתנים?"]
+
+    failures = []
+    for query in not_names:
+        found = [(m.kind, m.name) for m in gazetteer.find(query)]
+        if found:
+            failures.append(f"{query!r} -> {found}")
+    for query, expected in names.items():
+        found = [(m.kind, m.name, m.fuzzy) for m in gazetteer.find(query)]
+        if expected not in found:
+            failures.append(f"{query!r} -> {found}, expected {expected}")
+    for query in vague:
+        if gazetteer.confident_extract(query) is not None:
+            failures.append(f"{query!r} took the LLM-free path")
+    if gazetteer.canonicalize("מה הקדמים של מבני נתנים?") != "מה הקדמים של מבני נתנים?":
+        failures.append("unconfirmed fuzzy match rewritten by canonicalize()")
+
+    for failure in failures:
+        print("✗", failure)
+    print("✓ Gazetteer regression check passed" if not failures else f"✗ {len(failures)} failures")
+    sys.exit(1 if failures else 0)
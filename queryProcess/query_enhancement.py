@@ -1,32 +1,28 @@
-import os
 import re
 import json
-from openai import OpenAI
 from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
-
-# 1. Get the absolute path to the directory containing THIS script (query_enhancement)
-CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
-
-# 2. Build the path: go up one level ('..'), then into the 'nicknames' folder
-NICKNAMES_FILE_PATH = os.path.join(CURRENT_DIR, '..', 'nicknames', 'course_nicknames.json')
-
-# 3. Safely load the file, with a fallback just in case the path is slightly off
-try:
-    with open(NICKNAMES_FILE_PATH, 'r', encoding='utf-8') as f:
-        NICKNAMES_MAP = json.load(f)
-except FileNotFoundError:
-    print(f"⚠️ Warning: Could not find the file at {NICKNAMES_FILE_PATH}")
-    NICKNAMES_MAP = {} # Fallback to empty dict so the code doesn't completely crash
+from queryProcess.gazetteer import get_gazetteer
+from queryProcess.enhancer import openai_client
+from util.llm_cache import cached_completion
 
 def clean_query(query):
   # remove nikud
   query = re.sub(r"[\u0591-\u05C7]", "", query)
+  # abbreviations keep their letters together: חדו"א -> חדוא
+  query = re.sub(r"(?<=[א-ת])[\"'\u05F3\u05F4](?=[א-ת])", "", query)
   # remove punctuation
   query = re.sub(r"[^0-9א-ת ]", " ", query)
   # collapse spaces
   query = re.sub(r"\s+", " ", query).strip()
   return query
 
+def find_entities(query):
+  """
+  Courses (official names) and lecturers mentioned in the query, found by the
+  local gazetteer without an LLM call. Returns {"course": [...], "lecturer": [...]}.
+  """
+  return get_gazetteer().extract(query)
+
 def to_prompt_str(knowledge_base: dict):
     prompt_str = ""
     for key, values in knowledge_base.items():
@@ -57,11 +53,8 @@ def query_enhancement(query, query_enhancer, conv_state=None):
   metadata = {"course": result["course"], "lecturer": result["lecturer"]}
 
   # Update rewritten query with official course names
-  for i, old_name in enumerate(metadata["course"]):
-      new_name = NICKNAMES_MAP.get(old_name, old_name)
-      if old_name in rewritten:
-        rewritten = rewritten.replace(old_name, new_name)
-      metadata["course"][i] = new_name
+  metadata = _resolve_metadata(metadata)
+  rewritten = _official_names(rewritten, metadata)
 
   if conv_state:
     update_conv_state(conv_state, metadata)
@@ -69,6 +62,67 @@ def query_enhancement(query, query_enhancer, conv_state=None):
   
   return rewritten, metadata, conv_state
 
+def _official_names(text, metadata):
+  # every alias of a known course or lecturer -> its official name; a variant /
+  # typo only when the LLM extracted that name too
+  confirmed = set(metadata["course"]) | set(metadata["lecturer"])
+  return get_gazetteer().canonicalize(text, confirmed)
+
+def _resolve_metadata(metadata):
+  """LLM-extracted names mapped to official names (unknown names are kept as given)."""
+  gazetteer = get_gazetteer()
+  resolved = {}
+  for kind in ("course", "lecturer"):
+    names = []
+    for name in metadata.get(kind) or []:
+      name = gazetteer.resolve(name, kind) or name
+      if name not in names:
+        names.append(name)
+    resolved[kind] = names
+  return resolved
+
+def understand_query(query, query_enhancer, conv_state=None):
+  """
+  query_enhancement + split_query in at most one LLM call.
+
+  Fast path: if the gazetteer finds at least one and at most one course and
+  one lecturer, all matched exactly, and the query has no vague reference
+  (הזה, שלו, "הקורס" without a name, ...), there is nothing to split or to
+  resolve from conv_state, so no LLM is called. Otherwise one structured
+  call (QueryEnhancer.understand) returns the rewrite, the entities, the
+  sub-queries and a route hint each.
+
+  Returns rewritten, metadata, conv_state, subqueries, route_hints
+  (route_hints[i] is "sql" / "semantic" / None).
+  """
+  print("Entered understand_query")
+  query = clean_query(query)
+  local = get_gazetteer().confident_extract(query)
+
+  if local is not None and len(local["course"]) <= 1 and len(local["lecturer"]) <= 1:
+    print("Local fast path, entities:", local)
+    rewritten = get_gazetteer().canonicalize(query)
+    metadata = local
+    subqueries, route_hints = [rewritten], [None]
+  else:
+    conv_state_str = to_prompt_str(conv_state) if conv_state else ""
+    result = json.loads(query_enhancer.understand(query, conv_state_str))
+    metadata = _resolve_metadata(result)
+    rewritten = _official_names(result["rewritten_query"], metadata)
+
+    subqueries, route_hints = [], []
+    for sub in result.get("subqueries") or [rewritten]:
+      text = sub["query"] if isinstance(sub, dict) else sub
+      route = sub.get("route") if isinstance(sub, dict) else None
+      subqueries.append(_official_names(text, metadata))
+      route_hints.append(route if route in ("sql", "semantic") else None)
+
+  if conv_state:
+    update_conv_state(conv_state, metadata)
+    print("Updating conversation state with new metadata:", conv_state)
+
+  return rewritten, metadata, conv_state, subqueries, route_hints
+
 @retry(wait=wait_exponential(multiplier=1, min=4, max=10), stop=stop_after_attempt(5), retry=retry_if_exception_type(Exception))
 def split_query(query: str) -> str:
   prompt = f"""
@@ -130,17 +184,17 @@ Now decompose the following query:
 {query}
 """
 
-  client = OpenAI()
-  response = client.chat.completions.create(
-    model="gpt-4o-mini",
-    messages=[
-       {"role": "user", "content": prompt}
-    ],
-    temperature=0.7
-)
-
-  res = response.choices[0].message.content
-  return res
+  def call():
+    response = openai_client().chat.completions.create(
+      model="gpt-4o-mini",
+      messages=[
+         {"role": "user", "content": prompt}
+      ],
+      temperature=0.7
+    )
+    return response.choices[0].message.content
+
+  return cached_completion("split_query", "gpt-4o-mini", prompt, {"temperature": 0.7}, call)
 
 def clean_json_query(query):
   """
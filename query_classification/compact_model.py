@@ -0,0 +1,174 @@
+"""
+compact_model.py
+----------------
+The TF-IDF (char_wb n-grams) + LogisticRegression query classifier in a
+small NumPy artifact, scored without scikit-learn or joblib.
+
+query_classifier.npz holds:
+    keys        sorted 64-bit hashes of the vocabulary n-grams
+    idf         idf weight per n-gram (aligned with keys)
+    coef        logistic-regression weight per n-gram (aligned with keys)
+    intercept   bias of the positive class
+    classes     class labels (negative, positive)
+    ngram_range (min_n, max_n)
+    sublinear_tf 1 + log(tf) term weighting
+
+All queries of a request are scored together: their n-grams are hashed,
+looked up with one np.searchsorted, and TF-IDF weighting, L2 normalization
+and the weight dot product are done on the flat (row, column, count) arrays.
+
+Export (scikit-learn needed only here):
+    from query_classification.compact_model import export_compact
+    export_compact(pipeline, "query_classifier.npz")
+
+Equivalence check against the sklearn pipeline (from the repo root):
+    python query_classification/compact_model.py
+"""
+
+import hashlib
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+_COMPACT_PATH = Path(__file__).parent / "query_classifier.npz"
+_JOBLIB_PATH = Path(__file__).parent / "query_classifier.joblib"
+
+
+def ngram_hash(ngram: str) -> int:
+    return int.from_bytes(hashlib.blake2b(ngram.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def char_wb_ngrams(text: str, min_n: int, max_n: int) -> list[str]:
+    """Same n-grams as TfidfVectorizer(analyzer="char_wb", lowercase=True)."""
+    ngrams = []
+    for w in text.lower().split():
+        w = " " + w + " "
+        w_len = len(w)
+        for n in range(min_n, max_n + 1):
+            offset = 0
+            ngrams.append(w[offset:offset + n])
+            while offset + n < w_len:
+                offset += 1
+                ngrams.append(w[offset:offset + n])
+            if offset == 0:  # a short word is counted once
+                break
+    return ngrams
+
+
+def export_compact(pipeline, path=_COMPACT_PATH):
+    """Writes the fitted Pipeline([("tfidf", ...), ("clf", ...)]) as a compact .npz."""
+    tfidf = pipeline.named_steps["tfidf"]
+    clf = pipeline.named_steps["clf"]
+
+    # the scorer reproduces exactly this configuration
+    expected = {
+        "analyzer": "char_wb", "lowercase": True, "strip_accents": None, "preprocessor": None,
+        "binary": False, "use_idf": True, "norm": "l2",
+    }
+    params = tfidf.get_params()
+    unsupported = {k: params[k] for k, v in expected.items() if params[k] != v}
+    if unsupported:
+        raise ValueError(f"Unsupported TfidfVectorizer settings for the compact model: {unsupported}")
+    if len(clf.classes_) != 2:
+        raise ValueError("The compact model supports binary classifiers only")
+
+    ngrams = sorted(tfidf.vocabulary_, key=tfidf.vocabulary_.get)
+    keys = np.fromiter((ngram_hash(g) for g in ngrams), dtype=np.uint64, count=len(ngrams))
+    if len(np.unique(keys)) != len(keys):
+        raise ValueError("n-gram hash collision, cannot export")
+
+    order = np.argsort(keys)
+    np.savez_compressed(
+        path,
+        keys=keys[order],
+        idf=tfidf.idf_[order].astype(np.float32),
+        coef=clf.coef_[0][order].astype(np.float32),
+        intercept=np.float32(clf.intercept_[0]),
+        classes=np.asarray(clf.classes_),
+        ngram_range=np.asarray(tfidf.ngram_range, dtype=np.int32),
+        sublinear_tf=np.bool_(params["sublinear_tf"]),
+    )
+    return Path(path)
+
+
+class CompactClassifier:
+    """predict / predict_proba of the exported pipeline on plain NumPy."""
+
+    def __init__(self, path=_COMPACT_PATH):
+        with np.load(path) as data:
+            self.keys = data["keys"]
+            self.idf = data["idf"].astype(np.float64)
+            self.coef = data["coef"].astype(np.float64)
+            self.intercept = float(data["intercept"])
+            self.classes_ = data["classes"]
+            self.min_n, self.max_n = (int(n) for n in data["ngram_range"])
+            self.sublinear_tf = bool(data["sublinear_tf"])
+
+    def decision_function(self, queries: list[str]) -> np.ndarray:
+        rows, hashes, counts = [], [], []
+        for row, query in enumerate(queries):
+            for ngram, count in Counter(char_wb_ngrams(query, self.min_n, self.max_n)).items():
+                rows.append(row)
+                hashes.append(ngram_hash(ngram))
+                counts.append(count)
+        if not rows:
+            return np.full(len(queries), self.intercept)
+
+        rows = np.asarray(rows)
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        counts = np.asarray(counts, dtype=np.float64)
+
+        # vocabulary lookup for every n-gram of every query at once
+        cols = np.searchsorted(self.keys, hashes)
+        cols[cols == len(self.keys)] = 0
+        known = self.keys[cols] == hashes
+        rows, cols, counts = rows[known], cols[known], counts[known]
+
+        tf = 1.0 + np.log(counts) if self.sublinear_tf else counts
+        values = tf * self.idf[cols]
+        norms = np.sqrt(np.bincount(rows, weights=values ** 2, minlength=len(queries)))
+        dots = np.bincount(rows, weights=values * self.coef[cols], minlength=len(queries))
+        return dots / np.where(norms > 0, norms, 1.0) + self.intercept
+
+    def predict_proba(self, queries: list[str]) -> np.ndarray:
+        positive = 1.0 / (1.0 + np.exp(-self.decision_function(queries)))
+        return np.column_stack([1.0 - positive, positive])
+
+    def predict(self, queries: list[str]) -> np.ndarray:
+        return self.classes_[(self.decision_function(queries) > 0).astype(int)]
+
+
+if __name__ == "__main__":
+    # equivalence check: compact scorer vs the sklearn pipeline it was exported from
+    import json
+    import sys
+    import tempfile
+
+    import joblib
+
+    base_dir = Path(__file__).resolve().parent.parent
+    pipeline = joblib.load(_JOBLIB_PATH)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        compact = CompactClassifier(export_compact(pipeline, Path(tmp) / "model.npz"))
+
+    # probe with the sanity-check queries plus review sentences (many unseen n-grams)
+    queries = [
+        "מה הציון הממוצע בקורס מבני נתונים?", "חוות דעת על קורס מבני נתונים",
+        "How many students failed Operating Systems?", "Which professor is best for AI?",
+        "מה הקדמים של אלגוריתמים?", "האם קורס רשתות מעניין?", "", "   ", "a",
+    ]
+    with open(base_dir / "data" / "cleaned_reviews.json", encoding="utf-8") as f:
+        for course in json.load(f):
+            queries += [review["content"][:200] for review in course["reviews"][:3]]
+
+    expected_proba = pipeline.predict_proba(queries)
+    proba = compact.predict_proba(queries)
+    same_labels = (pipeline.predict(queries) == compact.predict(queries)).all()
+    max_diff = float(np.abs(expected_proba - proba).max())
+
+    print(f"{len(queries)} queries, labels identical: {same_labels}, max |Δproba|: {max_diff:.2e}")
+    ok = same_labels and max_diff < 1e-5
+    print("✓ Compact model matches the sklearn pipeline" if ok else "✗ Compact model differs from the sklearn pipeline")
+    sys.exit(0 if ok else 1)
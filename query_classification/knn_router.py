@@ -0,0 +1,72 @@
+"""
+knn_router.py
+-------------
+Routes a query as 'sql' or 'semantic' by its nearest labeled examples
+(train_classifier.py's sql_queries / semantic_queries) in the embedding
+space used for retrieval.
+
+The examples are embedded once (through the embedding cache, so restarts
+are free) into an L2-normalized NumPy matrix. Routing reuses the query
+vectors computed for retrieval: one (queries x examples) product, then a
+distance-weighted vote over the top-k neighbours, weight = 1 / (1 - cos + eps).
+
+Usage:
+    router = get_knn_router(embeddings)
+    router.route_vectors(query_vectors)
+    # → [{"type": "sql", "confidence": 0.83}, ...]   (same shape as QueryClassifier)
+"""
+
+import threading
+
+import numpy as np
+
+from config import settings
+from embedding.compression import embed_queries
+from query_classification.train_classifier import semantic_queries, sql_queries
+
+_EPS = 1e-6
+
+_lock = threading.Lock()
+_routers = {}
+
+
+class KNNRouter:
+    def __init__(self, embeddings, k: int = settings.KNN_ROUTER_K):
+        texts = sql_queries + semantic_queries
+        matrix = np.asarray(embed_queries(embeddings, texts), dtype=np.float32)
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), _EPS)
+
+        self.matrix = matrix
+        self.is_sql = np.asarray([True] * len(sql_queries) + [False] * len(semantic_queries))
+        self.k = min(k, len(texts))
+
+    def route_vectors(self, query_vectors) -> list[dict]:
+        """{"type", "confidence"} per query vector (vectors in the same space as the examples)."""
+        queries = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+        if not len(queries):
+            return []
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), _EPS)
+
+        sims = queries @ self.matrix.T
+        top = np.argpartition(-sims, self.k - 1, axis=1)[:, :self.k]
+        weights = 1.0 / (1.0 - np.take_along_axis(sims, top, axis=1) + _EPS)
+        sql_share = (weights * self.is_sql[top]).sum(axis=1) / weights.sum(axis=1)
+
+        return [
+            {"type": "sql", "confidence": round(float(p), 4)} if p >= 0.5
+            else {"type": "semantic", "confidence": round(float(1 - p), 4)}
+            for p in sql_share
+        ]
+
+    def route(self, query: str, embeddings) -> dict:
+        return self.route_vectors(embed_queries(embeddings, [query]))[0]
+
+
+def get_knn_router(embeddings) -> KNNRouter:
+    """One router per embeddings object, built on first use."""
+    key = id(embeddings)
+    with _lock:
+        if key not in _routers:
+            print("Embedding the labeled routing examples for the kNN router")
+            _routers[key] = KNNRouter(embeddings)
+        return _routers[key]
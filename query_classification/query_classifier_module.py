@@ -2,7 +2,8 @@
 query_classifier.py
 -------------------
 Drop this file next to your RAG code.
-Requires: scikit-learn, joblib  (pip install scikit-learn joblib)
+Requires: numpy. The exported pipeline (query_classifier.joblib, needs
+scikit-learn + joblib) is only used when query_classifier.npz is missing.
 
 Usage:
     from queryProcess.query_classifier import QueryClassifier
@@ -13,26 +14,35 @@ Usage:
 
     result = clf.classify("חוות דעת על דני קרן")
     # result → {"type": "semantic", "confidence": 0.91}
+
+    results = clf.classify_batch(subqueries)   # one pass for all subqueries
 """
 
 import os
-import joblib
 from pathlib import Path
 
+from query_classification.compact_model import CompactClassifier
+
 # Path to the saved model — same directory as this file
 _MODEL_PATH = Path(__file__).parent / "query_classifier.joblib"
+_COMPACT_MODEL_PATH = Path(__file__).parent / "query_classifier.npz"
 
 
 class QueryClassifier:
     """Classifies a user query as 'sql' or 'semantic'."""
 
-    def __init__(self, model_path: str | Path = _MODEL_PATH):
-        if not Path(model_path).exists():
+    def __init__(self, model_path: str | Path = _MODEL_PATH, compact_path: str | Path = _COMPACT_MODEL_PATH):
+        if Path(compact_path).exists():
+            # plain NumPy scorer, no sklearn import / unpickling at startup
+            self._pipeline = CompactClassifier(compact_path)
+        elif Path(model_path).exists():
+            import joblib
+            self._pipeline = joblib.load(model_path)
+        else:
             raise FileNotFoundError(
-                f"Model not found at {model_path}. "
+                f"Model not found at {compact_path} or {model_path}. "
                 "Run train_classifier.py first to generate it."
             )
-        self._pipeline = joblib.load(model_path)
         self._label_map = {1: "sql", 0: "semantic"}
 
     def classify(self, query: str) -> dict:
@@ -40,18 +50,16 @@ class QueryClassifier:
         Returns:
             {"type": "sql" | "semantic", "confidence": float}
         """
-        pred  = self._pipeline.predict([query])[0]
-        proba = self._pipeline.predict_proba([query])[0]
-        return {
-            "type":       self._label_map[pred],
-            "confidence": round(float(max(proba)), 4),
-        }
+        return self.classify_batch([query])[0]
 
     def classify_batch(self, queries: list[str]) -> list[dict]:
         """Classify multiple queries at once (more efficient)."""
-        preds  = self._pipeline.predict(queries)
+        if not queries:
+            return []
+        # the label is the most probable class: one predict_proba call covers both
         probas = self._pipeline.predict_proba(queries)
+        classes = self._pipeline.classes_
         return [
-            {"type": self._label_map[p], "confidence": round(float(max(pr)), 4)}
-            for p, pr in zip(preds, probas)
+            {"type": self._label_map[int(classes[pr.argmax()])], "confidence": round(float(max(pr)), 4)}
+            for pr in probas
         ]
@@ -1,11 +1,11 @@
-import json
-import joblib
-import numpy as np
-from sklearn.linear_model import LogisticRegression
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.pipeline import Pipeline
-from sklearn.model_selection import StratifiedKFold, cross_validate
-from sklearn.metrics import classification_report, confusion_matrix
+"""
+Labeled routing examples (sql_queries / semantic_queries, module level so the
+kNN router can import them) and, when run as a script, training + export of
+the TF-IDF classifier:
+
+    cd query_classification && python train_classifier.py
+"""
+
 
 # ─────────────────────────────────────────────────────────
 #  DATA
@@ -392,99 +392,112 @@ semantic_queries = [
 texts  = sql_queries + semantic_queries
 labels = [1] * len(sql_queries) + [0] * len(semantic_queries)   # 1=sql, 0=semantic
 
-print(f"Dataset: {len(sql_queries)} SQL  +  {len(semantic_queries)} semantic  =  {len(texts)} total")
-print(f"Class balance: {labels.count(1)/len(labels)*100:.1f}% SQL / {labels.count(0)/len(labels)*100:.1f}% semantic\n")
+if __name__ == "__main__":
+    import joblib
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.pipeline import Pipeline
+    from sklearn.model_selection import StratifiedKFold, cross_validate
+    from sklearn.metrics import classification_report, confusion_matrix
+    from compact_model import export_compact
 
-# ─────────────────────────────────────────────────────────
-#  PIPELINE
-#  char-level n-grams work well for mixed-script text
-#  (Hebrew chars + Latin chars + digits)
-# ─────────────────────────────────────────────────────────
-pipeline = Pipeline([
-    ("tfidf", TfidfVectorizer(
-        analyzer="char_wb",        # character n-grams with word boundaries
-        ngram_range=(2, 4),        # bi- to 4-grams
-        min_df=1,
-        sublinear_tf=True,
-        strip_accents=None,        # keep Hebrew niqqud if present
-    )),
-    ("clf", LogisticRegression(
-        C=1.0,
-        max_iter=1000,
-        solver="lbfgs",
-        class_weight="balanced",
-    )),
-])
+    print(f"Dataset: {len(sql_queries)} SQL  +  {len(semantic_queries)} semantic  =  {len(texts)} total")
+    print(f"Class balance: {labels.count(1)/len(labels)*100:.1f}% SQL / {labels.count(0)/len(labels)*100:.1f}% semantic\n")
 
-# ─────────────────────────────────────────────────────────
-#  CROSS-VALIDATION  (5-fold stratified)
-# ─────────────────────────────────────────────────────────
-cv = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
-cv_results = cross_validate(
-    pipeline, texts, labels,
-    cv=cv,
-    scoring=["accuracy", "f1", "precision", "recall"],
-    return_train_score=True,
-)
+    # ─────────────────────────────────────────────────────────
+    #  PIPELINE
+    #  char-level n-grams work well for mixed-script text
+    #  (Hebrew chars + Latin chars + digits)
+    # ─────────────────────────────────────────────────────────
+    pipeline = Pipeline([
+        ("tfidf", TfidfVectorizer(
+            analyzer="char_wb",        # character n-grams with word boundaries
+            ngram_range=(2, 4),        # bi- to 4-grams
+            min_df=1,
+            sublinear_tf=True,
+            strip_accents=None,        # keep Hebrew niqqud if present
+        )),
+        ("clf", LogisticRegression(
+            C=1.0,
+            max_iter=1000,
+            solver="lbfgs",
+            class_weight="balanced",
+        )),
+    ])
 
-print("── 5-Fold Cross-Validation Results ──────────────────")
-for metric in ["accuracy", "f1", "precision", "recall"]:
-    test_scores  = cv_results[f"test_{metric}"]
-    train_scores = cv_results[f"train_{metric}"]
-    print(f"  {metric:<12}  val: {test_scores.mean():.3f} ± {test_scores.std():.3f}   "
-          f"train: {train_scores.mean():.3f} ± {train_scores.std():.3f}")
+    # ─────────────────────────────────────────────────────────
+    #  CROSS-VALIDATION  (5-fold stratified)
+    # ─────────────────────────────────────────────────────────
+    cv = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
+    cv_results = cross_validate(
+        pipeline, texts, labels,
+        cv=cv,
+        scoring=["accuracy", "f1", "precision", "recall"],
+        return_train_score=True,
+    )
 
-# ─────────────────────────────────────────────────────────
-#  TRAIN ON FULL DATASET
-# ─────────────────────────────────────────────────────────
-pipeline.fit(texts, labels)
-print("\n── Full-dataset training complete ───────────────────")
+    print("── 5-Fold Cross-Validation Results ──────────────────")
+    for metric in ["accuracy", "f1", "precision", "recall"]:
+        test_scores  = cv_results[f"test_{metric}"]
+        train_scores = cv_results[f"train_{metric}"]
+        print(f"  {metric:<12}  val: {test_scores.mean():.3f} ± {test_scores.std():.3f}   "
+              f"train: {train_scores.mean():.3f} ± {train_scores.std():.3f}")
 
-train_preds = pipeline.predict(texts)
-print("\nClassification report (train set):")
-print(classification_report(labels, train_preds, target_names=["semantic", "sql"]))
+    # ─────────────────────────────────────────────────────────
+    #  TRAIN ON FULL DATASET
+    # ─────────────────────────────────────────────────────────
+    pipeline.fit(texts, labels)
+    print("\n── Full-dataset training complete ───────────────────")
 
-cm = confusion_matrix(labels, train_preds)
-print("Confusion matrix (rows=actual, cols=predicted):")
-print(f"           pred:semantic  pred:sql")
-print(f"act:semantic     {cm[0,0]:>5}       {cm[0,1]:>5}")
-print(f"act:sql          {cm[1,0]:>5}       {cm[1,1]:>5}")
+    train_preds = pipeline.predict(texts)
+    print("\nClassification report (train set):")
+    print(classification_report(labels, train_preds, target_names=["semantic", "sql"]))
 
-# ─────────────────────────────────────────────────────────
-#  SAVE MODEL
-# ─────────────────────────────────────────────────────────
-joblib.dump(pipeline, "query_classifier.joblib")
-print("\n✓ Model saved to query_classifier.joblib")
+    cm = confusion_matrix(labels, train_preds)
+    print("Confusion matrix (rows=actual, cols=predicted):")
+    print(f"           pred:semantic  pred:sql")
+    print(f"act:semantic     {cm[0,0]:>5}       {cm[0,1]:>5}")
+    print(f"act:sql          {cm[1,0]:>5}       {cm[1,1]:>5}")
 
-# ─────────────────────────────────────────────────────────
-#  QUICK SANITY CHECK
-# ─────────────────────────────────────────────────────────
-test_cases = [
-    ("מה הציון הממוצע בקורס מבני נתונים?",          "sql"),
-    ("חוות דעת על קורס מבני נתונים",               "semantic"),
-    ("How many students failed Operating Systems?",  "sql"),
-    ("Which professor is best for AI?",              "semantic"),
-    ("מה הקדמים של אלגוריתמים?",                   "sql"),
-    ("האם קורס רשתות מעניין?",                      "semantic"),
-    ("What is the pass rate for Databases?",         "sql"),
-    ("Is Deep Learning suitable for beginners?",     "semantic"),
-    ("מה קוד של הקורס מבוא ללמידה ממוכנת?",              "sql"),
-    ("מי לימד את קורס גרפיקה ממוחשבת?",               "sql"),
-    ("האם קורס אלגוריתמים קשה?",                   "semantic"),
-    ("מה מספר מזהה של קורס החומרה",                      "sql"),
-    ("כמה נקודות זכות קורס עיבוד תמונה?",           "sql"),
-]
+    # ─────────────────────────────────────────────────────────
+    #  SAVE MODEL
+    # ─────────────────────────────────────────────────────────
+    joblib.dump(pipeline, "query_classifier.joblib")
+    print("\n✓ Model saved to query_classifier.joblib")
+
+    # compact NumPy artifact loaded by QueryClassifier (no sklearn at inference)
+    export_compact(pipeline, "query_classifier.npz")
+    print("✓ Compact model saved to query_classifier.npz")
+
+    # ─────────────────────────────────────────────────────────
+    #  QUICK SANITY CHECK
+    # ─────────────────────────────────────────────────────────
+    test_cases = [
+        ("מה הציון הממוצע בקורס מבני נתונים?",          "sql"),
+        ("חוות דעת על קורס מבני נתונים",               "semantic"),
+        ("How many students failed Operating Systems?",  "sql"),
+        ("Which professor is best for AI?",              "semantic"),
+        ("מה הקדמים של אלגוריתמים?",                   "sql"),
+        ("האם קורס רשתות מעניין?",                      "semantic"),
+        ("What is the pass rate for Databases?",         "sql"),
+        ("Is Deep Learning suitable for beginners?",     "semantic"),
+        ("מה קוד של הקורס מבוא ללמידה ממוכנת?",              "sql"),
+        ("מי לימד את קורס גרפיקה ממוחשבת?",               "sql"),
+        ("האם קורס אלגוריתמים קשה?",                   "semantic"),
+        ("מה מספר מזהה של קורס החומרה",                      "sql"),
+        ("כמה נקודות זכות קורס עיבוד תמונה?",           "sql"),
+    ]
 
-label_map = {1: "sql", 0: "semantic"}
-print("\n── Sanity check ─────────────────────────────────────")
-all_correct = True
-for query, expected in test_cases:
-    pred_label = label_map[pipeline.predict([query])[0]]
-    prob       = pipeline.predict_proba([query])[0]
-    confidence = max(prob) * 100
-    status     = "✓" if pred_label == expected else "✗"
-    if pred_label != expected:
-        all_correct = False
-    print(f"  {status} [{confidence:5.1f}%]  {pred_label:<10}  {query[:55]}")
+    label_map = {1: "sql", 0: "semantic"}
+    print("\n── Sanity check ─────────────────────────────────────")
+    all_correct = True
+    for query, expected in test_cases:
+        pred_label = label_map[pipeline.predict([query])[0]]
+        prob       = pipeline.predict_proba([query])[0]
+        confidence = max(prob) * 100
+        status     = "✓" if pred_label == expected else "✗"
+        if pred_label != expected:
+            all_correct = False
+        print(f"  {status} [{confidence:5.1f}%]  {pred_label:<10}  {query[:55]}")
 
-print(f"\n{'All sanity checks passed!' if all_correct else 'Some checks failed — consider adding more training data.'}")
+    print(f"\n{'All sanity checks passed!' if all_correct else 'Some checks failed — consider adding more training data.'}")
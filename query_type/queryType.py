@@ -2,6 +2,7 @@ import os
 from openai import OpenAI
 from pathlib import Path
 import json
+from util.llm_cache import cached_completion
 
 class queryType:
     def __init__(self, model_name: str = "google/gemma-3-1b-it"):
@@ -60,18 +61,22 @@ User query:
 """
 
 
-        response = self.client.chat.completions.create(
-            model=self.model_name,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.2,
-            top_p=0.7,
-            max_tokens=4096,
-            extra_body={"chat_template_kwargs": {"thinking":False}},
-            stream=True
-        )
-        result = ""
-        for chunk in response:
-          if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content is not None:
-            # print(chunk.choices[0].delta.content, end="")
-            result += chunk.choices[0].delta.content
-        return result.strip()
\ No newline at end of file
+        def call():
+            response = self.client.chat.completions.create(
+                model=self.model_name,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.2,
+                top_p=0.7,
+                max_tokens=4096,
+                extra_body={"chat_template_kwargs": {"thinking":False}},
+                stream=True
+            )
+            result = ""
+            for chunk in response:
+              if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content is not None:
+                # print(chunk.choices[0].delta.content, end="")
+                result += chunk.choices[0].delta.content
+            return result.strip()
+
+        params = {"temperature": 0.2, "top_p": 0.7, "max_tokens": 4096}
+        return cached_completion("query_type", self.model_name, prompt, params, call)
\ No newline at end of file
@@ -0,0 +1,99 @@
+"""
+Two-stage (cascade) reranking.
+
+1. First pass, cheap: the score each passage was retrieved with
+   (metadata["retrieval_score"], the fused vector / BM25 rank score from
+   hybrid_search, so the query vector is not used again and nothing is
+   encoded) blended with the fraction of query terms found in the passage.
+   Passages without a retrieval score are ranked on the lexical overlap
+   alone. Keeps the best `candidates` passages.
+2. Second pass: the cross-encoder (rerank_documents) on the survivors only.
+
+The cross-encoder cost is therefore bounded by `candidates`, however many
+subqueries the splitter produced. Per-stage timings are returned with every
+call and aggregated in `cascade_timings` for /stats.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from config import settings
+from retrieval.bm25_index import tokenize
+from reranker.reranker import rerank_documents
+
+
+class StageTimings:
+    """Running count / total / max milliseconds per stage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def add(self, stage, ms):
+        with self._lock:
+            count, total, worst = self._stages.get(stage, (0, 0.0, 0.0))
+            self._stages[stage] = (count + 1, total + ms, max(worst, ms))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                stage: {"calls": count, "mean_ms": total / count, "max_ms": worst}
+                for stage, (count, total, worst) in self._stages.items()
+            }
+
+
+cascade_timings = StageTimings()
+
+
+def lexical_overlap(query: str, passages: list[str]) -> np.ndarray:
+    """Fraction of the query's terms (BM25 tokenization) present in each passage."""
+    query_terms = set(tokenize(query))
+    if not query_terms:
+        return np.zeros(len(passages), dtype=np.float32)
+    return np.asarray(
+        [len(query_terms & set(tokenize(p))) / len(query_terms) for p in passages], dtype=np.float32
+    )
+
+
+def first_pass_scores(query, documents, lexical_weight=settings.CASCADE_LEXICAL_WEIGHT) -> np.ndarray:
+    lexical = lexical_overlap(query, [doc.page_content for doc in documents])
+    retrieval = np.asarray(
+        [doc.metadata.get("retrieval_score", np.nan) for doc in documents], dtype=np.float32
+    )
+    scored = ~np.isnan(retrieval)
+    if not scored.any():
+        return lexical
+    # fused rank scores are tiny (1 / (k + rank)): scale the scored passages to [0, 1] like the overlap
+    retrieval = retrieval / (retrieval[scored].max() or 1.0)
+    # each passage on its own: the blend where it has a retrieval score, the overlap alone where not
+    return np.where(scored, (1 - lexical_weight) * retrieval + lexical_weight * lexical, lexical)
+
+
+def cascade_rerank(query, documents, candidates=settings.RERANK_CANDIDATES,
+                   top_n=settings.RERANK_TOP_N, backend=settings.RERANKER_BACKEND):
+    """
+    Returns (reranked documents, timings) where timings holds the input size,
+    the number of survivors and the milliseconds spent in each stage.
+    """
+    timings = {"documents": len(documents)}
+    if not documents:
+        return [], timings
+
+    start = time.perf_counter()
+    survivors = documents
+    if len(documents) > candidates:
+        scores = first_pass_scores(query, documents)
+        keep = np.sort(np.argsort(-scores, kind="stable")[:candidates])
+        survivors = [documents[i] for i in keep]
+    timings["first_pass_ms"] = (time.perf_counter() - start) * 1000
+    timings["candidates"] = len(survivors)
+
+    start = time.perf_counter()
+    reranked = rerank_documents(query, survivors, top_n=top_n, backend=backend)
+    timings["cross_encoder_ms"] = (time.perf_counter() - start) * 1000
+
+    cascade_timings.add("first_pass", timings["first_pass_ms"])
+    cascade_timings.add("cross_encoder", timings["cross_encoder_ms"])
+    return reranked, timings
@@ -0,0 +1,193 @@
+"""
+Local CPU cross-encoder reranker.
+
+Scores (query, passage) pairs with a multilingual cross-encoder, either
+through sentence-transformers (torch) or an int8-quantized ONNX export
+(export with offline_processing/export_onnx_reranker.py, then set
+RERANKER_BACKEND=onnx). Pairs are scored in batches and their scores kept in
+an in-memory LRU, since follow-up questions keep re-ranking the same chunks.
+"""
+
+import hashlib
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from config import settings
+from embedding.embedder import PASSAGE_PREFIX, strip_prefix
+
+FP32_FILE = "model.onnx"
+INT8_FILE = "model_int8.onnx"
+
+_lock = threading.Lock()
+_rerankers = {}
+
+
+def export_quantized(model_name: str, out_dir, keep_fp32: bool = False) -> Path:
+    """Exports a sequence-classification cross-encoder to ONNX with dynamic int8 weights."""
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    out_dir = Path(out_dir)
+    fp32_dir = out_dir / "fp32"
+    fp32_dir.mkdir(parents=True, exist_ok=True)
+    fp32_path = fp32_dir / FP32_FILE
+    int8_path = out_dir / INT8_FILE
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+    tokenizer.save_pretrained(out_dir)
+
+    dummy = tokenizer(["query"], ["passage"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in dummy]
+    print(f"Exporting {model_name} to {fp32_path}")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(dummy[name] for name in input_names),
+            str(fp32_path),
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes={**{name: {0: "batch", 1: "seq"} for name in input_names}, "logits": {0: "batch"}},
+            opset_version=17,
+            dynamo=False,
+        )
+
+    print(f"Quantizing (dynamic int8) to {int8_path}")
+    quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+
+    if not keep_fp32:
+        shutil.rmtree(fp32_dir)
+
+    return int8_path
+
+
+class OnnxCrossEncoder:
+    """The subset of sentence_transformers.CrossEncoder.predict used here, on ONNX Runtime."""
+
+    def __init__(self, model_dir, file_name: str = INT8_FILE, num_threads: int = 0, max_length: int = 512):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_path = Path(model_dir) / file_name
+        if not model_path.exists():
+            raise FileNotFoundError(
+                f"ONNX reranker not found at {model_path}. "
+                "Run offline_processing/export_onnx_reranker.py first to generate it."
+            )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.session = ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+        self._input_names = [i.name for i in self.session.get_inputs()]
+        self.max_length = max_length
+
+    def predict(self, pairs, batch_size: int = 16) -> np.ndarray:
+        out = []
+        for start in range(0, len(pairs), batch_size):
+            batch = pairs[start:start + batch_size]
+            encoded = self.tokenizer(
+                [q for q, _ in batch], [p for _, p in batch],
+                padding=True, truncation=True, max_length=self.max_length, return_tensors="np"
+            )
+            feeds = {name: encoded[name].astype(np.int64) for name in self._input_names}
+            logits = self.session.run(None, feeds)[0]
+            out.append(logits[:, -1] if logits.ndim == 2 else logits)
+        return np.concatenate(out).astype(np.float32) if out else np.zeros(0, dtype=np.float32)
+
+
+class CrossEncoderReranker:
+    def __init__(self, model_name=settings.RERANKER_MODEL, backend=settings.RERANKER_BACKEND,
+                 batch_size=settings.RERANKER_BATCH_SIZE, max_length=settings.RERANKER_MAX_LENGTH,
+                 cache_size=settings.RERANKER_CACHE_SIZE):
+        if backend == "torch":
+            from sentence_transformers import CrossEncoder
+            self.model = CrossEncoder(model_name, device="cpu", max_length=max_length)
+        elif backend == "onnx":
+            self.model = OnnxCrossEncoder(settings.RERANKER_ONNX_DIR, max_length=max_length)
+        else:
+            raise ValueError(f"Unknown reranker backend: {backend}")
+
+        self.model_name = model_name
+        self.backend = backend
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+
+        self._lock = threading.Lock()
+        self._scores = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, query, passage):
+        raw = f"{self.model_name}@{self.backend}\x00{query}\x00{passage}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def score(self, query: str, passages: list[str]) -> np.ndarray:
+        """Relevance score per passage (higher is better); cached pairs are not re-scored."""
+        passages = [strip_prefix(p, PASSAGE_PREFIX) for p in passages]
+        keys = [self._key(query, p) for p in passages]
+
+        scores = np.zeros(len(passages), dtype=np.float32)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._scores:
+                    self._scores.move_to_end(key)
+                    scores[i] = self._scores[key]
+                else:
+                    missing.append(i)
+            self.hits += len(passages) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            # one batched pass over all unscored pairs
+            new_scores = np.asarray(
+                self.model.predict([(query, passages[i]) for i in missing], batch_size=self.batch_size),
+                dtype=np.float32,
+            )
+            with self._lock:
+                for i, value in zip(missing, new_scores):
+                    scores[i] = value
+                    self._scores[keys[i]] = float(value)
+                while len(self._scores) > self.cache_size:
+                    self._scores.popitem(last=False)
+        return scores
+
+    def rerank(self, query: str, documents: list, top_n: int | None = None) -> list:
+        """Documents sorted by cross-encoder score, cut to top_n (None = all)."""
+        if not documents:
+            return []
+        scores = self.score(query, [doc.page_content for doc in documents])
+        order = np.argsort(-scores, kind="stable")
+        if top_n:
+            order = order[:top_n]
+        return [documents[i] for i in order]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._scores),
+            }
+
+
+def get_reranker(model_name=settings.RERANKER_MODEL, backend=settings.RERANKER_BACKEND) -> CrossEncoderReranker:
+    """Shared reranker per (model, backend), loaded on first use."""
+    key = (model_name, backend)
+    with _lock:
+        if key not in _rerankers:
+            print(f"Loading reranker {model_name} ({backend}, cpu)")
+            _rerankers[key] = CrossEncoderReranker(model_name, backend)
+        return _rerankers[key]
@@ -1,15 +1,33 @@
-from langchain_nvidia_ai_endpoints import NVIDIARerank
 from langchain_core.documents import Document
 
-def rerank_documents(query: str, documents: list[Document], model_name: str = "nvidia/llama-3.2-nv-rerankqa-1b-v2") -> list[Document]:
+from config import settings
+from reranker.cross_encoder import get_reranker
+
+NVIDIA_MODEL = "nvidia/llama-3.2-nv-rerankqa-1b-v2"
+
+# NVIDIARerank clients per (model, top_n), built once
+_nvidia_clients = {}
+
+def _nvidia_client(model_name, top_n):
+    from langchain_nvidia_ai_endpoints import NVIDIARerank
+    key = (model_name, top_n)
+    if key not in _nvidia_clients:
+        _nvidia_clients[key] = NVIDIARerank(model=model_name, top_n=top_n)
+    return _nvidia_clients[key]
+
+def rerank_documents(query: str, documents: list[Document], model_name: str | None = None,
+                     top_n: int | None = None, backend: str = settings.RERANKER_BACKEND) -> list[Document]:
     """
-    Reranks a list of documents based on their relevance to a given query
-    using an NVIDIA reranking model.
+    Reranks a list of documents based on their relevance to a given query.
 
     Args:
         query: The user's query.
         documents: A list of Document objects to be reranked.
-        model_name: The name of the NVIDIA reranking model to use.
+        model_name: The reranking model (defaults to settings.RERANKER_MODEL,
+            or the NVIDIA model for backend="nvidia").
+        top_n: Keep only the best top_n documents (None = all).
+        backend: "torch" / "onnx" for the local CPU cross-encoder,
+            "nvidia" for the remote NVIDIA reranking service.
 
     Returns:
         A list of Document objects, reranked by relevance.
@@ -17,6 +35,9 @@ def rerank_documents(query: str, documents: list[Document], model_name: str = "n
     print("Entered Reranker File")
     if not documents:
         return []
-    reranker = NVIDIARerank(model=model_name, top_n=len(documents))
-    reranked_docs = reranker.compress_documents(documents, query)
-    return reranked_docs
+
+    if backend == "nvidia":
+        reranker = _nvidia_client(model_name or NVIDIA_MODEL, top_n or len(documents))
+        return reranker.compress_documents(documents, query)[:top_n or len(documents)]
+
+    return get_reranker(model_name or settings.RERANKER_MODEL, backend).rerank(query, documents, top_n)
@@ -0,0 +1,256 @@
+"""
+Approximate nearest-neighbour indexes for the review vectors, as an
+alternative to the exact scan in retrieval/numpy_index.py once the corpus
+grows past what a full matrix product per query can serve.
+
+    hnsw    graph index (hnswlib, optional dependency: pip install hnswlib)
+    ivfpq   inverted file + product quantization, pure NumPy
+
+Both score by inner product (the stored vectors are L2-normalized, so this is
+cosine similarity) and share one interface:
+
+    build(X)                       -> self
+    search(q, k, mask=None)        -> (rows, scores), best first
+    save(path) / load(path)        persisted next to the other index artifacts
+    nbytes                         size of the index structures
+
+Build parameters come from config/settings.py (HNSW_*, IVF_*, PQ_*).
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+from config import settings
+
+
+def _top_k(scores, k):
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def kmeans(X, k, iters=20, seed=0, block_rows=65536):
+    """Plain Lloyd's k-means (squared L2). Returns (centroids, assignment)."""
+    rng = np.random.default_rng(seed)
+    X = np.asarray(X, dtype=np.float32)
+    k = min(k, len(X))
+    centroids = X[rng.choice(len(X), size=k, replace=False)].copy()
+
+    assign = np.zeros(len(X), dtype=np.int64)
+    for _ in range(iters):
+        half_norms = 0.5 * (centroids ** 2).sum(axis=1)
+        for start in range(0, len(X), block_rows):
+            block = X[start:start + block_rows]
+            assign[start:start + block_rows] = np.argmax(block @ centroids.T - half_norms, axis=1)
+
+        counts = np.bincount(assign, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, X)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        # re-seed empty clusters with random points
+        if empty.any():
+            centroids[empty] = X[rng.choice(len(X), size=int(empty.sum()), replace=False)]
+    return centroids, assign
+
+
+class IVFPQIndex:
+    kind = "ivfpq"
+
+    def __init__(self, nlist=settings.IVF_NLIST, nprobe=settings.IVF_NPROBE,
+                 m=settings.PQ_M, nbits=settings.PQ_NBITS, train_size=settings.IVF_TRAIN_SIZE):
+        """
+        nlist: coarse clusters (0 = about 4 * sqrt(n)); nprobe: clusters scanned per query;
+        m: PQ sub-vectors (must divide the dimension); nbits: bits per sub-vector code (<= 8).
+        """
+        if not 1 <= nbits <= 8:
+            raise ValueError(f"nbits must be between 1 and 8, got {nbits}")
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.m = m
+        self.nbits = nbits
+        self.train_size = train_size
+
+        self.coarse = None          # (nlist, d)
+        self.codebooks = None       # (m, ksub, d / m)
+        self.offsets = None         # (nlist + 1,) list boundaries into rows / codes
+        self.rows = None            # (n,) original row of every code, grouped by list
+        self.codes = None           # (n, m) uint8
+
+    def build(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        n, d = X.shape
+        if d % self.m:
+            raise ValueError(f"PQ_M={self.m} must divide the vector dimension {d}")
+
+        rng = np.random.default_rng(0)
+        train = X[rng.choice(n, size=min(n, self.train_size), replace=False)]
+        nlist = self.nlist or max(1, int(4 * np.sqrt(n)))
+        self.coarse, _ = kmeans(train, nlist)
+        assign = self._assign(X)
+
+        residuals = X - self.coarse[assign]
+        train_residuals = residuals[rng.choice(n, size=min(n, self.train_size), replace=False)]
+        dsub = d // self.m
+        ksub = 2 ** self.nbits
+        self.codebooks = np.stack([
+            kmeans(train_residuals[:, j * dsub:(j + 1) * dsub], ksub)[0] for j in range(self.m)
+        ])
+
+        codes = np.empty((n, self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = self._nearest(residuals[:, j * dsub:(j + 1) * dsub], self.codebooks[j])
+
+        order = np.argsort(assign, kind="stable")
+        self.rows = order.astype(np.int64)
+        self.codes = codes[order]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=len(self.coarse)))])
+        return self
+
+    @staticmethod
+    def _nearest(X, centroids, block_rows=65536):
+        half_norms = 0.5 * (centroids ** 2).sum(axis=1)
+        out = np.empty(len(X), dtype=np.int64)
+        for start in range(0, len(X), block_rows):
+            out[start:start + block_rows] = np.argmax(X[start:start + block_rows] @ centroids.T - half_norms, axis=1)
+        return out
+
+    def _assign(self, X):
+        return self._nearest(X, self.coarse)
+
+    def search(self, q, k, mask=None):
+        q = np.asarray(q, dtype=np.float32)
+        coarse_scores = self.coarse @ q
+        probe = _top_k(coarse_scores, self.nprobe)
+
+        # lookup table: q_sub . codeword for every sub-vector / code
+        dsub = q.shape[0] // self.m
+        lut = np.einsum("msd,md->ms", self.codebooks, q.reshape(self.m, dsub))
+
+        rows, scores = [], []
+        for cluster in probe:
+            start, end = self.offsets[cluster], self.offsets[cluster + 1]
+            if start == end:
+                continue
+            cluster_rows = self.rows[start:end]
+            cluster_scores = coarse_scores[cluster] + lut[np.arange(self.m), self.codes[start:end]].sum(axis=1)
+            if mask is not None:
+                keep = mask[cluster_rows]
+                cluster_rows, cluster_scores = cluster_rows[keep], cluster_scores[keep]
+            rows.append(cluster_rows)
+            scores.append(cluster_scores)
+
+        if not rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        rows, scores = np.concatenate(rows), np.concatenate(scores)
+        top = _top_k(scores, k)
+        return rows[top], scores[top]
+
+    @property
+    def nbytes(self):
+        return self.coarse.nbytes + self.codebooks.nbytes + self.offsets.nbytes + self.rows.nbytes + self.codes.nbytes
+
+    def save(self, path):
+        np.savez(
+            path, coarse=self.coarse, codebooks=self.codebooks, offsets=self.offsets, rows=self.rows,
+            codes=self.codes, params=np.asarray([self.nprobe, self.m, self.nbits], dtype=np.int64),
+        )
+
+    @classmethod
+    def load(cls, path, nprobe=None):
+        data = np.load(path)
+        saved_nprobe, m, nbits = (int(v) for v in data["params"])
+        index = cls(nlist=len(data["coarse"]), nprobe=nprobe or saved_nprobe, m=m, nbits=nbits)
+        index.coarse = data["coarse"]
+        index.codebooks = data["codebooks"]
+        index.offsets = data["offsets"]
+        index.rows = data["rows"]
+        index.codes = data["codes"]
+        return index
+
+
+def _import_hnswlib():
+    try:
+        import hnswlib
+    except ImportError as e:
+        raise ImportError("The hnsw ANN backend needs hnswlib: pip install hnswlib") from e
+    return hnswlib
+
+
+def serving_k() -> int:
+    """Largest k retrieval asks an ANN index for (vector k, widened by ANN_REFINE)."""
+    return max(settings.SEARCH_K, settings.HYBRID_VECTOR_K) * max(1, settings.ANN_REFINE)
+
+
+class HNSWIndex:
+    kind = "hnsw"
+
+    def __init__(self, M=settings.HNSW_M, ef_construction=settings.HNSW_EF_CONSTRUCTION,
+                 ef_search=settings.HNSW_EF_SEARCH):
+        self.hnswlib = _import_hnswlib()
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.index = None
+        self.dim = None
+        self.count = 0
+
+    def build(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        self.count, self.dim = X.shape
+        self.index = self.hnswlib.Index(space="ip", dim=self.dim)
+        self.index.init_index(max_elements=self.count, ef_construction=self.ef_construction, M=self.M)
+        self.index.add_items(X, np.arange(self.count))
+        self._set_ef()
+        return self
+
+    def _set_ef(self):
+        # set once: concurrent subquery searches share the index, so ef is
+        # never changed per call (hnswlib searches with max(ef, k) anyway)
+        self.index.set_ef(max(self.ef_search, serving_k()))
+
+    def search(self, q, k, mask=None):
+        k = min(k, self.count if mask is None else int(mask.sum()))
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        labels, distances = self.index.knn_query(
+            np.asarray(q, dtype=np.float32)[None, :], k=k,
+            filter=(lambda label: bool(mask[label])) if mask is not None else None,
+        )
+        # "ip" distance is 1 - inner product
+        return labels[0].astype(np.int64), 1.0 - distances[0]
+
+    @property
+    def nbytes(self):
+        # graph links + float32 vectors, as laid out by hnswlib
+        return self.count * (self.dim * 4 + self.M * 2 * 4 + 16)
+
+    def save(self, path):
+        self.index.save_index(str(path))
+        Path(f"{path}.json").write_text(json.dumps({
+            "dim": self.dim, "count": self.count, "M": self.M, "ef_construction": self.ef_construction,
+        }))
+
+    @classmethod
+    def load(cls, path, ef_search=None):
+        meta = json.loads(Path(f"{path}.json").read_text())
+        index = cls(M=meta["M"], ef_construction=meta["ef_construction"],
+                    ef_search=ef_search or settings.HNSW_EF_SEARCH)
+        index.dim, index.count = meta["dim"], meta["count"]
+        index.index = index.hnswlib.Index(space="ip", dim=index.dim)
+        index.index.load_index(str(path), max_elements=index.count)
+        index._set_ef()
+        return index
+
+
+ANN_INDEXES = {"hnsw": HNSWIndex, "ivfpq": IVFPQIndex}
+
+
+def build_ann_index(kind, X):
+    if kind not in ANN_INDEXES:
+        raise ValueError(f"Unknown ANN index {kind}, expected one of {sorted(ANN_INDEXES)}")
+    return ANN_INDEXES[kind]().build(X)
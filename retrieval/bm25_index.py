@@ -0,0 +1,182 @@
+"""
+In-process BM25 inverted index over the review chunks.
+
+Built by setup.py at ingestion time and persisted to INDEX_DIR/bm25.json;
+retrieval.semantic_search queries it next to the vector store and merges the
+two rankings with reciprocal rank fusion.
+
+Hebrew attaches prepositions / conjunctions / the article to the word
+(והמרצה, בקורס, לחדוא), so every token is indexed together with its
+prefix-stripped forms.
+"""
+
+import json
+import math
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from retrieval.filters import matches_where
+
+# ו ה ב ל מ ש כ  (and combinations such as וה, שב, מה, וכש...)
+HEBREW_PREFIXES = "והבלמשכ"
+_FINAL_LETTERS = str.maketrans("ךםןףץ", "כמנפצ")
+_MIN_STEM_LEN = 3
+
+
+def normalize_token(token: str) -> str:
+    return token.lower().translate(_FINAL_LETTERS)
+
+
+def tokenize(text: str) -> list[str]:
+    # remove nikud, geresh / gershayim and punctuation
+    text = re.sub(r"[\u0591-\u05C7]", "", text)
+    text = re.sub(r"[\"'\u05F3\u05F4]", "", text)
+    words = re.findall(r"[0-9a-zA-Zא-ת]+", text)
+
+    tokens = []
+    for word in words:
+        word = normalize_token(word)
+        tokens.append(word)
+        # strip up to two prefix letters (e.g. "ובקורס" -> "בקורס" -> "קורס")
+        stem = word
+        for _ in range(2):
+            if len(stem) - 1 >= _MIN_STEM_LEN and stem[0] in HEBREW_PREFIXES:
+                stem = stem[1:]
+                tokens.append(stem)
+            else:
+                break
+    return tokens
+
+
+class BM25Index:
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids = []              # chunk id per position
+        self.doc_len = np.zeros(0, dtype=np.float32)
+        self.postings = {}         # term -> (positions int32 array, tf float32 array)
+        self.idf = {}
+        self._id_to_pos = None
+
+    # ------------------------------------------------------------------
+    # build / persist
+    # ------------------------------------------------------------------
+    def build(self, texts: list[str], ids: list[int]):
+        postings = defaultdict(lambda: ([], []))
+        doc_len = []
+        for pos, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_len.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings[term][0].append(pos)
+                postings[term][1].append(tf)
+
+        self.ids = list(ids)
+        self.doc_len = np.asarray(doc_len, dtype=np.float32)
+        self.postings = {
+            term: (np.asarray(p, dtype=np.int32), np.asarray(tf, dtype=np.float32))
+            for term, (p, tf) in postings.items()
+        }
+        self._compute_idf()
+        return self
+
+    def _compute_idf(self):
+        n = len(self.ids)
+        self.idf = {
+            term: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5))
+            for term, (p, _) in self.postings.items()
+        }
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "k1": self.k1,
+                "b": self.b,
+                "ids": self.ids,
+                "doc_len": self.doc_len.tolist(),
+                "postings": {t: [p.tolist(), tf.tolist()] for t, (p, tf) in self.postings.items()},
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(data["k1"], data["b"])
+        index.ids = data["ids"]
+        index.doc_len = np.asarray(data["doc_len"], dtype=np.float32)
+        index.postings = {
+            t: (np.asarray(p, dtype=np.int32), np.asarray(tf, dtype=np.float32))
+            for t, (p, tf) in data["postings"].items()
+        }
+        index._compute_idf()
+        return index
+
+    # ------------------------------------------------------------------
+    # search
+    # ------------------------------------------------------------------
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        if not len(self.ids):
+            return scores
+        avgdl = float(self.doc_len.mean()) or 1.0
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            positions, tf = self.postings[term]
+            norm = self.k1 * (1 - self.b + self.b * self.doc_len[positions] / avgdl)
+            scores[positions] += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def positions_of(self, chunk_ids) -> np.ndarray:
+        if self._id_to_pos is None:
+            self._id_to_pos = {chunk_id: pos for pos, chunk_id in enumerate(self.ids)}
+        return np.asarray([self._id_to_pos[i] for i in chunk_ids if i in self._id_to_pos], dtype=np.int64)
+
+    def search(self, query: str, k: int = 15, docs=None, where=None, candidate_ids=None) -> list[tuple[int, float]]:
+        """
+        Returns up to k (position, score) pairs with a positive score.
+        candidate_ids (e.g. from the metadata index) restricts the search to those chunks;
+        otherwise docs (the chunk Documents, aligned with positions) is needed to apply a where filter.
+        """
+        scores = self.scores(query)
+        if candidate_ids is not None:
+            allowed = np.zeros(len(scores), dtype=bool)
+            allowed[self.positions_of(candidate_ids)] = True
+            scores[~allowed] = 0
+            where = None
+        if where is None and k < len(scores):
+            top = np.argpartition(-scores, k)[:k]
+            order = top[np.argsort(-scores[top])]
+        else:
+            order = np.argsort(-scores)
+        out = []
+        for pos in order:
+            if scores[pos] <= 0:
+                break
+            if where and not matches_where(docs[pos].metadata, where):
+                continue
+            out.append((int(pos), float(scores[pos])))
+            if len(out) == k:
+                break
+        return out
+
+
+def reciprocal_rank_fusion(rankings: list[list], key, k: int = 60, with_scores: bool = False) -> list:
+    """
+    Merges several ranked lists of items. key(item) identifies the same item
+    across lists; the first occurrence of an item is the one returned
+    (as (item, fused score) with with_scores=True).
+    """
+    scores = defaultdict(float)
+    first_seen = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            item_key = key(item)
+            scores[item_key] += 1.0 / (k + rank + 1)
+            first_seen.setdefault(item_key, item)
+    ordered = sorted(scores, key=lambda item_key: scores[item_key], reverse=True)
+    if with_scores:
+        return [(first_seen[item_key], scores[item_key]) for item_key in ordered]
+    return [first_seen[item_key] for item_key in ordered]
@@ -0,0 +1,51 @@
+"""
+Evaluation of Chroma-style `where` filters outside of Chroma.
+
+Supports the shapes built in retrieval.semantic_search / build_vector_filters:
+    {"course_name": {"$eq": "x"}}
+    {"lecturer": {"$in": ["a", "b"]}}
+    {"$and": [...]} / {"$or": [...]}
+plus a bare {"field": value} as shorthand for $eq.
+"""
+
+
+def _match_condition(value, condition) -> bool:
+    if not isinstance(condition, dict):
+        return value == condition
+
+    for op, operand in condition.items():
+        if op == "$eq" and value != operand:
+            return False
+        if op == "$ne" and value == operand:
+            return False
+        if op == "$in" and value not in operand:
+            return False
+        if op == "$nin" and value in operand:
+            return False
+        if op in ("$gt", "$gte", "$lt", "$lte"):
+            if value is None:
+                return False
+            if op == "$gt" and not value > operand:
+                return False
+            if op == "$gte" and not value >= operand:
+                return False
+            if op == "$lt" and not value < operand:
+                return False
+            if op == "$lte" and not value <= operand:
+                return False
+    return True
+
+
+def matches_where(metadata: dict, where) -> bool:
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, sub) for sub in condition):
+                return False
+        elif not _match_condition(metadata.get(key), condition):
+            return False
+    return True
@@ -0,0 +1,195 @@
+"""
+Files that setup.py writes to settings.INDEX_DIR at ingestion time and that
+the retrieval side loads at startup:
+
+    chunks.json          page_content + metadata of every review chunk, by chunk id
+    projection.npz       fitted VectorCompressor (projection + storage dtype)
+    review_vectors.npz   compressed chunk vectors (codes, per-vector scales, chunk ids)
+    bm25.json            BM25 inverted index over the chunks (positions match chunks.json)
+    metadata_index.json  posting lists course_name / lecturer / course_id / date -> chunk ids
+    ann_hnsw.bin /
+    ann_ivfpq.npz        optional ANN index over review_vectors (settings.ANN_INDEX)
+    shards/              per-course slices of review_vectors (manifest.json + one npz per course)
+
+Everything here is loaded once per process: after setup.py rebuilds the
+review stores, restart the server (its in-memory caches start empty too).
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+
+from config import settings
+from embedding.compression import ProjectedEmbeddings, QuantizedMatrix, VectorCompressor
+from retrieval.bm25_index import BM25Index
+from retrieval.metadata_index import MetadataIndex
+
+CHUNKS_FILE = "chunks.json"
+PROJECTION_FILE = "projection.npz"
+VECTORS_FILE = "review_vectors.npz"
+BM25_FILE = "bm25.json"
+METADATA_INDEX_FILE = "metadata_index.json"
+ANN_FILES = {"hnsw": "ann_hnsw.bin", "ivfpq": "ann_ivfpq.npz"}
+SHARDS_DIR = "shards"
+SHARD_MANIFEST_FILE = "manifest.json"
+
+
+def index_path(name: str, index_dir=None) -> Path:
+    return Path(index_dir or settings.INDEX_DIR) / name
+
+
+def save_chunks(docs, index_dir=None):
+    path = index_path(CHUNKS_FILE, index_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            [{"page_content": d.page_content, "metadata": d.metadata} for d in docs],
+            f, ensure_ascii=False
+        )
+
+
+def load_chunks(index_dir=None) -> list[Document]:
+    """Chunk Documents in ingestion order; empty if setup.py has not written them yet."""
+    path = index_path(CHUNKS_FILE, index_dir)
+    if not path.exists():
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [Document(page_content=d["page_content"], metadata=d["metadata"]) for d in json.load(f)]
+
+
+def save_vectors(ids, codes, scales=None, index_dir=None):
+    path = index_path(VECTORS_FILE, index_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(
+        path,
+        ids=np.asarray(ids, dtype=np.int64),
+        codes=codes,
+        scales=scales if scales is not None else np.zeros(0, dtype=np.float32),
+    )
+
+
+def load_vectors(index_dir=None):
+    """Returns (chunk ids, QuantizedMatrix of stored vectors)."""
+    data = np.load(index_path(VECTORS_FILE, index_dir))
+    scales = data["scales"] if data["scales"].size else None
+    return data["ids"], QuantizedMatrix(data["codes"], scales)
+
+
+def save_ann(index, index_dir=None):
+    """Persists an index from retrieval/ann_index.py (rows follow review_vectors.npz)."""
+    path = index_path(ANN_FILES[index.kind], index_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    index.save(path)
+
+
+def load_ann(kind, index_dir=None):
+    """Loads the ANN index of the given kind, or None if setup.py has not built one."""
+    from retrieval.ann_index import ANN_INDEXES
+    if kind not in ANN_INDEXES:
+        raise ValueError(f"Unknown ANN index {kind}, expected one of {sorted(ANN_INDEXES)}")
+    path = index_path(ANN_FILES[kind], index_dir)
+    if not path.exists():
+        return None
+    # search-time knobs come from the serving settings, not the build
+    if kind == "ivfpq":
+        return ANN_INDEXES[kind].load(path, nprobe=settings.IVF_NPROBE)
+    return ANN_INDEXES[kind].load(path, ef_search=settings.HNSW_EF_SEARCH)
+
+
+def load_compressor(index_dir=None) -> VectorCompressor | None:
+    path = index_path(PROJECTION_FILE, index_dir)
+    if not path.exists():
+        return None
+    return VectorCompressor.load(path)
+
+
+def save_bm25(docs, index_dir=None) -> BM25Index:
+    index = BM25Index().build([d.page_content for d in docs], [d.metadata["id"] for d in docs])
+    index.save(index_path(BM25_FILE, index_dir))
+    return index
+
+
+def load_bm25(index_dir=None) -> BM25Index | None:
+    path = index_path(BM25_FILE, index_dir)
+    if not path.exists():
+        return None
+    return BM25Index.load(path)
+
+
+def save_metadata_index(docs, index_dir=None) -> MetadataIndex:
+    index = MetadataIndex().build(docs)
+    index.save(index_path(METADATA_INDEX_FILE, index_dir))
+    return index
+
+
+def load_metadata_index(index_dir=None) -> MetadataIndex | None:
+    path = index_path(METADATA_INDEX_FILE, index_dir)
+    if not path.exists():
+        return None
+    return MetadataIndex.load(path)
+
+
+def save_shards(docs, codes, scales=None, index_dir=None):
+    """
+    Splits the compressed vectors (rows aligned with docs) by course_name:
+    shards/<n>.npz holds that course's chunk ids / codes / scales, and
+    manifest.json maps course names to files plus lecturer -> courses.
+    """
+    shard_dir = index_path(SHARDS_DIR, index_dir)
+    shard_dir.mkdir(parents=True, exist_ok=True)
+
+    rows_by_course, lecturer_courses = {}, {}
+    for row, doc in enumerate(docs):
+        course = doc.metadata.get("course_name")
+        rows_by_course.setdefault(course, []).append(row)
+        lecturer_courses.setdefault(doc.metadata.get("lecturer"), set()).add(course)
+
+    files = {}
+    for n, (course, rows) in enumerate(sorted(rows_by_course.items(), key=lambda item: str(item[0]))):
+        rows = np.asarray(rows)
+        files[course] = f"{n}.npz"
+        np.savez(
+            shard_dir / files[course],
+            ids=np.asarray([docs[r].metadata["id"] for r in rows], dtype=np.int64),
+            codes=codes[rows],
+            scales=scales[rows] if scales is not None else np.zeros(0, dtype=np.float32),
+        )
+
+    with open(shard_dir / SHARD_MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump({
+            "shards": files,
+            "lecturer_courses": {lect: sorted(courses) for lect, courses in lecturer_courses.items()},
+        }, f, ensure_ascii=False)
+
+
+def load_shards(index_dir=None):
+    """
+    Returns (shards, lecturer_courses) with shards: course_name -> (chunk ids,
+    QuantizedMatrix), or None if setup.py has not written shards.
+    """
+    shard_dir = index_path(SHARDS_DIR, index_dir)
+    manifest_path = shard_dir / SHARD_MANIFEST_FILE
+    if not manifest_path.exists():
+        return None
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    shards = {}
+    for course, file_name in manifest["shards"].items():
+        data = np.load(shard_dir / file_name)
+        scales = data["scales"] if data["scales"].size else None
+        shards[course] = (data["ids"], QuantizedMatrix(data["codes"], scales))
+    return shards, manifest["lecturer_courses"]
+
+
+def query_embeddings(base, index_dir=None):
+    """
+    Wraps the base embeddings with the projection the review store was built
+    with, so queries land in the same (possibly reduced) space.
+    """
+    compressor = load_compressor(index_dir)
+    if compressor is None or compressor.method == "none":
+        return base
+    return ProjectedEmbeddings(base, compressor)
@@ -0,0 +1,170 @@
+"""
+Precomputed posting lists over chunk metadata.
+
+For every value of course_name / lecturer / course_id we keep the sorted
+array of chunk ids carrying it, plus all chunk ids sorted by review date for
+range queries. Candidate sets for a filter are then a few NumPy set
+operations instead of a Chroma get(where=...) round trip per filter.
+
+Built by setup.py (INDEX_DIR/metadata_index.json), loaded at startup.
+"""
+
+import json
+from functools import reduce
+
+import numpy as np
+
+FIELDS = ("course_name", "lecturer", "course_id")
+DATE_FIELD = "date"
+
+_EMPTY = np.zeros(0, dtype=np.int64)
+
+
+def intersect(*id_arrays) -> np.ndarray:
+    """AND of sorted id arrays."""
+    if not id_arrays:
+        return _EMPTY
+    return reduce(lambda a, b: np.intersect1d(a, b, assume_unique=True), id_arrays)
+
+
+def union(*id_arrays) -> np.ndarray:
+    """OR of sorted id arrays."""
+    if not id_arrays:
+        return _EMPTY
+    return reduce(np.union1d, id_arrays)
+
+
+class MetadataIndex:
+    def __init__(self):
+        self.postings = {field: {} for field in FIELDS}
+        self.all_ids = _EMPTY
+        self.date_ids = _EMPTY          # chunk ids ordered by date
+        self.date_values = np.zeros(0, dtype=str)
+
+    # ------------------------------------------------------------------
+    # build / persist
+    # ------------------------------------------------------------------
+    def build(self, docs):
+        lists = {field: {} for field in FIELDS}
+        dated = []
+        for doc in docs:
+            chunk_id = doc.metadata["id"]
+            for field in FIELDS:
+                value = doc.metadata.get(field)
+                if value is not None:
+                    lists[field].setdefault(value, []).append(chunk_id)
+            if doc.metadata.get(DATE_FIELD):
+                dated.append((doc.metadata[DATE_FIELD], chunk_id))
+
+        self.postings = {
+            field: {value: np.unique(np.asarray(ids, dtype=np.int64)) for value, ids in values.items()}
+            for field, values in lists.items()
+        }
+        self.all_ids = np.unique(np.asarray([doc.metadata["id"] for doc in docs], dtype=np.int64))
+        dated.sort()
+        # "YYYY-MM-DD HH:MM:SS" strings sort chronologically
+        self.date_values = np.asarray([d for d, _ in dated], dtype=str)
+        self.date_ids = np.asarray([i for _, i in dated], dtype=np.int64)
+        return self
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "postings": {
+                    field: {value: ids.tolist() for value, ids in values.items()}
+                    for field, values in self.postings.items()
+                },
+                "all_ids": self.all_ids.tolist(),
+                "date_values": self.date_values.tolist(),
+                "date_ids": self.date_ids.tolist(),
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls()
+        index.postings = {
+            field: {value: np.asarray(ids, dtype=np.int64) for value, ids in values.items()}
+            for field, values in data["postings"].items()
+        }
+        index.all_ids = np.asarray(data["all_ids"], dtype=np.int64)
+        index.date_values = np.asarray(data["date_values"], dtype=str)
+        index.date_ids = np.asarray(data["date_ids"], dtype=np.int64)
+        return index
+
+    # ------------------------------------------------------------------
+    # lookups
+    # ------------------------------------------------------------------
+    def lookup(self, field, value) -> np.ndarray:
+        return self.postings[field].get(value, _EMPTY)
+
+    def any_of(self, field, values) -> np.ndarray:
+        return union(*[self.lookup(field, v) for v in values])
+
+    def _date_bound(self, op, value) -> np.ndarray:
+        # a bare date ("2016-07-28") compares as the whole day
+        day_end = value + "\uffff"
+        if op == "$gte":
+            return np.sort(self.date_ids[np.searchsorted(self.date_values, value, side="left"):])
+        if op == "$gt":
+            return np.sort(self.date_ids[np.searchsorted(self.date_values, day_end, side="right"):])
+        if op == "$lte":
+            return np.sort(self.date_ids[:np.searchsorted(self.date_values, day_end, side="right")])
+        if op == "$lt":
+            return np.sort(self.date_ids[:np.searchsorted(self.date_values, value, side="left")])
+        raise ValueError(f"Unsupported date operator {op}")
+
+    def date_range(self, start=None, end=None) -> np.ndarray:
+        """Chunk ids with start <= date <= end (dates as 'YYYY-MM-DD[ HH:MM:SS]' strings)."""
+        parts = []
+        if start is not None:
+            parts.append(self._date_bound("$gte", start))
+        if end is not None:
+            parts.append(self._date_bound("$lte", end))
+        return intersect(*parts) if parts else np.sort(self.date_ids)
+
+    def _condition(self, field, condition):
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+
+        parts = []
+        for op, operand in condition.items():
+            if field == DATE_FIELD and op in ("$gt", "$gte", "$lt", "$lte"):
+                parts.append(self._date_bound(op, operand))
+            elif field not in self.postings:
+                return None
+            elif op == "$eq":
+                parts.append(self.lookup(field, operand))
+            elif op == "$in":
+                parts.append(self.any_of(field, operand))
+            elif op == "$ne":
+                parts.append(np.setdiff1d(self.all_ids, self.lookup(field, operand), assume_unique=True))
+            elif op == "$nin":
+                parts.append(np.setdiff1d(self.all_ids, self.any_of(field, operand), assume_unique=True))
+            else:
+                return None
+        return intersect(*parts)
+
+    def evaluate(self, where):
+        """
+        Sorted chunk ids matching a Chroma-style where filter.
+        Returns all ids for an empty filter and None if the filter uses a field
+        or operator the index does not cover (callers should fall back).
+        """
+        if not where:
+            return self.all_ids
+
+        parts = []
+        for key, condition in where.items():
+            if key in ("$and", "$or"):
+                subs = [self.evaluate(sub) for sub in condition]
+                if any(sub is None for sub in subs):
+                    return None
+                parts.append(intersect(*subs) if key == "$and" else union(*subs))
+            else:
+                ids = self._condition(key, condition)
+                if ids is None:
+                    return None
+                parts.append(ids)
+        return intersect(*parts)
@@ -0,0 +1,216 @@
+"""
+Exact in-memory vector search over the review chunks.
+
+All chunk vectors live in one contiguous (possibly float16 / int8, see
+embedding/compression.py) matrix, with a boolean mask per course_name /
+lecturer / course_id value. A filtered top-k is one masked matrix-vector
+product plus argpartition, which for our corpus size beats a round trip
+through Chroma's SQLite-backed `where` filter.
+
+Exposes the subset of the Chroma vectorstore interface that retrieval uses,
+so it can be passed to enhanced_retrieve in place of the Chroma store.
+
+With an ANN index (retrieval/ann_index.py) unfiltered and broadly filtered
+queries go through it instead, and its candidates are re-scored exactly.
+"""
+
+from collections import defaultdict
+
+import numpy as np
+
+from config import settings
+from embedding.compression import QuantizedMatrix
+from retrieval.filters import matches_where
+from retrieval.index_store import load_ann, load_chunks, load_vectors, query_embeddings
+
+MASK_FIELDS = ("course_name", "lecturer", "course_id")
+
+
+class NumpyVectorIndex:
+    def __init__(self, docs, matrix: QuantizedMatrix, embeddings, mask_fields=MASK_FIELDS, ann=None):
+        """
+        docs: chunk Documents, row i of matrix is the vector of docs[i].
+        embeddings: query embeddings in the same space as matrix (see index_store.query_embeddings).
+        ann: optional ANN index built over the rows of matrix.
+        """
+        if len(docs) != matrix.shape[0]:
+            raise ValueError(f"{len(docs)} docs but {matrix.shape[0]} vectors")
+
+        self.docs = docs
+        self.matrix = matrix
+        self.embeddings = embeddings
+        self.ann = ann
+        self.masks = {}
+        for field in mask_fields:
+            positions = defaultdict(list)
+            for pos, doc in enumerate(docs):
+                positions[doc.metadata.get(field)].append(pos)
+            self.masks[field] = {}
+            for value, pos in positions.items():
+                mask = np.zeros(len(docs), dtype=bool)
+                mask[pos] = True
+                self.masks[field][value] = mask
+
+    @classmethod
+    def from_index_store(cls, embeddings, index_dir=None, ann=None):
+        """
+        Loads the chunks and compressed vectors written by setup.py.
+        ann: "hnsw" / "ivfpq" to also load that ANN index (setup.py with ANN_INDEX set).
+        """
+        docs = load_chunks(index_dir)
+        ids, matrix = load_vectors(index_dir)
+        by_id = {doc.metadata["id"]: doc for doc in docs}
+        docs = [by_id[int(i)] for i in ids]
+
+        ann_index = None
+        if ann is not None:
+            ann_index = load_ann(ann, index_dir)
+            if ann_index is None:
+                raise FileNotFoundError(f"No {ann} index in the index store: set ANN_INDEX={ann} and rerun setup.py")
+        return cls(docs, matrix, query_embeddings(embeddings, index_dir), ann=ann_index)
+
+    # ------------------------------------------------------------------
+    # filtering
+    # ------------------------------------------------------------------
+    def _condition_mask(self, field, condition):
+        values = self.masks[field]
+        empty = np.zeros(len(self.docs), dtype=bool)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+
+        mask = np.ones(len(self.docs), dtype=bool)
+        for op, operand in condition.items():
+            if op == "$eq":
+                mask &= values.get(operand, empty)
+            elif op == "$in":
+                any_of = empty.copy()
+                for value in operand:
+                    any_of |= values.get(value, empty)
+                mask &= any_of
+            elif op == "$ne":
+                mask &= ~values.get(operand, empty)
+            elif op == "$nin":
+                for value in operand:
+                    mask &= ~values.get(value, empty)
+            else:
+                return None
+        return mask
+
+    def where_mask(self, where):
+        """Boolean mask of chunks matching a Chroma-style where filter (None = no filter)."""
+        if not where:
+            return None
+
+        mask = np.ones(len(self.docs), dtype=bool)
+        for key, condition in where.items():
+            if key in ("$and", "$or"):
+                sub_masks = [self.where_mask(sub) for sub in condition]
+                sub_masks = [np.ones(len(self.docs), dtype=bool) if m is None else m for m in sub_masks]
+                combined = np.logical_and.reduce(sub_masks) if key == "$and" else np.logical_or.reduce(sub_masks)
+                mask &= combined
+                continue
+
+            field_mask = self._condition_mask(key, condition) if key in self.masks else None
+            if field_mask is None:
+                # no precomputed mask for this field / operator: evaluate per document
+                field_mask = np.fromiter(
+                    (matches_where(doc.metadata, {key: condition}) for doc in self.docs),
+                    dtype=bool, count=len(self.docs)
+                )
+            mask &= field_mask
+        return mask
+
+    # ------------------------------------------------------------------
+    # search
+    # ------------------------------------------------------------------
+    def search_by_vector(self, embedding, k=4, filter=None) -> list[tuple[int, float]]:
+        """Returns up to k (row, cosine similarity) pairs, best first."""
+        q = np.asarray(embedding, dtype=np.float32)
+        mask = self.where_mask(filter)
+
+        if self.ann is not None and (mask is None or mask.sum() > settings.ANN_EXACT_MAX):
+            return self._ann_search(q, k, mask)
+
+        if mask is None:
+            candidates = None
+            scores = self.matrix.dot(q)
+        else:
+            candidates = np.flatnonzero(mask)
+            if not len(candidates):
+                return []
+            scores = self.matrix.rows(candidates) @ q
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        rows = top if candidates is None else candidates[top]
+        return [(int(row), float(score)) for row, score in zip(rows, scores[top])]
+
+    def _ann_search(self, q, k, mask):
+        rows, scores = self.ann.search(q, k * max(1, settings.ANN_REFINE), mask)
+        if settings.ANN_REFINE > 1 and len(rows):
+            scores = self.matrix.rows(rows) @ q
+        top = np.argsort(-scores)[:k]
+        return [(int(rows[i]), float(scores[i])) for i in top]
+
+    def search_by_vectors(self, embeddings, k=4, filters=None) -> list[list[tuple[int, float]]]:
+        """
+        Batched search_by_vector: one (chunks x queries) product for all
+        queries, then a per-query mask and top-k. filters is a list of where
+        filters aligned with embeddings (None entries = unfiltered).
+        """
+        Q = np.asarray(embeddings, dtype=np.float32)
+        if not len(Q):
+            return []
+        filters = filters if filters is not None else [None] * len(Q)
+        if self.ann is not None:
+            # a full product is what the ANN index is there to avoid
+            return [self.search_by_vector(q, k, where) for q, where in zip(Q, filters)]
+        scores = self.matrix.dot(Q)
+
+        results = []
+        for j, where in enumerate(filters):
+            column = scores[:, j]
+            mask = self.where_mask(where)
+            if mask is None:
+                candidates = np.arange(len(column))
+            else:
+                candidates = np.flatnonzero(mask)
+                column = column[candidates]
+            if not len(candidates):
+                results.append([])
+                continue
+            top_k = min(k, len(column))
+            top = np.argpartition(-column, top_k - 1)[:top_k]
+            top = top[np.argsort(-column[top])]
+            results.append([(int(candidates[i]), float(column[i])) for i in top])
+        return results
+
+    def similarity_search_by_vectors(self, embeddings, k=4, filters=None):
+        """One list of Documents per query vector."""
+        return [
+            [self.docs[row] for row, _ in hits]
+            for hits in self.search_by_vectors(embeddings, k, filters)
+        ]
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        return [self.docs[row] for row, _ in self.search_by_vector(embedding, k, filter)]
+
+    def similarity_search_with_score(self, query, k=4, filter=None, **kwargs):
+        """Note: scores are cosine similarities (higher is better), unlike Chroma's distances."""
+        hits = self.search_by_vector(self.embeddings.embed_query(query), k, filter)
+        return [(self.docs[row], score) for row, score in hits]
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def get(self, where=None, **kwargs):
+        """Chroma-style get(): all documents / metadatas matching where."""
+        mask = self.where_mask(where)
+        rows = range(len(self.docs)) if mask is None else np.flatnonzero(mask)
+        docs = [self.docs[row] for row in rows]
+        return {
+            "ids": [str(doc.metadata.get("id")) for doc in docs],
+            "documents": [doc.page_content for doc in docs],
+            "metadatas": [doc.metadata for doc in docs],
+        }
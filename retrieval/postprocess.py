@@ -0,0 +1,202 @@
+"""
+Post-retrieval cleanup of the chunks that go into the generation prompt.
+
+setup.py splits reviews into 300-char chunks with 50 chars of overlap, and
+the subqueries of one request are searched independently, so the flattened
+results repeat chunks and contain neighbouring pieces of the same review.
+Here we:
+
+1. drop duplicate chunks (by chunk id),
+2. merge consecutive chunks of the same review into one passage, removing
+   the overlapping text,
+3. optionally re-select passages with MMR (relevance vs. redundancy) and/or
+   cut the list at a token budget.
+"""
+
+import numpy as np
+from langchain_core.documents import Document
+
+from embedding.embedder import PASSAGE_PREFIX, strip_prefix
+
+CHARS_PER_TOKEN = 3         # rough average for mixed Hebrew / English text
+MIN_OVERLAP = 5             # shorter common affixes are treated as coincidence
+MAX_OVERLAP = 120
+
+
+def chunk_key(doc):
+    return doc.metadata.get("id", doc.page_content)
+
+
+def review_key(doc):
+    meta = doc.metadata
+    if meta.get("review_idx") is None or meta.get("id") is None:
+        return None
+    return meta.get("course_id"), meta.get("lecturer"), meta["review_idx"]
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def dedupe(docs):
+    """Keeps the first occurrence of every chunk."""
+    seen = set()
+    unique = []
+    for doc in docs:
+        key = chunk_key(doc)
+        if key not in seen:
+            seen.add(key)
+            unique.append(doc)
+    return unique
+
+
+def overlap_length(left: str, right: str, max_overlap=MAX_OVERLAP) -> int:
+    """Length of the longest suffix of left that is a prefix of right."""
+    for size in range(min(len(left), len(right), max_overlap), MIN_OVERLAP - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _join(left: str, right: str) -> str:
+    size = overlap_length(left, right)
+    if size:
+        return left + right[size:]
+    return f"{left.rstrip()} {right.lstrip()}"
+
+
+def merge_adjacent(docs):
+    """
+    Merges chunks with consecutive ids from the same review into one Document
+    (metadata of the first chunk + "chunk_ids"). A merged passage takes the
+    rank position of its best-ranked chunk.
+    """
+    by_review = {}
+    for doc in docs:
+        key = review_key(doc)
+        if key is not None:
+            by_review.setdefault(key, []).append(doc)
+
+    replacement = {}        # chunk id -> merged doc of its run
+    for chunks in by_review.values():
+        if len(chunks) < 2:
+            continue
+        chunks = sorted(chunks, key=lambda d: d.metadata["id"])
+        runs = [[chunks[0]]]
+        for doc in chunks[1:]:
+            if doc.metadata["id"] == runs[-1][-1].metadata["id"] + 1:
+                runs[-1].append(doc)
+            else:
+                runs.append([doc])
+
+        for run in runs:
+            if len(run) < 2:
+                continue
+            text = strip_prefix(run[0].page_content, PASSAGE_PREFIX)
+            for doc in run[1:]:
+                text = _join(text, strip_prefix(doc.page_content, PASSAGE_PREFIX))
+            if run[0].page_content.startswith(PASSAGE_PREFIX):
+                text = PASSAGE_PREFIX + text
+            metadata = {**run[0].metadata, "chunk_ids": [d.metadata["id"] for d in run]}
+            # the passage ranks like its best chunk (see cascade first pass)
+            scores = [d.metadata["retrieval_score"] for d in run if d.metadata.get("retrieval_score") is not None]
+            if scores:
+                metadata["retrieval_score"] = max(scores)
+            merged = Document(page_content=text, metadata=metadata)
+            for doc in run:
+                replacement[doc.metadata["id"]] = merged
+
+    out = []
+    emitted = set()
+    for doc in docs:
+        merged = replacement.get(doc.metadata.get("id")) if review_key(doc) is not None else None
+        if merged is None:
+            out.append(doc)
+        elif id(merged) not in emitted:
+            emitted.add(id(merged))
+            out.append(merged)
+    return out
+
+
+def passage_vectors(docs, embeddings, chunks_by_id=None) -> np.ndarray:
+    """
+    Normalized vectors of the passages. Chunks go through embed_documents,
+    i.e. the embedding cache (they were all embedded at ingestion); merged
+    passages get the mean of their chunk vectors.
+    """
+    chunks_by_id = chunks_by_id or {}
+
+    def sources(doc):
+        ids = doc.metadata.get("chunk_ids")
+        if ids and all(cid in chunks_by_id for cid in ids):
+            return [chunks_by_id[cid].page_content for cid in ids]
+        return [doc.page_content]
+
+    groups = [sources(doc) for doc in docs]
+    flat = [text for group in groups for text in group]
+    vectors = np.asarray(embeddings.embed_documents(flat), dtype=np.float32)
+
+    rows, start = [], 0
+    for group in groups:
+        v = vectors[start:start + len(group)].mean(axis=0)
+        start += len(group)
+        rows.append(v / (np.linalg.norm(v) or 1.0))
+    return np.stack(rows)
+
+
+def mmr(docs, query_vector, doc_vectors, lambda_mult=0.7, token_budget=0):
+    """
+    Maximal marginal relevance: greedily picks the passage maximizing
+    lambda * sim(query) - (1 - lambda) * max sim(already picked), until the
+    candidates or the token budget (0 = unlimited) run out.
+    """
+    if not docs:
+        return []
+    query_vector = np.asarray(query_vector, dtype=np.float32)
+    relevance = doc_vectors @ query_vector
+    pairwise = doc_vectors @ doc_vectors.T
+
+    selected = []
+    remaining = list(range(len(docs)))
+    used_tokens = 0
+    while remaining:
+        if selected:
+            redundancy = pairwise[np.ix_(remaining, selected)].max(axis=1)
+        else:
+            redundancy = np.zeros(len(remaining))
+        scores = lambda_mult * relevance[remaining] - (1 - lambda_mult) * redundancy
+        best = remaining.pop(int(np.argmax(scores)))
+
+        tokens = estimate_tokens(docs[best].page_content)
+        if token_budget and used_tokens + tokens > token_budget:
+            continue
+        used_tokens += tokens
+        selected.append(best)
+    return [docs[i] for i in selected]
+
+
+def apply_token_budget(docs, token_budget):
+    """Keeps passages in rank order while they fit into the budget (0 = unlimited)."""
+    if not token_budget:
+        return docs
+    out, used = [], 0
+    for doc in docs:
+        tokens = estimate_tokens(doc.page_content)
+        if used + tokens <= token_budget:
+            out.append(doc)
+            used += tokens
+    return out
+
+
+def postprocess(docs, merge=True, use_mmr=False, query_vector=None, embeddings=None,
+                lambda_mult=0.7, token_budget=0, chunks_by_id=None):
+    """
+    Dedupe -> merge adjacent chunks -> MMR (if enabled) or plain token budget.
+    chunks_by_id: the ingested chunks, so merged passages reuse cached chunk vectors.
+    """
+    docs = dedupe(docs)
+    if merge:
+        docs = merge_adjacent(docs)
+    if use_mmr and query_vector is not None and embeddings is not None and docs:
+        return mmr(docs, query_vector, passage_vectors(docs, embeddings, chunks_by_id), lambda_mult, token_budget)
+    return apply_token_budget(docs, token_budget)
@@ -0,0 +1,105 @@
+"""
+Bounded LRU / TTL cache of semantic_search results.
+
+Keyed by (normalized subquery, canonicalized where filter): the same
+subquery under the same course / lecturer filter returns the same chunks.
+
+The cache is process-scoped, like the indexes it answers from: chunks,
+BM25, metadata index, shards and the vector store are all loaded once at
+startup. After setup.py rebuilds the review stores, restart the server;
+that reloads the indexes and starts with an empty cache.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from embedding.cache import normalize_text
+
+
+def canonical_filter(where) -> str:
+    """Stable string for a where filter: key order and $in / $and / $or member order do not matter."""
+    def canon(value):
+        if isinstance(value, dict):
+            return {key: canon(value[key]) for key in sorted(value)}
+        if isinstance(value, list):
+            return sorted((canon(v) for v in value), key=lambda v: json.dumps(v, ensure_ascii=False, sort_keys=True))
+        return value
+
+    if not where:
+        return ""
+    return json.dumps(canon(where), ensure_ascii=False, sort_keys=True)
+
+
+class SearchResultCache:
+    """Thread-safe LRU with per-entry TTL and hit / miss counters."""
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 3600):
+        """ttl_seconds <= 0 disables expiry."""
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()      # key -> (expires_at, docs)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def make_key(self, query: str, where=None):
+        return normalize_text(query).lower(), canonical_filter(where)
+
+    def get(self, query: str, where=None):
+        """Cached list of Documents, or None."""
+        key = self.make_key(query, where)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(entry[1])
+
+    def contains(self, query: str, where=None) -> bool:
+        """Like get() but without touching LRU order or counters."""
+        key = self.make_key(query, where)
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and (entry[0] is None or entry[0] >= time.monotonic())
+
+    def put(self, query: str, where, docs):
+        if self.max_size <= 0:
+            return
+        key = self.make_key(query, where)
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds > 0 else None
+        with self._lock:
+            self._entries[key] = (expires_at, list(docs))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_size": self.max_size,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
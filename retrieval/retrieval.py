@@ -17,18 +17,49 @@ Retrieves more than needed: It doesn't just retrieve 3 chunks.
 This approach ensures that the most relevant chunks are considered for final selection.
 """
 
-#from bm25_retriever import BM25Retriever
 import json
 import os
-from queryProcess.query_enhancement import query_enhancement, split_query, clean_json_query
-from sql_retrieval.run_sql import run_sql_query
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from langchain_core.documents import Document
+from config import settings
+from queryProcess.query_enhancement import understand_query
+from queryProcess.gazetteer import get_gazetteer
+from sql_retrieval.run_sql import is_bad_sql, run_sql_query
 from sql_retrieval.clean_sql import clean_result
-from sql_retrieval.table_router import route_query_to_table
+from sql_retrieval.table_router import route_query_to_table, route_queries_to_tables
 from query_classification.query_classifier_module import QueryClassifier
+from query_classification.knn_router import get_knn_router
+from query_type.queryType import queryType
+from embedding.compression import ProjectedEmbeddings, embed_queries
+from retrieval.bm25_index import reciprocal_rank_fusion
+from retrieval.index_store import load_bm25, load_chunks, load_metadata_index
+from retrieval.result_cache import SearchResultCache
+from retrieval.postprocess import postprocess
+from retrieval.shards import ShardRouter
 
 # load logistic regression model for query classification
 clf = QueryClassifier()
 
+# ingestion artifacts from setup.py (empty / None until it has been run)
+chunk_docs = load_chunks()
+docs_by_id = {doc.metadata["id"]: doc for doc in chunk_docs}
+metadata_index = load_metadata_index()
+
+# lexical side of the hybrid search; None -> vector search only
+bm25_index = load_bm25() if settings.HYBRID_SEARCH and chunk_docs else None
+_search_pool = ThreadPoolExecutor(max_workers=4)
+
+# per-course shards: filtered vector searches only scan the matching courses
+shard_router = ShardRouter.load(docs=chunk_docs) if settings.SHARDED_SEARCH and chunk_docs else None
+
+# repeated (subquery, filter) pairs skip the search; lives as long as the
+# indexes above, so a rebuilt index (setup.py) needs a restart anyway
+search_cache = SearchResultCache(
+    max_size=settings.SEARCH_CACHE_SIZE,
+    ttl_seconds=settings.SEARCH_CACHE_TTL_SECONDS,
+)
+
 
 def build_vector_filters(metadata):
     """
@@ -43,68 +74,120 @@ def build_vector_filters(metadata):
         return None
     return filters
 
-def filter_docs(query, vector_store, filters):
+def filter_docs(query, vector_store, filters, mode="and"):
     """
-    filters: list of dicts with keys "course_name" and "lecturer"
+    filters: list of where-dicts (see build_vector_filters), combined with AND
+    (or OR with mode="or"). Returns the matching chunk Documents.
+
+    Candidate chunks come from the precomputed metadata index; without it we
+    fall back to a single vector_store.get round trip.
     """
     if not filters:
-        return docs
+        return chunk_docs
 
-    relevant_docs = []
-    for filter in filters:
-        all = vector_store.get(where=filter)
-        metadata = [data for data in all['metadatas']]
-        docs = [data for data in all['documents']]
+    if len(filters) == 1:
+        where = filters[0]
+    else:
+        where = {"$and" if mode == "and" else "$or": filters}
 
-        for i in range(len(metadata)):
-            relevant_docs.append((metadata[i], docs[i]))
+    ids = metadata_index.evaluate(where) if metadata_index is not None else None
+    if ids is not None:
+        return [docs_by_id[i] for i in ids.tolist() if i in docs_by_id]
 
-    return docs
+    results = vector_store.get(where=where)
+    return [
+        Document(page_content=text, metadata=meta)
+        for text, meta in zip(results["documents"], results["metadatas"])
+    ]
 
-"""
-def keyword_search(query, docs):
-    # initialize BM25 instance
-    retriever = BM25Retriever.from_documents(docs_split)
+def keyword_search(query, where=None, k=settings.HYBRID_BM25_K):
+    """
+    BM25 search over the review chunks, honoring the same where filter as the vector search.
+    """
+    candidate_ids = metadata_index.evaluate(where) if metadata_index is not None and where else None
+    hits = bm25_index.search(query, k=k, docs=chunk_docs, where=where, candidate_ids=candidate_ids)
+    return [chunk_docs[pos] for pos, _ in hits]
 
-    # Query the retriever
-    results = retriever.invoke(query)
-    return results
-"""
+def _vector_k():
+    return settings.HYBRID_VECTOR_K if bm25_index is not None else settings.SEARCH_K
 
-def semantic_search(subquery, vectorstore, metadata):
+def vector_search(query, vectorstore, where=None, embedding=None, k=None):
     """
-    Detect metadata in subquery and apply AND filter for Chroma.
+    Vector side of the search. Filters that pin down a set of courses go to
+    the per-course shards, everything else to the global store. Uses the
+    precomputed query vector when given (must be in the store's space)
+    instead of embedding the query again.
+    """
+    k = k or _vector_k()
+    routable = where and shard_router is not None and shard_router.route(where) is not None
+    if routable:
+        if embedding is None:
+            embedding = vectorstore.embeddings.embed_query(query)
+        return shard_router.similarity_search_by_vector(np.asarray(embedding, dtype=np.float32), k, where)
+
+    # no course restriction: global index
+    if embedding is not None:
+        embedding = np.asarray(embedding, dtype=np.float32).tolist()
+        return vectorstore.similarity_search_by_vector(embedding, k=k, filter=where)
+    return vectorstore.similarity_search(query=query, k=k, filter=where)
+
+def hybrid_search(query, vectorstore, where=None, embedding=None, vector_docs=None):
+    """
+    Runs the vector search and the BM25 search in parallel and merges them
+    with reciprocal rank fusion. Exact course / lecturer name hits are cheap
+    to find lexically, so the vector side can use a smaller k.
+    vector_docs: vector-side results already computed in a batched search.
+    Every returned Document carries its fused score in metadata["retrieval_score"]
+    (a vector-only search is a one-list fusion), reused by the cascade reranker.
+    """
+    if bm25_index is None:
+        if vector_docs is None:
+            vector_docs = vector_search(query, vectorstore, where, embedding)
+        rankings = [vector_docs[:settings.SEARCH_K]]
+    else:
+        if vector_docs is None:
+            vector_future = _search_pool.submit(vector_search, query, vectorstore, where, embedding)
+        lexical = keyword_search(query, where)
+        rankings = [vector_docs if vector_docs is not None else vector_future.result(), lexical]
+
+    merged = reciprocal_rank_fusion(
+        rankings,
+        key=lambda doc: doc.metadata.get("id", doc.page_content),
+        k=settings.RRF_K,
+        with_scores=True,
+    )
+    # copies: the store may hand out the shared chunk Documents
+    return [
+        Document(page_content=doc.page_content, metadata={**doc.metadata, "retrieval_score": score})
+        for doc, score in merged[:settings.SEARCH_K]
+    ]
+
+def subquery_filter(subquery, metadata):
+    """
+    Detect metadata in subquery and build the AND filter for the vector store
+    (None -> unfiltered search).
     """
-
     if not metadata:
-        return vectorstore.similarity_search(
-            query=subquery,
-            k=15,
-        )
+        return None
 
-    courses = metadata.get("course", [])
-    lecturers = metadata.get("lecturer", [])
+    # mentions resolved by the alias engine (whole words, prefixes, variants,
+    # typos); names it doesn't know fall back to a substring check. Fuzzy
+    # mentions count only for names already in metadata (LLM-confirmed).
+    gazetteer = get_gazetteer()
+    mentioned = gazetteer.extract(subquery, fuzzy=True)
 
     exprs = []
 
     # Build individual expressions (each is a separate where-clause)
-    for course in courses:
-        if course in subquery:
-            # filter by nickname
-            #official_name = NICKNAMES_MAP.get(course, course)
-            exprs.append({"course_name": {"$eq": course}})
-
-    for lecturer in lecturers:
-        if lecturer in subquery:
-            exprs.append({"lecturer": {"$eq": lecturer}})
+    for field, kind in (("course_name", "course"), ("lecturer", "lecturer")):
+        for name in metadata.get(kind, []):
+            known = gazetteer.resolve(name, kind) is not None
+            if (known and name in mentioned[kind]) or (not known and name in subquery):
+                exprs.append({field: {"$eq": name}})
 
     # If no metadata detected → plain semantic search
     if not exprs:
-        return vectorstore.similarity_search(
-            query=subquery,
-            k=15,
-        )
-    
+        return None
 
     # If exactly one expression → don’t wrap in $and
     if len(exprs) == 1:
@@ -112,41 +195,187 @@ def semantic_search(subquery, vectorstore, metadata):
     else:
         # Proper AND filter
         where = {"$and": exprs}
-    
-    print("Applying filter to vector search:", where)
 
-    # Perform search with filter, return top 10 results
-    return vectorstore.similarity_search(
-            query=subquery,
-            k=15,
-            filter=where
-        )
-"""
-def classify_query(query: str, classification_vectorstore):
-    results = classification_vectorstore.similarity_search_with_score(query, k=1)
+    return where
 
-    if not results:
-        return {"route": "semantic", "score": None, "table": None}
+def semantic_search(subquery, vectorstore, metadata, embedding=None, vector_docs=None):
+    """
+    Filtered hybrid search for one subquery, top SEARCH_K results.
+    """
+    where = subquery_filter(subquery, metadata)
+    if where:
+        print("Applying filter to vector search:", where)
 
-    doc, _ = results[0]
+    cached = search_cache.get(subquery, where)
+    if cached is not None:
+        return cached
 
-    # return the same type as the closest query
-    return doc.metadata["route"]
-"""
+    result = hybrid_search(subquery, vectorstore, where, embedding, vector_docs)
+    search_cache.put(subquery, where, result)
+    return result
+
+def base_embeddings(store):
+    """The unprojected embeddings behind a store (see index_store.query_embeddings)."""
+    embeddings = getattr(store, "embeddings", None)
+    return embeddings.base if isinstance(embeddings, ProjectedEmbeddings) else embeddings
+
+def embed_subqueries(subqueries, vectorstore):
+    """
+    One batched encode for all subqueries. Returns (base vectors, vectors in
+    the review store's space); they differ only if the store is projected.
+    """
+    embeddings = getattr(vectorstore, "embeddings", None)
+    if embeddings is None or not subqueries:
+        return None, None
+    base = np.asarray(embed_queries(base_embeddings(vectorstore), subqueries), dtype=np.float32)
+    if isinstance(embeddings, ProjectedEmbeddings):
+        return base, embeddings.compressor.project(base)
+    return base, base
+
+def route_subqueries(subqueries, base_vectors, vectorstore, db_schemas):
+    """Table metadata for each SQL subquery, from one matrix product against the schema vectors."""
+    if not subqueries:
+        return []
+    schema_embeddings = getattr(db_schemas, "embeddings", None)
+    if base_vectors is None or schema_embeddings is not base_embeddings(vectorstore):
+        # schema store lives in a different space: embed once more, still batched
+        base_vectors = embed_queries(schema_embeddings, subqueries)
+    return route_queries_to_tables(base_vectors, db_schemas)
+
+def batch_vector_search(subqueries, vectors, vectorstore, metadata):
+    """
+    Vector side of the search for all semantic subqueries in one matrix-level
+    call, if the store supports it (NumpyVectorIndex). Returns a list aligned
+    with subqueries, or None (each subquery then searches by its own vector);
+    None entries are left to vector_search.
+    """
+    if not subqueries or vectors is None or not hasattr(vectorstore, "similarity_search_by_vectors"):
+        return None
+    wheres = [subquery_filter(subquery, metadata) for subquery in subqueries]
+
+    # course-filtered subqueries are cheaper on their shards (see vector_search)
+    batched = [
+        i for i, where in enumerate(wheres)
+        if not (where and shard_router is not None and shard_router.route(where) is not None)
+    ]
+    hits = [None] * len(subqueries)
+    if batched:
+        results = vectorstore.similarity_search_by_vectors(
+            vectors[batched], k=_vector_k(), filters=[wheres[i] for i in batched]
+        )
+        for i, docs in zip(batched, results):
+            hits[i] = docs
+    return hits
 
 def classify_query(query: str):
     return clf.classify(query)["type"]
 
+def decide_routes(queries, route_hints=None, query_vectors=None, embeddings=None):
+    """
+    "sql" / "semantic" per subquery, or "both" when there is no route hint and
+    the router is less than DUAL_PATH_THRESHOLD confident. The kNN router
+    needs the subqueries' vectors (and the embeddings they came from).
+    """
+    if not queries:
+        return []
+    if not (settings.USE_ROUTE_HINTS and route_hints):
+        route_hints = [None] * len(queries)
+
+    if settings.QUERY_ROUTER == "knn" and query_vectors is not None:
+        decisions = get_knn_router(embeddings).route_vectors(query_vectors)
+    else:
+        decisions = clf.classify_batch(queries)
+
+    routes = []
+    for result, hint in zip(decisions, route_hints):
+        if hint:
+            routes.append(hint)
+        elif settings.DUAL_PATH_ROUTING and result["confidence"] < settings.DUAL_PATH_THRESHOLD:
+            routes.append("both")
+        else:
+            routes.append(result["type"])
+    return routes
+
+_query_typer = None
+
+def tie_break(subquery):
+    """queryType.determine verdict for an uncertain subquery: "sql", "semantic" or None."""
+    global _query_typer
+    if _query_typer is None:
+        _query_typer = queryType()
+    try:
+        verdict = _query_typer.determine(subquery).strip().strip('."\'').lower()
+    except Exception as e:
+        print(f"Tie-breaker failed for '{subquery}': {e!r}")
+        return None
+    return verdict if verdict in ("sql", "semantic") else None
+
+def merge_dual_paths(subquery, sql_future, semantic_future, verdict_future=None):
+    """
+    Outcome of a subquery run down both paths: every path that succeeded
+    (SQL rows / passages found), or only the tie-breaker's pick when both did.
+    Returns [(qtype, result), ...], empty if neither path produced anything.
+    """
+    succeeded = {}
+    for qtype, future in (("sql", sql_future), ("semantic", semantic_future)):
+        try:
+            _, result = future.result()
+        except Exception as e:
+            print(f"Subquery '{subquery}' failed on the {qtype} path: {e!r}")
+            continue
+        if result:
+            succeeded[qtype] = result
+
+    if len(succeeded) == 2 and verdict_future is not None:
+        verdict = verdict_future.result()
+        if verdict in succeeded:
+            succeeded = {verdict: succeeded[verdict]}
+    print(f"Dual-path subquery '{subquery}' kept: {list(succeeded)}")
+    return list(succeeded.items())
+
+def process_subquery(subquery, qtype, metadata, vectorstore, sql_converter, db_schemas=None,
+                     table_metadata=None, embedding=None, vector_docs=None):
+    """
+    Runs one subquery down its path. Routing, the query vector and the
+    vector-side hits may be precomputed in the batched pass of
+    enhanced_retrieve; whatever is missing is computed here.
+    Returns ("sql", rows) or ("semantic", list of Documents).
+    """
+    print(f"Subquery: {subquery} | Type: {qtype}")
+    if qtype == "sql":
+        print("Processing SQL subquery:", subquery)
+
+        # decide which table to use, get the metadata
+        if table_metadata is None:
+            table_metadata = route_query_to_table(subquery, db_schemas)
+        print("Routed to table metadata:", table_metadata)
+
+        # send the metadata to sql_converter along with the subquery
+
+        sql_query = sql_converter.convert(subquery, table_metadata)
+        print("Generated SQL:", sql_query)
+        cleaned_sql = clean_result(sql_query)
+        print("Cleaned SQL:", cleaned_sql)
+        try:
+            answer = run_sql_query(cleaned_sql)
+        except Exception as e:
+            # don't replay broken SQL from the LLM cache; a DB outage leaves it alone
+            if is_bad_sql(e):
+                sql_converter.discard(subquery, table_metadata)
+            raise
+        return "sql", answer
+
+    result = semantic_search(subquery, vectorstore, metadata, embedding, vector_docs)
+    print(f"Semantic search results for subquery '{subquery}':", len(result))
+    print()
+    return "semantic", result
+
 def enhanced_retrieve(query, query_enhancer, vectorstore, sql_converter, conv_state=None, db_schemas=None):
     print("Entered enhanced_retrieve")
     
     # --- ENHANCEMENT ---
-    rewritten, metadata, conv_state = query_enhancement(query, query_enhancer, conv_state)
-    #splitted = query_enhancer.split_query(rewritten)
-    
-    splitted = split_query(rewritten)
-    splitted = clean_json_query(splitted)
-    splitted = json.loads(splitted)
+    # rewrite + entities + split + route hints: one LLM call at most
+    rewritten, metadata, conv_state, splitted, route_hints = understand_query(query, query_enhancer, conv_state)
 
     #extracted = slot_filler.extract(rewritten)
     #conv_state.update(extracted)
@@ -156,48 +385,120 @@ def enhanced_retrieve(query, query_enhancer, vectorstore, sql_converter, conv_st
     print("rewritten:", rewritten)
     print("metadata:", metadata)
     print("splitted:", splitted)
+    print("route hints:", route_hints)
 
     results_valid = []
     sql_results = []
     results_invalid = []
 
-    for subquery in splitted:
-        qtype = classify_query(subquery)
-        print(f"Subquery: {subquery} | Type: {qtype}")
-        if qtype == "sql":
-            print("Processing SQL subquery:", subquery)
-
-            # decide which table to use, get the metadata
-            table_metadata = route_query_to_table(subquery, db_schemas)
-            print("Routed to table metadata:", table_metadata)
-
-            # send the metadata to sql_converter along with the subquery
-
-            sql_query = sql_converter.convert(subquery, table_metadata)
-            print("Generated SQL:", sql_query)
-            cleaned_sql = clean_result(sql_query)
-            print("Cleaned SQL:", cleaned_sql)
-            answer = run_sql_query(cleaned_sql)
-            sql_results.append((subquery, answer))
-            continue
+    # --- BATCHED PASS ---
+    # one encode for all subqueries; the vectors are reused for table routing
+    # and for the vector search, which are each a single matrix-level call
+    # uncertain subqueries ("both") go down the sql and semantic paths at once
+    base_vectors, store_vectors = embed_subqueries(splitted, vectorstore)
+    qtypes = decide_routes(splitted, route_hints, base_vectors, base_embeddings(vectorstore))
+    print("routes:", qtypes)
+
+    sql_positions = [i for i, qtype in enumerate(qtypes) if qtype in ("sql", "both")]
+    # cached semantic subqueries need no vector search at all
+    semantic_positions = [
+        i for i, qtype in enumerate(qtypes)
+        if qtype != "sql" and not search_cache.contains(splitted[i], subquery_filter(splitted[i], metadata))
+    ]
+
+    table_metadatas = dict(zip(sql_positions, route_subqueries(
+        [splitted[i] for i in sql_positions],
+        base_vectors[sql_positions] if base_vectors is not None else None,
+        vectorstore, db_schemas,
+    )))
+    vector_hits = batch_vector_search(
+        [splitted[i] for i in semantic_positions],
+        store_vectors[semantic_positions] if store_vectors is not None else None,
+        vectorstore, metadata,
+    )
+    vector_hits = {
+        i: docs for i, docs in zip(semantic_positions, vector_hits or []) if docs is not None
+    }
+
+    # subqueries are independent: run them concurrently, collect in original order
+    tasks = len(splitted) + qtypes.count("both") * (2 if settings.DUAL_PATH_TIEBREAKER else 1)
+    pool = ThreadPoolExecutor(max_workers=max(1, min(settings.SUBQUERY_WORKERS, tasks)))
+
+    def submit(i, qtype):
+        return pool.submit(
+            process_subquery, splitted[i], qtype, metadata, vectorstore, sql_converter, db_schemas,
+            table_metadata=table_metadatas.get(i),
+            embedding=store_vectors[i] if store_vectors is not None else None,
+            vector_docs=vector_hits.get(i),
+        )
 
-        result = semantic_search(subquery, vectorstore, metadata)
-        print(f"Semantic search results for subquery '{subquery}':", len(result))
-        print()
-        if result:
-          results_valid.append(result)
-        else:
-          results_invalid.append(subquery)
+    try:
+        futures = []
+        for i, subquery in enumerate(splitted):
+            if qtypes[i] == "both":
+                verdict = pool.submit(tie_break, subquery) if settings.DUAL_PATH_TIEBREAKER else None
+                futures.append((submit(i, "sql"), submit(i, "semantic"), verdict))
+            else:
+                futures.append(submit(i, qtypes[i]))
+
+        for subquery, future in zip(splitted, futures):
+            if isinstance(future, tuple):
+                outcomes = merge_dual_paths(subquery, *future)
+                if not outcomes:
+                    results_invalid.append(subquery)
+                for qtype, result in outcomes:
+                    if qtype == "sql":
+                        sql_results.append((subquery, result))
+                    else:
+                        results_valid.append(result)
+                continue
+
+            try:
+                qtype, result = future.result()
+            except Exception as e:
+                # one failing branch (LLM / SQL error) should not kill the whole answer
+                print(f"Subquery '{subquery}' failed: {e!r}")
+                results_invalid.append(subquery)
+                continue
+
+            if qtype == "sql":
+                sql_results.append((subquery, result))
+            elif result:
+                results_valid.append(result)
+            else:
+                results_invalid.append(subquery)
+    finally:
+        # an unneeded tie-breaker call is not waited for
+        pool.shutdown(wait=False, cancel_futures=True)
 
     print("Final results:")
     for i, result in enumerate(results_valid):
         print(f"Valid result {i+1} length: {len(result)}")
     print("Invalid:", len(results_invalid))
     print("SQL results:", len(sql_results))
+    print("Search cache:", search_cache.stats())
     print()
 
     # flatten results_valid
     results_valid = [doc for sublist in results_valid for doc in sublist]
     print("Flattened valid results length:", len(results_valid))
+
+    # --- POST-RETRIEVAL ---
+    # dedupe across subqueries, merge overlapping chunks of the same review
+    query_vector = None
+    embeddings = base_embeddings(vectorstore)
+    if settings.RETRIEVAL_MMR and embeddings is not None and results_valid:
+        query_vector = embeddings.embed_query(rewritten)
+    results_valid = postprocess(
+        results_valid,
+        merge=settings.MERGE_ADJACENT_CHUNKS,
+        use_mmr=settings.RETRIEVAL_MMR,
+        query_vector=query_vector,
+        embeddings=embeddings,
+        lambda_mult=settings.MMR_LAMBDA,
+        token_budget=settings.CONTEXT_TOKEN_BUDGET,
+        chunks_by_id=docs_by_id,
+    )
+    print("Passages after dedup / merge:", len(results_valid))
     
     return results_valid, results_invalid, sql_results, conv_state
\ No newline at end of file
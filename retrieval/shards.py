@@ -0,0 +1,111 @@
+"""
+Per-course shards of the review vectors, for filtered vector search.
+
+Nearly every semantic subquery is filtered to one or two courses and/or
+lecturers. setup.py writes one small exact-search matrix per course_name
+(index_store.save_shards); ShardRouter sends a filtered query to the shards
+of the courses the filter allows (a lecturer filter maps to the courses that
+lecturer teaches) and scans only those, so the cost depends on the course
+size rather than the whole corpus. Queries whose filter does not pin down a
+set of courses return None and go to the global index.
+"""
+
+from retrieval.index_store import load_chunks, load_shards
+from retrieval.numpy_index import NumpyVectorIndex
+
+
+class ShardRouter:
+    def __init__(self, shards: dict, lecturer_courses: dict):
+        """
+        shards: course_name -> NumpyVectorIndex over that course's chunks
+        lecturer_courses: lecturer -> course names with reviews for that lecturer
+        """
+        self.shards = shards
+        self.lecturer_courses = lecturer_courses
+
+    @classmethod
+    def load(cls, index_dir=None, docs=None):
+        """Router over the shards written by setup.py, or None if there are none."""
+        loaded = load_shards(index_dir)
+        if loaded is None:
+            return None
+        shard_vectors, lecturer_courses = loaded
+
+        by_id = {doc.metadata["id"]: doc for doc in (docs if docs is not None else load_chunks(index_dir))}
+        shards = {
+            course: NumpyVectorIndex([by_id[int(i)] for i in ids], matrix, embeddings=None)
+            for course, (ids, matrix) in shard_vectors.items()
+        }
+        return cls(shards, lecturer_courses)
+
+    # ------------------------------------------------------------------
+    # routing
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _values(condition):
+        if not isinstance(condition, dict):
+            return {condition}
+        if set(condition) == {"$eq"}:
+            return {condition["$eq"]}
+        if set(condition) == {"$in"}:
+            return set(condition["$in"])
+        return None
+
+    def route(self, where):
+        """
+        Course names whose shards can contain all matches of where, or None
+        if the filter does not restrict the courses (use the global index).
+        """
+        if not where:
+            return None
+
+        allowed = None          # None = unrestricted
+        for key, condition in where.items():
+            if key in ("$and", "$or"):
+                subs = [self.route(sub) for sub in condition]
+                if key == "$or":
+                    if any(sub is None for sub in subs):
+                        return None
+                    part = set().union(*subs)
+                else:
+                    restricted = [sub for sub in subs if sub is not None]
+                    if not restricted:
+                        continue
+                    part = set.intersection(*restricted)
+            elif key == "course_name":
+                part = self._values(condition)
+            elif key == "lecturer":
+                lecturers = self._values(condition)
+                part = None if lecturers is None else {
+                    course for lect in lecturers for course in self.lecturer_courses.get(lect, [])
+                }
+            else:
+                continue
+
+            if part is not None:
+                allowed = set(part) if allowed is None else allowed & part
+        return allowed
+
+    # ------------------------------------------------------------------
+    # search
+    # ------------------------------------------------------------------
+    def search_by_vector(self, embedding, k=4, filter=None):
+        """
+        Top-k (Document, cosine) pairs over the routed shards, or None if the
+        filter cannot be routed. embedding must be in the stored vectors' space.
+        """
+        courses = self.route(filter)
+        if courses is None:
+            return None
+
+        hits = []
+        for course in courses:
+            shard = self.shards.get(course)
+            if shard is not None:
+                hits.extend((shard.docs[row], score) for row, score in shard.search_by_vector(embedding, k, filter))
+        hits.sort(key=lambda hit: -hit[1])
+        return hits[:k]
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None):
+        hits = self.search_by_vector(embedding, k, filter)
+        return None if hits is None else [doc for doc, _ in hits]
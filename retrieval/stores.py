@@ -0,0 +1,24 @@
+"""
+Factory for the review vector store backend (settings.VECTOR_BACKEND):
+
+    chroma   persisted Chroma collection in ./chroma_db (default)
+    numpy    exact in-memory search over INDEX_DIR (retrieval/numpy_index.py)
+    hnsw     same, with an HNSW index over the vectors (retrieval/ann_index.py)
+    ivfpq    same, with an IVF-PQ index over the vectors
+"""
+
+from config import settings
+from retrieval.index_store import query_embeddings
+
+
+def load_review_store(embeddings, backend=settings.VECTOR_BACKEND, persist_directory="chroma_db"):
+    if backend == "chroma":
+        from langchain_chroma import Chroma
+        return Chroma(persist_directory=persist_directory, embedding_function=query_embeddings(embeddings))
+    if backend == "numpy":
+        from retrieval.numpy_index import NumpyVectorIndex
+        return NumpyVectorIndex.from_index_store(embeddings)
+    if backend in ("hnsw", "ivfpq"):
+        from retrieval.numpy_index import NumpyVectorIndex
+        return NumpyVectorIndex.from_index_store(embeddings, ann=backend)
+    raise ValueError(f"Unknown vector backend: {backend}")
@@ -1,27 +1,17 @@
-from sentence_transformers import SentenceTransformer
-from langchain_core.embeddings import Embeddings
 from langchain_chroma import Chroma  # or use FAISS, Pinecone, etc.
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter # Updated import
+from embedding.embedder import add_e5_prefix_to_docs
+from embedding.registry import get_embeddings
+from embedding.compression import VectorCompressor
+from retrieval.index_store import (
+    PROJECTION_FILE, index_path, query_embeddings, save_ann, save_bm25, save_chunks,
+    save_metadata_index, save_shards, save_vectors
+)
+from retrieval.ann_index import build_ann_index
+from config import settings
 import json
 
-class E5Embeddings(Embeddings):
-    def __init__(self, model_name="intfloat/multilingual-e5-large"):
-        self.model = SentenceTransformer(model_name)
-
-    def embed_documents(self, texts):
-        texts = [f"passage: {t}" for t in texts]
-        return self.model.encode(
-            texts,
-            normalize_embeddings=True
-        ).tolist()
-
-    def embed_query(self, text):
-        return self.model.encode(
-            [f"query: {text}"],
-            normalize_embeddings=True
-        )[0].tolist()
-
 def create_vector_store(docs_split, embeddings, persist_directory="./chroma_db"):
     vectorstore = Chroma.from_documents(
         documents=docs_split,
@@ -30,14 +20,6 @@ def create_vector_store(docs_split, embeddings, persist_directory="./chroma_db")
     )
     return vectorstore
 
-# E5 models work best with instruction prefixes
-def add_e5_prefix_to_docs(docs_split):
-    """Add 'passage: ' prefix for E5 models"""
-    for doc in docs_split:
-        doc.page_content = f"passage: {doc.page_content}"
-    return docs_split
-
-
 with open("data/cleaned_reviews.json", encoding="utf-8") as f:
     data = json.load(f)
     f.close()
@@ -75,9 +57,32 @@ for i, doc in enumerate(docs_split):
     doc.metadata["id"] = i
 
 docs_split = add_e5_prefix_to_docs(docs_split)
-embeddings = E5Embeddings()
-vectorstore = create_vector_store(docs_split, embeddings)
+embeddings = get_embeddings()
+
+# compressed copy of the chunk vectors (optional projection + float16/int8 storage)
+vectors = embeddings.embed_documents([doc.page_content for doc in docs_split])
+compressor = VectorCompressor(settings.VECTOR_PROJECTION, settings.VECTOR_DIM, settings.VECTOR_DTYPE).fit(vectors)
+codes, scales = compressor.compress(vectors)
+compressor.save(index_path(PROJECTION_FILE))
+save_vectors([doc.metadata["id"] for doc in docs_split], codes, scales)
+save_shards(docs_split, codes, scales)
+save_chunks(docs_split)
+save_bm25(docs_split)
+save_metadata_index(docs_split)
+print(f"BM25 and metadata indexes saved to {settings.INDEX_DIR}")
+
+if settings.ANN_INDEX != "none":
+    ann_index = build_ann_index(settings.ANN_INDEX, compressor.dequantize(codes, scales))
+    save_ann(ann_index)
+    print(f"{settings.ANN_INDEX} index saved to {settings.INDEX_DIR}: {ann_index.nbytes / 1e6:.1f} MB")
+print(f"Compressed vectors ({settings.VECTOR_PROJECTION}, {codes.shape[1]}-d, {settings.VECTOR_DTYPE}) "
+      f"saved to {settings.INDEX_DIR}: {codes.nbytes / 1e6:.1f} MB")
+
+# the review store lives in the projected space; queries get the same projection at search time
+vectorstore = create_vector_store(docs_split, query_embeddings(embeddings))
 print("Vector store created at ./chroma_db")
+# running servers keep the previous build (and its cached results) until restarted
+print("Review stores rebuilt: restart the server to serve them")
 
 
 # load schema tables 
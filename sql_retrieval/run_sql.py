@@ -1,4 +1,25 @@
-from config.DB_Connection import get_connection
+from mysql.connector import errorcode
+from mysql.connector.errors import ProgrammingError
+
+from config.DB_Connection import pooled_connection
+
+# ProgrammingErrors about credentials / grants, not about the statement
+_ACCESS_ERRORS = {
+    errorcode.ER_ACCESS_DENIED_ERROR,
+    errorcode.ER_DBACCESS_DENIED_ERROR,
+    errorcode.ER_TABLEACCESS_DENIED_ERROR,
+}
+
+def is_bad_sql(error: Exception) -> bool:
+    """
+    True if the statement itself is wrong (syntax, unknown table / column,
+    not a SELECT); False for operational failures (pool timeout, lost
+    connection, MAX_EXECUTION_TIME abort, access denied) where retrying the
+    same SQL later may succeed.
+    """
+    if isinstance(error, ValueError):
+        return True
+    return isinstance(error, ProgrammingError) and error.errno not in _ACCESS_ERRORS
 
 def run_sql_query(sql: str):
     # safety: allow only SELECT queries
@@ -6,12 +27,11 @@ def run_sql_query(sql: str):
     if not cleaned.startswith("select"):
         raise ValueError("Only SELECT queries are allowed.")
 
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)   # return dict results
+    with pooled_connection() as conn:
+        cursor = conn.cursor(dictionary=True)   # return dict results
 
-    cursor.execute(sql)
-    rows = cursor.fetchall()
+        cursor.execute(sql)
+        rows = cursor.fetchall()
 
-    cursor.close()
-    conn.close()
+        cursor.close()
     return rows
\ No newline at end of file
@@ -3,6 +3,8 @@ from openai import OpenAI
 from dotenv import load_dotenv
 from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
 from sql_retrieval.table_router import cols_to_str
+from sql_retrieval.clean_sql import clean_result
+from util.llm_cache import cached_completion, forget
 from pathlib import Path
 import json
 
@@ -16,12 +18,9 @@ class SQL_converter:
             timeout=30
         )
 
-    @retry(
-        wait=wait_exponential(multiplier=1, min=4, max=10),
-        stop=stop_after_attempt(7),
-        retry=retry_if_exception_type(Exception)
-    )
-    def convert(self, query: str, metadata: dict) -> str:
+    SAMPLING = {"temperature": 0.2, "max_tokens": 8192}
+
+    def _prompt(self, query: str, metadata: dict) -> str:
 
         BASE_DIR = Path(__file__).resolve().parent.parent
         DATA_PATH = BASE_DIR / "data" / "tables.json"
@@ -99,14 +98,30 @@ USER QUESTION:
 
 Return ONLY the SQL query. Nothing else.
 """
+        return prompt
 
-        response = self.client.chat.completions.create(
-            model=self.model_name,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.2,
-            max_tokens=8192
-        )
+    @retry(
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        stop=stop_after_attempt(7),
+        retry=retry_if_exception_type(Exception)
+    )
+    def convert(self, query: str, metadata: dict) -> str:
+        prompt = self._prompt(query, metadata)
+
+        def call():
+            response = self.client.chat.completions.create(
+                model=self.model_name,
+                messages=[{"role": "user", "content": prompt}],
+                **self.SAMPLING
+            )
+            return response.choices[0].message.content.strip()
+
+        # only a SELECT is ever run (run_sql_query); anything else is not worth caching
+        result = cached_completion("sql_converter", self.model_name, prompt, self.SAMPLING, call,
+                                   validate=lambda sql: clean_result(sql).strip().lower().startswith("select"))
 
-        result = response.choices[0].message.content.strip()
+        return result
 
-        return result
\ No newline at end of file
+    def discard(self, query: str, metadata: dict):
+        """Drops the cached SQL for (query, metadata), e.g. after it failed to run."""
+        forget(self.model_name, self._prompt(query, metadata), self.SAMPLING)
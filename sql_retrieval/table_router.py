@@ -1,3 +1,12 @@
+import threading
+
+import numpy as np
+
+# schema vectors per schema store, read once (there are only a handful of tables)
+_schema_matrices = {}
+_schema_lock = threading.Lock()
+
+
 def route_query_to_table(query: str, schema_vectorstore):
     """
     Routes a user query to the most relevant table schema using a vector store.
@@ -13,6 +22,32 @@ def route_query_to_table(query: str, schema_vectorstore):
     relevant_doc = docs[0]
     return relevant_doc.metadata
 
+def _schema_matrix(schema_vectorstore):
+    key = id(schema_vectorstore)
+    with _schema_lock:
+        if key not in _schema_matrices:
+            data = schema_vectorstore.get(include=["embeddings", "metadatas"])
+            _schema_matrices[key] = (np.asarray(data["embeddings"], dtype=np.float32), data["metadatas"])
+        return _schema_matrices[key]
+
+def route_queries_to_tables(query_vectors, schema_vectorstore):
+    """
+    Routes several already-embedded queries at once: one (queries x tables)
+    product against the stored schema vectors instead of a similarity_search
+    (and a query embedding) per query.
+    query_vectors must be in the schema store's embedding space.
+    """
+    if not len(query_vectors):
+        return []
+
+    matrix, metadatas = _schema_matrix(schema_vectorstore)
+    if not len(metadatas):
+        return [None] * len(query_vectors)
+
+    # vectors are L2-normalized, so the highest dot product is also the nearest by distance
+    scores = np.asarray(query_vectors, dtype=np.float32) @ matrix.T
+    return [metadatas[i] for i in scores.argmax(axis=1)]
+
 # convert dict to str
 def cols_to_str(cols):
     res = ""
@@ -0,0 +1,209 @@
+"""
+Persistent cache for LLM completions, shared by every call site.
+
+Entries live in one SQLite file and are keyed by
+sha1(model + sampling parameters + full prompt), so a completion is reused
+only for exactly the same request. Expired entries (TTL) are ignored and
+purged; past max_entries the least recently used ones are evicted.
+
+Only usable completions are stored: a call site passes validate (e.g. "parses
+as JSON") and a completion it rejects is returned but not cached, so the
+next identical request asks the LLM again instead of replaying the failure
+for the whole TTL. Failures found later (SQL that does not run) are removed
+with forget(). Requests sampled above LLM_CACHE_MAX_TEMPERATURE are never
+cached: replaying one sample would freeze the sampling.
+
+Every lookup is counted per call site ("split_query", "sql_converter", ...)
+for /stats. LLM_CACHE_BYPASS=true (or bypass=True on a call) skips the
+lookup but still stores the fresh completion.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from config import settings
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS completions (
+    key      TEXT PRIMARY KEY,
+    site     TEXT NOT NULL,
+    model    TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created  REAL NOT NULL,
+    accessed REAL NOT NULL
+)
+"""
+
+
+def make_key(model: str, prompt, params: dict | None = None) -> str:
+    """prompt is a string or a chat messages list; params are the sampling parameters."""
+    payload = json.dumps(
+        {"model": model, "params": params or {}, "prompt": prompt},
+        ensure_ascii=False, sort_keys=True,
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, path, max_entries: int = 20000, ttl_seconds: float = 7 * 24 * 3600):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        # one connection shared by the request threads; WAL lets several
+        # worker processes read while one writes
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(_SCHEMA)
+        self._db.execute("CREATE INDEX IF NOT EXISTS completions_accessed ON completions (accessed)")
+        self._db.commit()
+
+        self._sites = {}     # call site -> [hits, misses, bypassed, rejected]
+
+    def _count(self, site, slot):
+        self._sites.setdefault(site, [0, 0, 0, 0])[slot] += 1
+
+    def get(self, site: str, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT response, created FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                self._db.execute("DELETE FROM completions WHERE key = ?", (key,))
+                self._db.commit()
+                row = None
+            if row is None:
+                self._count(site, 1)
+                return None
+            self._db.execute("UPDATE completions SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self._count(site, 0)
+            return row[0]
+
+    def put(self, site: str, key: str, model: str, response: str):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO completions (key, site, model, response, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, site, model, response, now, now),
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._db.execute("DELETE FROM completions WHERE key = ?", (key,))
+            self._db.commit()
+
+    def _evict(self, now):
+        self._db.execute("DELETE FROM completions WHERE created < ?", (now - self.ttl_seconds,))
+        (count,) = self._db.execute("SELECT COUNT(*) FROM completions").fetchone()
+        if count > self.max_entries:
+            self._db.execute(
+                "DELETE FROM completions WHERE key IN "
+                "(SELECT key FROM completions ORDER BY accessed LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def complete(self, site: str, model: str, prompt, params: dict | None, call, bypass: bool = False,
+                 validate=None) -> str:
+        """
+        Cached result of call() (the actual LLM request, returning the text).
+        Empty completions, and ones validate(response) rejects (returns False
+        or raises), are not stored.
+        """
+        if (params or {}).get("temperature", 0) > settings.LLM_CACHE_MAX_TEMPERATURE:
+            with self._lock:
+                self._count(site, 2)
+            return call()
+
+        key = make_key(model, prompt, params)
+        if bypass or settings.LLM_CACHE_BYPASS:
+            with self._lock:
+                self._count(site, 2)
+        else:
+            cached = self.get(site, key)
+            if cached is not None:
+                return cached
+
+        response = call()
+        if response and _usable(response, validate):
+            self.put(site, key, model, response)
+        elif response:
+            with self._lock:
+                self._count(site, 3)
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM completions")
+            self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            (entries,) = self._db.execute("SELECT COUNT(*) FROM completions").fetchone()
+            sites = {}
+            for site, (hits, misses, bypassed, rejected) in self._sites.items():
+                lookups = hits + misses
+                sites[site] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "bypassed": bypassed,
+                    "rejected": rejected,
+                    "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                }
+        return {"entries": entries, "sites": sites}
+
+
+def _usable(response: str, validate) -> bool:
+    if validate is None:
+        return True
+    try:
+        return bool(validate(response))
+    except Exception:
+        return False
+
+
+def is_json(response: str) -> bool:
+    """validate for call sites that json.loads the completion as is."""
+    json.loads(response)
+    return True
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """Process-wide cache, or None when LLM_CACHE_PATH is empty."""
+    global _cache
+    if not settings.LLM_CACHE_PATH:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache(settings.LLM_CACHE_PATH, settings.LLM_CACHE_MAX_ENTRIES,
+                              settings.LLM_CACHE_TTL_SECONDS)
+        return _cache
+
+
+def cached_completion(site: str, model: str, prompt, params: dict | None, call, bypass: bool = False,
+                      validate=None) -> str:
+    """call() through the shared cache; a plain call() when the cache is disabled."""
+    cache = get_llm_cache()
+    if cache is None:
+        return call()
+    return cache.complete(site, model, prompt, params, call, bypass, validate)
+
+
+def forget(model: str, prompt, params: dict | None = None):
+    """Drops a cached completion the caller found unusable after the fact."""
+    cache = get_llm_cache()
+    if cache is not None:
+        cache.delete(make_key(model, prompt, params))
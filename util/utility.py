@@ -1,4 +1,4 @@
-from config.DB_Connection import get_connection
+from config.DB_Connection import pooled_connection
 from collections import defaultdict
 
 def fetch_grades(course_name: str, lecturer_name: str):
@@ -14,14 +14,13 @@ def fetch_grades(course_name: str, lecturer_name: str):
         ORDER BY year DESC LIMIT 6;
     """
 
-    conn = get_connection()
-    cursor = conn.cursor()
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute(sql, (course_name, lecturer_name))
-    rows = cursor.fetchall()
+        cursor.execute(sql, (course_name, lecturer_name))
+        rows = cursor.fetchall()
 
-    cursor.close()
-    conn.close()
+        cursor.close()
 
     return rows
 
@@ -36,14 +35,13 @@ def fetch_kdams(course_name: str):
         WHERE name = %s;
     """
 
-    conn = get_connection()
-    cursor = conn.cursor()
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute(sql, [course_name])
-    rows = cursor.fetchall()
+        cursor.execute(sql, [course_name])
+        rows = cursor.fetchall()
 
-    cursor.close()
-    conn.close()
+        cursor.close()
 
     return rows
 
@@ -54,6 +52,8 @@ def docs2str(docs, grades_flag=False) -> str:
     including selected metadata: course_name, lecturer, date.
     """
     out_str = ""
+    # many chunks share a (course, lecturer): one query each
+    grades_by_offering = {}
 
     for doc in docs:
         meta = getattr(doc, "metadata", {})
@@ -64,7 +64,10 @@ def docs2str(docs, grades_flag=False) -> str:
         grades      = "N/A"
         #kdams     = "N/A"
         if grades_flag:
-            grades = fetch_grades(course_name, lecturer)
+            key = (course_name, lecturer)
+            if key not in grades_by_offering:
+                grades_by_offering[key] = fetch_grades(course_name, lecturer)
+            grades = grades_by_offering[key]
             #kdams = fetch_kdams(course_name)
         
         # header with metadata